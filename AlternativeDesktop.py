@@ -5,15 +5,29 @@ import os
 from datetime import datetime
 import importlib.util
 import traceback
+import time
+import multiprocessing
 
-# Set up argument parser
-parser = argparse.ArgumentParser(description="Launch AlternativeDesktop with different debugging states", formatter_class=argparse.RawTextHelpFormatter)
+CURRENT_VERSION = "V0.5.000"
+GITHUB_REPO = "gillsb/Alternative-Desktop"
+RELEASES_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
+SETTINGS_FILE = None
+
+# Nothing here may run at import time: the batch icon regeneration process pool (icon_gen/batch_regen.py) starts its workers
+# by re-importing this file as __mp_main__, so argument parsing, module loading and logging setup only happen from main().
 
-# Add an optional argument to accept "prototype"
-parser.add_argument('mode', nargs='?', default='', help="Mode to launch the application: \n'dev':      Launch version with console logging \n'devbug':   Launch debug version with console logging \n'debug':    Launch debug version")
+def parse_args():
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description="Launch AlternativeDesktop with different debugging states", formatter_class=argparse.RawTextHelpFormatter)
 
-# Parse the arguments
-args = parser.parse_args()
+    # Add an optional argument to accept "prototype"
+    parser.add_argument('mode', nargs='?', default='', help="Mode to launch the application: \n'dev':      Launch version with console logging \n'devbug':   Launch debug version with console logging \n'debug':    Launch debug version")
+    parser.add_argument('--regenerate-icons', action='store_true', help="Regenerate every auto generated desktop icon without opening the desktop, then exit")
+    parser.add_argument('--include-custom-icons', action='store_true', help="With --regenerate-icons, also replace icons that were not auto generated")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes used by --regenerate-icons (defaults to the icon_regen_workers setting)")
+
+    # Parse the arguments
+    return parser.parse_args()
 
 def load_module(module_name, subfolder=None):
     current_dir = os.getcwd()
@@ -36,40 +50,42 @@ def load_module(module_name, subfolder=None):
         print(f"Falling back to system import for {module_name}")
         return importlib.import_module(module_name)
 
-# Ensure the current working directory is in sys.path
-if os.getcwd() not in sys.path:
-    sys.path.insert(0, os.getcwd())
+# Loads the application modules and sets up logging for args.mode. Returns the desktop module.
+def setup(args):
+    # Ensure the current working directory is in sys.path
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
 
-print(f"Python path: {sys.path}")
+    print(f"Python path: {sys.path}")
 
-# Load modules
-updater = load_module('updater', subfolder='util')
-settings = load_module('settings', subfolder='util')
-desktop = load_module('desktop', subfolder='desktop')
+    # Load modules
+    load_module('updater', subfolder='util')
+    load_module('settings', subfolder='util')
+    desktop = load_module('desktop', subfolder='desktop')
 
-# Now use these modules
-from util.updater import check_for_updates
-from util.settings import load_settings, set_dir
-from util.logs import setup_logging, setup_dev_logging, rotate_logs, create_log_path
-import logging
+    from util.logs import setup_logging, setup_dev_logging
 
-# Only used for pyinstaller to get the dependencies needed for the program. (pyinstaller only looks for explicit imports not load_module)
-from desktop.desktop import main
+    # Only used for pyinstaller to get the dependencies needed for the program. (pyinstaller only looks for explicit imports not load_module)
+    from desktop.desktop import main as desktop_main
 
-CURRENT_VERSION = "V0.5.000"
-GITHUB_REPO = "gillsb/Alternative-Desktop"
-RELEASES_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
-SETTINGS_FILE = None
+    # Use old logging which shows in both console and logging file. note: this does not include errors in logging files, only console.
+    if args.mode == "dev" or args.mode == "devbug":
+        setup_dev_logging()
+    # Installation version for logging. Required for redirecting stderr to log file.
+    else:
+        setup_logging()
+
+    return desktop
 
-# Use old logging which shows in both console and logging file. note: this does not include errors in logging files, only console.
-if args.mode == "dev" or args.mode == "devbug":
-    setup_dev_logging()
-# Installation version for logging. Required for redirecting stderr to log file.
-else:
-    setup_logging()
-    
 
 def main():
+    args = parse_args()
+    desktop = setup(args)
+
+    # Now use these modules
+    from util.updater import check_for_updates
+    from util.settings import get_settings, set_dir
+
     try:
         logger = logging.getLogger(__name__)
         logger.info("Starting the application")
@@ -89,9 +105,13 @@ def main():
 
         logger.info(f"Settings file: {SETTINGS_FILE}")
         set_dir(SETTINGS_FILE)
-        settings = load_settings()
+        settings = get_settings()
         logger.info(f"settings: {settings}")
 
+        if args.regenerate_icons:
+            regenerate_icons_headless(settings, args)
+            return
+
         # Must run before .main() and before any QApplication needs to be created
         # Since updater(check_for_updates) uses a QApplication we call it before so that it uses the same QApplication (cannot delete one and re-create it)
         desktop.create_app()
@@ -106,5 +126,23 @@ def main():
         print(traceback_info)
         logger.error("An error occurred:%s", traceback_info)
 
+# Headless batch regeneration of every icon, prints a per-entry timing/failure report.
+def regenerate_icons_headless(settings, args):
+    from util.config import create_paths, compact_journal
+    from icon_gen.auto_gen import AUTOGEN_ICON_SIZE
+    from icon_gen.batch_regen import collect_regen_tasks, regenerate_icons, store_regen_results, commit_regen_results, format_regen_report
+
+    create_paths()
+    workers = args.workers or settings.get("icon_regen_workers", 4)
+    start = time.perf_counter()
+    tasks = collect_regen_tasks(AUTOGEN_ICON_SIZE, include_custom=args.include_custom_icons)
+    print(f"Regenerating {len(tasks)} icons with {workers} workers")
+    results = regenerate_icons(tasks, workers, on_result=lambda result, done, total: print(f"[{done}/{total}] {result.name}: {result.error or result.icon_path} ({result.seconds:.2f}s)"))
+    commit_regen_results(store_regen_results(results))
+    compact_journal()
+    print(format_regen_report(results, time.perf_counter() - start))
+
 if __name__ == "__main__":
+    # Required for the batch icon regeneration process pool in a pyinstaller build.
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from PIL import Image
+
+# Compares the old copy, reopen, resize, overwrite round trip with icon_utils.process_icon_image over a directory of fixture images.
+# Usage (from the repository root): python benchmarks/icon_pipeline_benchmark.py path/to/fixtures --size 256 --repeat 5
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from icon_gen.icon_utils import process_icon_image
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".ico", ".exe", ".dll")
+
+
+# What extract_ico_file / get_exact_img_file / save_favicon used to do for every source.
+def copy_reopen_resize(source_path, output_path, icon_size):
+    shutil.copy2(source_path, output_path)
+    image = Image.open(output_path)
+    resized_image = image.resize((icon_size, icon_size), Image.Resampling.LANCZOS)
+    resized_image.save(output_path, format="PNG")
+
+def time_method(method, fixtures, output_dir, icon_size, repeat):
+    timings = {}
+    for source_path in fixtures:
+        output_path = os.path.join(output_dir, os.path.basename(source_path) + ".png")
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                method(source_path, output_path, icon_size)
+            except Exception as e:
+                print(f"  {method.__name__} failed on {source_path}: {e}")
+                best = None
+                break
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[source_path] = best
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the icon_gen image pipeline over a directory of fixture images")
+    parser.add_argument('fixtures', help="Directory of fixture images (.png, .jpg, .ico, .exe, ...)")
+    parser.add_argument('--size', type=int, default=256, help="Icon size to generate (default 256, the auto gen size)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per file, the fastest is reported")
+    args = parser.parse_args()
+
+    fixtures = sorted(os.path.join(args.fixtures, name) for name in os.listdir(args.fixtures) if name.lower().endswith(IMAGE_EXTENSIONS))
+    if not fixtures:
+        print(f"No fixture images found in {args.fixtures}")
+        return 1
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        old = time_method(copy_reopen_resize, [path for path in fixtures if not path.lower().endswith((".exe", ".dll"))], output_dir, args.size, args.repeat)
+        new = time_method(process_icon_image, fixtures, output_dir, args.size, args.repeat)
+
+    print(f"{'file':40} {'size KB':>8} {'copy+reopen ms':>15} {'pipeline ms':>12}")
+    old_total = new_total = 0.0
+    for path in fixtures:
+        old_time = old.get(path)
+        new_time = new.get(path)
+        if old_time is not None and new_time is not None:
+            old_total += old_time
+            new_total += new_time
+        old_text = f"{old_time * 1000:.2f}" if old_time is not None else "-"
+        new_text = f"{new_time * 1000:.2f}" if new_time is not None else "-"
+        print(f"{os.path.basename(path)[:40]:40} {os.path.getsize(path) / 1024:8.0f} {old_text:>15} {new_text:>12}")
+    if new_total:
+        print(f"Total (files both handled): {old_total * 1000:.1f} ms vs {new_total * 1000:.1f} ms, {old_total / new_total:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+
+# Compares the cold start load of desktop.json (parse, build IconRecords, index) with loading its binary startup snapshot.
+# Usage (from the repository root): python benchmarks/startup_snapshot_benchmark.py --entries 1000 10000 --repeat 5
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import util.config as config
+from util.config import IconRecord, rebuild_lookup_table, load_config_snapshot, write_config_file, write_config_snapshot
+
+COLORS = ["#ffffff", "#ff0000", "#00ff00", "#0000ff"]
+
+
+def make_entries(count):
+    entries = []
+    for i in range(count):
+        row, col = divmod(i, 100)
+        entries.append(IconRecord({
+            "id": f"{i:032x}",
+            "row": row,
+            "column": col,
+            "name": f"Entry {i}",
+            "icon_path": os.path.join("C:\\", "AlternativeDesktop", "data", "blobs", f"{i % 500:064x}.png"),
+            "executable_path": f"C:\\Program Files\\App {i}\\app.exe",
+            "website_link": "https://example.com" if i % 3 == 0 else "",
+            "launch_option": i % 5,
+            "font_size": 10 + i % 8,
+            "use_global_font_size": i % 4 != 0,
+            "font_color": COLORS[i % len(COLORS)],
+            "use_global_font_color": i % 2 == 0,
+        }).to_dict())
+    return entries
+
+# What create_config_path does without a snapshot.
+def load_json():
+    with open(config.DESKTOP_CONFIG_DIRECTORY, "r") as f:
+        config.JSON = [IconRecord.from_dict(entry) for entry in json.load(f)]
+    rebuild_lookup_table()
+
+def load_snapshot():
+    if not load_config_snapshot():
+        raise RuntimeError("startup snapshot was not used")
+
+def best_time(method, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        method()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading desktop.json against its startup snapshot")
+    parser.add_argument('--entries', type=int, nargs='+', default=[1000, 10000], help="Entry counts to test (default 1000 10000)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per load method, the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'json KB':>8} {'snapshot KB':>12} {'json ms':>9} {'snapshot ms':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        config.DESKTOP_CONFIG_DIRECTORY = os.path.join(directory, "desktop.json")
+        snapshot_path = os.path.join(directory, "desktop.snapshot")
+        for count in args.entries:
+            entries = make_entries(count)
+            write_config_file(entries)
+            write_config_snapshot(entries)
+
+            json_time = best_time(load_json, args.repeat)
+            snapshot_time = best_time(load_snapshot, args.repeat)
+            if len(config.JSON) != count or len(config.NON_DEFAULT_ITEMS) != count:
+                print(f"Snapshot loaded {len(config.JSON)} entries, expected {count}")
+                return 1
+            print(f"{count:8} {os.path.getsize(config.DESKTOP_CONFIG_DIRECTORY) / 1024:8.0f} {os.path.getsize(snapshot_path) / 1024:12.0f} "
+                  f"{json_time * 1000:9.2f} {snapshot_time * 1000:12.2f} {json_time / snapshot_time:7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
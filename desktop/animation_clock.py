@@ -0,0 +1,164 @@
+from PySide6.QtCore import QObject, QTimer, QElapsedTimer, Qt
+from PySide6.QtGui import QImageReader, QPixmap, QGuiApplication
+from util.settings import get_setting, subscribe
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Drives every animated (.gif) DesktopIcon from one timer instead of a QMovie per icon.
+ANIMATION_CLOCK = None
+# Decoded, pre-scaled frames shared by every DesktopIcon showing the same GIF at the same size.
+# Keyed on (path, mtime, width, height, device pixel ratio), dropped when the last icon using it unsubscribes.
+FRAME_CACHE = {}
+DEFAULT_FPS_CAP = 30
+# Used for frames that report no delay, matches what browsers do for 0/10ms GIF delays.
+DEFAULT_FRAME_DELAY = 100
+
+
+class AnimationFrames:
+    def __init__(self, key, frames, delays):
+        self.key = key
+        self.frames = frames
+        self.delays = delays
+        self.duration = sum(delays)
+        self.users = 0
+
+    # Index of the frame showing at time_ms since the clock started, looping forever.
+    def frame_index_at(self, time_ms):
+        if len(self.frames) == 1 or self.duration <= 0:
+            return 0
+        time_ms %= self.duration
+        for index, delay in enumerate(self.delays):
+            if time_ms < delay:
+                return index
+            time_ms -= delay
+        return len(self.frames) - 1
+
+
+# Decodes every frame of path once and scales it to fit width x height (logical pixels). Returns None if path is not a valid animation.
+def decode_frames(key, path, width, height, dpr):
+    reader = QImageReader(path)
+    frames = []
+    delays = []
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        image = image.scaled(int(width * dpr), int(height * dpr), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(dpr)
+        frames.append(pixmap)
+        delay = reader.nextImageDelay()
+        delays.append(delay if delay > 10 else DEFAULT_FRAME_DELAY)
+        if not reader.canRead():
+            break
+    if not frames:
+        logger.error(f"Error: GIF failed to load. {path}: {reader.errorString()}")
+        return None
+    logger.info(f"Decoded {len(frames)} frames of {path} at {width}x{height}")
+    return AnimationFrames(key, frames, delays)
+
+
+class AnimationClock(QObject):
+    def __init__(self):
+        super().__init__()
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.set_fps_cap(get_setting("animation_fps_cap", DEFAULT_FPS_CAP))
+        # Animation time only advances while running, so pausing and resuming continues from the same frame.
+        self.elapsed = QElapsedTimer()
+        self.time_ms = 0
+        self.paused = False
+        # DesktopIcon -> [AnimationFrames, index of the frame it last drew]
+        self.subscribers = {}
+        # util.settings.subscribe (the settings bus), not AnimationClock.subscribe
+        subscribe(self.on_settings_changed, ("animation_fps_cap",))
+
+    # The settings menu only saves animation_fps_cap, the new cap applies from here.
+    def on_settings_changed(self, change):
+        self.set_fps_cap(get_setting("animation_fps_cap", DEFAULT_FPS_CAP))
+
+    def set_fps_cap(self, fps_cap):
+        fps_cap = max(1, int(fps_cap))
+        self.timer.setInterval(max(1, 1000 // fps_cap))
+        logger.info(f"Animation clock capped at {fps_cap} fps")
+
+    # Returns the shared AnimationFrames for path at width x height and starts advancing icon with it. None if path is not a valid animation.
+    # Resubscribing to the same path, mtime and size keeps the current frames, they are never decoded again while an icon uses them.
+    def subscribe(self, icon, path, width, height):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.unsubscribe(icon)
+            return None
+        dpr = QGuiApplication.instance().devicePixelRatio() if QGuiApplication.instance() else 1.0
+        key = (os.path.normcase(os.path.abspath(path)), mtime, width, height, dpr)
+
+        subscription = self.subscribers.get(icon)
+        if subscription is not None and subscription[0].key == key:
+            return subscription[0]
+
+        animation = FRAME_CACHE.get(key)
+        if animation is None:
+            animation = decode_frames(key, path, width, height, dpr)
+            if animation is None:
+                self.unsubscribe(icon)
+                return None
+            FRAME_CACHE[key] = animation
+        # The old frames (another path or size) are only released once the new ones are held.
+        animation.users += 1
+        self.unsubscribe(icon)
+        self.subscribers[icon] = [animation, animation.frame_index_at(self.time_ms)]
+        self.update_running()
+        return animation
+
+    def unsubscribe(self, icon):
+        subscription = self.subscribers.pop(icon, None)
+        if subscription is None:
+            return
+        animation = subscription[0]
+        animation.users -= 1
+        if animation.users <= 0:
+            FRAME_CACHE.pop(animation.key, None)
+        self.update_running()
+
+    def current_frame(self, icon):
+        subscription = self.subscribers.get(icon)
+        if subscription is None:
+            return None
+        animation, index = subscription
+        return animation.frames[index]
+
+    def set_paused(self, paused):
+        if paused != self.paused:
+            self.paused = paused
+            logger.info(f"Animation clock {'paused' if paused else 'resumed'}")
+            self.update_running()
+
+    def update_running(self):
+        should_run = bool(self.subscribers) and not self.paused
+        if should_run and not self.timer.isActive():
+            self.elapsed.start()
+            self.timer.start()
+        elif not should_run and self.timer.isActive():
+            self.time_ms += self.elapsed.elapsed()
+            self.timer.stop()
+
+    # Only repaints icons whose frame actually changed this tick.
+    def tick(self):
+        self.time_ms += self.elapsed.restart()
+        for icon, subscription in self.subscribers.items():
+            animation, index = subscription
+            new_index = animation.frame_index_at(self.time_ms)
+            if new_index != index:
+                subscription[1] = new_index
+                icon.update()
+
+
+def get_animation_clock():
+    global ANIMATION_CLOCK
+    if ANIMATION_CLOCK is None:
+        ANIMATION_CLOCK = AnimationClock()
+    return ANIMATION_CLOCK
@@ -2,7 +2,10 @@ from PySide6.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout, Q
 from PySide6.QtCore import Qt, QEvent, QRect, QTimer
 from PySide6.QtGui import QIcon, QIcon, QAction, QColor
 import sys
-from util.settings import get_setting, set_setting
+from util.settings import get_setting, set_setting, flush
+from util.config import compact_journal, collect_unreferenced_blobs
+from util.pixmap_cache import log_pixmap_cache_stats
+from desktop.animation_clock import get_animation_clock
 from menus.settings_menu import SettingsDialog
 from menus.display_warning import display_settings_not_saved
 import qt_material
@@ -99,7 +102,7 @@ class OverlayWidget(QWidget):
     def close_settings(self, result):
         self.settings_dialog = None
         if result == QDialog.Accepted:
-            self.grid_widget.redraw_all_icons()
+            # Saving already updated whatever the changed settings affect (settings change bus in util/settings.py)
             logger.info(f"Closed settings, settings_dialog = {self.settings_dialog} (this should be None)")
         elif result == QDialog.Rejected:
             logger.info("Settings were not saved, reload from saved settings to revert any previews.")
@@ -165,6 +168,12 @@ class OverlayWidget(QWidget):
             self.tray_icon.deleteLater()
             self.tray_icon = None
             logger.info("Finished cleaning up tray_icon")
+        # Leave desktop.json fully up to date instead of waiting for the journal replay on next launch.
+        compact_journal()
+        # Write settings changes still waiting on the write-behind timer.
+        flush()
+        collect_unreferenced_blobs()
+        log_pixmap_cache_stats()
 
     def set_theme_colors(self, theme_colors):
         if theme_colors == None:
@@ -333,8 +342,21 @@ class OverlayWidget(QWidget):
 
                 self.is_maximized = False
                 logger.info("Window is in normal state")
+            self.update_animation_clock()
         super().changeEvent(event)
 
+    # Hidden covers minimize_to_tray(), animated icons stop advancing (and repainting) until the window is visible again.
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_animation_clock()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_animation_clock()
+
+    def update_animation_clock(self):
+        get_animation_clock().set_paused(not self.isVisible() or bool(self.windowState() & Qt.WindowMinimized))
+
     def set_hotkey(self):
         self.hotkey_handler.stop_listener()
         self.hotkey_handler.set_hotkey()
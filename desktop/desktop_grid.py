@@ -1,21 +1,25 @@
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QApplication, QMenu
-from PySide6.QtCore import Qt, QRectF, QTimer, QMetaObject, QUrl, QPoint
+from PySide6.QtCore import Qt, QRectF, QTimer, QMetaObject, QUrl, QPoint, QObject, QRunnable, QThreadPool, Signal
 from PySide6.QtGui import QPainter, QColor, QBrush, QPen, QAction, QCursor
 from PySide6.QtMultimedia import QMediaPlayer
 from PySide6.QtMultimediaWidgets import QGraphicsVideoItem
-from util.settings import get_setting
-from util.config import get_icon_data, create_paths, is_default, get_data_directory, swap_icons_by_position, update_folder
+from util.settings import get_setting, subscribe
+from util.config import get_icon_data, create_paths, get_populated_positions, get_entry_data_path, swap_icons_by_position, get_blob_refcounts
 from util.utils import TempIcon
+from util.launcher import get_launcher, NO_DEFAULT_TYPE
+from icon_gen.auto_gen import AUTOGEN_ICON_SIZE
+from icon_gen.batch_regen import collect_regen_tasks, regenerate_icons, store_regen_results, commit_regen_results, format_regen_report
+from icon_gen.icon_utils import ensure_mipmaps
+from menus.display_warning import display_no_default_type_error, display_no_successful_launch_error, display_icon_regen_report
 from desktop.icon_edit_menu import Menu
 from desktop.shelf import Shelf, ShelfHoverItem
-from menus.display_warning import (display_failed_cleanup_warning,  display_cannot_swap_icons_warning)
 from desktop.icon_edit_menu import Menu
 from desktop.image_background_manager import ImageBackgroundManager
 from desktop.video_background_manager import VideoBackgroundManager
-from desktop.desktop_icon import DesktopIcon
+from desktop.desktop_icon import DesktopIcon, DESKTOP_ICON_SETTINGS
 import os
-import logging
 import time
+import logging
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +34,6 @@ MAX_ROWS = 10
 MAX_COLS = 40
 
 MEDIA_PLAYER = None
-AUTOGEN_ICON_SIZE = 256
 
 BACKGROUND_VIDEO = ""
 BACKGROUND_IMAGE = ""
@@ -39,6 +42,10 @@ BACKGROUND_IMAGE = ""
 # Desktop Icon variables
 ICON_SIZE = 128  # Overrided by settings
 
+# Settings that change how render_bg() draws the background.
+BACKGROUND_SETTINGS = ("background_source", "background_video", "background_image", "custom_bg_fill", "custom_bg_color", "theme")
+GRID_SETTINGS = ("icon_size", "max_rows", "max_cols")
+
 class DesktopGrid(QGraphicsView):
     def __init__(self, parent=None, args=None):
         super().__init__(parent)
@@ -53,6 +60,15 @@ class DesktopGrid(QGraphicsView):
         # Build paths for config and data directories (stored in config.py)
         create_paths()
 
+        # Icons stored before mipmaps existed get them in the background.
+        QThreadPool.globalInstance().start(MipmapBackfillRunnable(list(get_blob_refcounts())))
+
+        # Set while regenerate_all_icons() is running.
+        self.regen_signals = None
+
+        # DesktopIcons launch executables in the background, failures are reported back here.
+        get_launcher().launch_failed.connect(self.on_launch_failed)
+
         global ICON_SIZE, MAX_ROWS, MAX_COLS
         ICON_SIZE = get_setting("icon_size", 100)
         MAX_ROWS = get_setting("max_rows")
@@ -105,18 +121,31 @@ class DesktopGrid(QGraphicsView):
         self.render_bg()
         self.populate_icons()
 
+        subscribe(self.on_settings_changed, BACKGROUND_SETTINGS + GRID_SETTINGS + DESKTOP_ICON_SETTINGS)
+
+    # Settings change bus (util/settings.py), only redoes the work the changed keys affect.
+    def on_settings_changed(self, change):
+        if change.touches("max_rows", "max_cols"):
+            self.change_max_grid_dimensions(get_setting("max_rows"), get_setting("max_cols"))
+        if "icon_size" in change:
+            self.update_icon_size(get_setting("icon_size", 100))
+        if change.touches(*BACKGROUND_SETTINGS):
+            self.render_bg()
+        if change.touches(*DESKTOP_ICON_SETTINGS):
+            # Pooled icons pick the new settings up when they are bound to a cell again.
+            for icon in self.desktop_icons.values():
+                icon.on_settings_changed(change)
 
 
     def populate_icons(self):
 
+        # Live DesktopIcons, only for populated cells inside the visible region.
         self.desktop_icons = {}
+        # Released DesktopIcons (hidden) waiting to be reused for the next cell that comes into view.
+        self.icon_pool = []
 
-        for row in range(MAX_ROWS):
-            for col in range(MAX_COLS):
-                # Don't add empty icons
-                if not is_default(row, col):
-                    self.add_icon(row, col)
-
+        # Initially create icons based on the current window size
+        self.update_icon_visibility()
 
         # Attach a logger which logs every 100 times the first icon in self.desktop_icons is repainted (For detecting infinite paint loops)
         if self.desktop_icons:
@@ -125,8 +154,11 @@ class DesktopGrid(QGraphicsView):
             logger.info(f"Setting {first_icon_key} to log repaints")
             first_icon.log_paints = True
 
-        # Initially update visibility based on the current window size
-        self.update_icon_visibility()
+    def on_launch_failed(self, executable_path, reason):
+        if reason == NO_DEFAULT_TYPE:
+            display_no_default_type_error(executable_path)
+        else:
+            display_no_successful_launch_error()
 
     # Calls reload_from_config() on all desktopIcons which ensures the Icons appearance is up to date and redraws all icons.
     def redraw_all_icons(self):
@@ -152,7 +184,8 @@ class DesktopGrid(QGraphicsView):
         #self.update_icon_visibility()
 
 
-    # Iterates through every self.desktop_icons and sets visiblity
+    # Virtualized grid: keeps a live DesktopIcon only for populated cells inside the visible region.
+    # Icons leaving the region are released to self.icon_pool and reused for cells coming into view, off-screen entries stay as config records only.
     def update_icon_visibility(self):
         view_width = self.viewport().width()
         view_height = self.viewport().height()
@@ -160,11 +193,41 @@ class DesktopGrid(QGraphicsView):
         self.max_visible_rows = min((view_height - TOP_PADDING) // (ICON_SIZE + VERTICAL_PADDING), MAX_ROWS)
         self.max_visible_columns = min((view_width - SIDE_PADDING) // (ICON_SIZE + HORIZONTAL_PADDING), MAX_COLS)
 
-        for (row, col), icon in self.desktop_icons.items():
-            if row < self.max_visible_rows and col < self.max_visible_columns:
-                icon.setVisible(True)
-            else:
-                icon.setVisible(False)
+        for row, col in list(self.desktop_icons):
+            if not self.is_cell_visible(row, col):
+                self.release_icon(row, col)
+
+        for row, col in get_populated_positions():
+            if self.is_cell_visible(row, col) and (row, col) not in self.desktop_icons:
+                self.acquire_icon(row, col)
+
+    def is_cell_visible(self, row, col):
+        return row < self.max_visible_rows and col < self.max_visible_columns
+
+    # Gets a DesktopIcon for row, col. Reuses one from self.icon_pool if available, otherwise creates a new one.
+    def acquire_icon(self, row, col):
+        if self.icon_pool:
+            icon_item = self.icon_pool.pop()
+            icon_item.bind(row, col, ICON_SIZE)
+            icon_item.setVisible(True)
+        else:
+            icon_item = DesktopIcon(
+                row, 
+                col, 
+                ICON_SIZE)
+            self.scene.addItem(icon_item)
+        icon_item.setPos(SIDE_PADDING + col * (ICON_SIZE + HORIZONTAL_PADDING), 
+                        TOP_PADDING + row * (ICON_SIZE + VERTICAL_PADDING))
+        self.desktop_icons[(row, col)] = icon_item
+        return icon_item
+
+    # Hides the DesktopIcon at row, col and returns it to self.icon_pool
+    def release_icon(self, row, col):
+        icon_item = self.desktop_icons.pop((row, col), None)
+        if icon_item is not None:
+            icon_item.setVisible(False)
+            icon_item.release()
+            self.icon_pool.append(icon_item)
 
     # Ignores wheel scrolling EXCEPT for when launched with "debug" or "devbug"
     def wheelEvent(self, event):
@@ -379,10 +442,9 @@ class DesktopGrid(QGraphicsView):
         # Return the position as a QPoint
         return QPoint(x_pos, y_pos)
 
-    # returns base DATA_DIRECTORY/[row, col]
-    def get_data_icon_dir(self, row, col):
-        data_directory = get_data_directory()
-        data_path = os.path.join(data_directory, f'[{row}, {col}]')
+    # returns base DATA_DIRECTORY/entry_id
+    def get_data_icon_dir(self, entry_id):
+        data_path = get_entry_data_path(entry_id)
         #make file if no file (new)
         if not os.path.exists(data_path):
             logger.info(f"Making directory at {data_path}")
@@ -392,6 +454,21 @@ class DesktopGrid(QGraphicsView):
     
     def get_autogen_icon_size(self):
         return AUTOGEN_ICON_SIZE
+
+    # Regenerates every auto generated icon in the background (see icon_gen/batch_regen.py), saved and redrawn in on_icons_regenerated.
+    def regenerate_all_icons(self, workers):
+        if self.regen_signals is not None:
+            logger.warning("Icon regeneration already running")
+            return
+        self.regen_signals = RegenSignals()
+        self.regen_signals.finished.connect(self.on_icons_regenerated)
+        QThreadPool.globalInstance().start(RegenRunnable(AUTOGEN_ICON_SIZE, workers, self.regen_signals))
+
+    def on_icons_regenerated(self, icon_paths, report):
+        self.regen_signals = None
+        commit_regen_results(icon_paths)
+        self.redraw_all_icons()
+        display_icon_regen_report(report)
     
     def set_icon_path(self, row, col, new_icon_path):
         if (row, col) in self.desktop_icons:
@@ -452,15 +529,6 @@ class DesktopGrid(QGraphicsView):
             # Handle cases where one of the icons does not exist
             logger.error("One of the icons attempting to swap does not exist.")
             return
-        result = self.swap_folders(old_row, old_col, new_row, new_col)
-        if result != True:
-            logger.error("Failed swapping files. do not swap local icons")
-            display_cannot_swap_icons_warning(result)
-            icon1.reload_from_config()
-            icon2.reload_from_config()
-            return
-        
-        logger.info("folders successfully swapped")
 
         # Calculate new positions
         icon1_new_pos = (SIDE_PADDING + new_col * (ICON_SIZE + HORIZONTAL_PADDING),
@@ -483,74 +551,11 @@ class DesktopGrid(QGraphicsView):
             self.desktop_icons[(old_row, old_col)]
         )
 
+        # Data folders are keyed by entry id, so swapping is only a change of row/column in desktop.json.
         swap_icons_by_position(old_row, old_col, new_row, new_col)
-        update_folder(new_row, new_col)
-        update_folder(old_row, old_col)
 
-        # Reload their fields to update their icon_path. This is a way to refresh fields, but will not update rows/col.
-        # Row/col should be changed like the above, then call a refresh.
-        icon1.reload_from_config()
-        icon2.reload_from_config()
         logger.info(f"Swapped icons at ({old_row}, {old_col}) with ({new_row}, {new_col})")
 
-    def swap_folders(self, old_row, old_col, new_row, new_col):
-        new_dir = self.get_data_icon_dir(new_row, new_col)
-        exist_dir = self.get_data_icon_dir(old_row, old_col)
-
-        # Stop the movie or it can receive permission errors as a file in use.
-        if (new_row, new_col) in self.desktop_icons:
-            self.desktop_icons[(new_row, new_col)].movie = None
-        if (old_row, old_col) in self.desktop_icons:
-            self.desktop_icons[(old_row, old_col)].movie = None
-        
-        
-        if os.path.exists(new_dir) and os.path.exists(exist_dir):
-            # Check for write permissions
-            if not os.access(new_dir, os.W_OK) or not os.access(exist_dir, os.W_OK):
-                logger.error(f"Permission denied on one of the directories: {new_dir}, {exist_dir}")
-                return False
-            
-            try:
-                # Swap folder names using temporary folder
-                temp_folder = new_dir + '_temp'
-                temp_folder = self.get_unique_folder_name(temp_folder)
-                logger.info(f"making new folder name = {temp_folder}")
-                
-                retries = 2
-                last_exception = None 
-                for _ in range(retries):
-                    try:
-                        os.rename(new_dir, temp_folder)
-                        break
-                    except PermissionError as e:
-                        last_exception = e
-                        logger.warning(f"PermissionError when renaming {new_dir}, retrying... ({e})")
-                        time.sleep(0.25)
-                    except Exception as e:
-                        last_exception = e
-                        logger.warning(f"Unexpected error when renaming {new_dir}: {e}, retrying...")
-                        time.sleep(0.25) 
-                else:
-                    raise OSError(f"Failed to rename after {retries} retries. \nError: {last_exception}")
-                # Continue with the renaming process
-                os.rename(exist_dir, new_dir)
-                os.rename(temp_folder, exist_dir)
-
-            except Exception as e:
-                logger.error(f"Error during folder swap: {e}")
-                if temp_folder and os.path.exists(temp_folder):
-                    logger.info(f"Rolling back: renaming {temp_folder} back to {new_dir}.")
-                    try:
-                        os.rename(temp_folder, new_dir)
-                    except Exception as rollback_error:
-                        logger.error(f"Rollback failed: {rollback_error}")
-                return e
-        else:
-            # get_data_directory should create the folders if they don't exist, so this should theoretically never be called
-            logger.error("One or both folders do not exist")
-            return "One or both folders do not exist"
-        return True
-
     def swap_with_blank_icon(self, old_row, old_col, new_row, new_col):
         icon1 = self.desktop_icons[(old_row, old_col)]
 
@@ -565,42 +570,22 @@ class DesktopGrid(QGraphicsView):
         self.desktop_icons[(new_row, new_col)] = icon
 
         swap_icons_by_position(old_row, old_col, new_row, new_col)
-        self.swap_folders(old_row, old_col, new_row, new_col)
-        update_folder(new_row, new_col)
-        #update_folder(old_row, old_col)
-
-        icon1.reload_from_config()
 
         logger.info(f"Swapped icons at ({old_row}, {old_col}) with ({new_row}, {new_col})")
 
 
 
-    def get_unique_folder_name(self, folder_path):
-        counter = 1
-        new_folder = folder_path
-        while os.path.exists(new_folder):
-            logger.error(f"Temp file seems to already exist {new_folder}, which seems to not have been removed/renamed after last cleanup.")
-            display_failed_cleanup_warning(new_folder)
-            new_folder = f"{folder_path}{counter}"
-            counter += 1
-        return new_folder
-    
     def change_max_grid_dimensions(self, rows, cols):
         global MAX_ROWS, MAX_COLS
         MAX_ROWS = rows
         MAX_COLS = cols
-        self.clear_icons()
-        self.populate_icons()
+
+        # Only releases icons now outside the grid and adds populated entries the grid now reaches.
+        self.update_icon_visibility()
 
     def set_cursor(self, cursor):
         QApplication.setOverrideCursor(QCursor(cursor))
 
-    def clear_icons(self):
-        for item in self.scene.items():
-            # Only clear icons, leave all non DesktopIcons
-            if isinstance(item, DesktopIcon):
-                self.scene.removeItem(item)
-
     def mousePressEvent(self, event):
         scene_pos = self.mapToScene(event.pos())
         items = self.scene.items(scene_pos)
@@ -733,24 +718,18 @@ class DesktopGrid(QGraphicsView):
     def add_icon(self, row, col):
         icon = self.desktop_icons.get((row, col))
         if icon is None:
-            icon_item = DesktopIcon(
-                row, 
-                col, 
-                ICON_SIZE)
-            icon_item.setPos(SIDE_PADDING + col * (ICON_SIZE + HORIZONTAL_PADDING), 
-                            TOP_PADDING + row * (ICON_SIZE + VERTICAL_PADDING))
-            self.desktop_icons[(row, col)] = icon_item
-            self.scene.addItem(icon_item)
+            # Cells outside the visible region get their DesktopIcon once they come into view.
+            if self.is_cell_visible(row, col):
+                self.acquire_icon(row, col)
         else:
             self.reload_icon(row, col)
 
     def delete_icon(self, row, col):
         logger.info(f"delete_icon called with {row} {col}")
-        try:
-            self.scene.removeItem(self.desktop_icons[(row, col)])
-            del self.desktop_icons[(row, col)]
-        except Exception as e:
-            logger.error(f"Problem removing deleted item from self.desktop_icons: {e}")
+        if (row, col) in self.desktop_icons:
+            self.release_icon(row, col)
+        else:
+            logger.error(f"Problem removing deleted item from self.desktop_icons: no icon at {row}, {col}")
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -827,4 +806,34 @@ class RedBorderItem(QGraphicsItem):
         painter.drawRect(adjusted_rect)
 
 
+class MipmapBackfillRunnable(QRunnable):
+    def __init__(self, blob_paths):
+        super().__init__()
+        self.blob_paths = blob_paths
+
+    def run(self):
+        for blob_path in self.blob_paths:
+            ensure_mipmaps(blob_path)
 
+class RegenSignals(QObject):
+    # ([(entry_id, blob path)], report text)
+    finished = Signal(object, str)
+
+class RegenRunnable(QRunnable):
+    def __init__(self, icon_size, workers, signals):
+        super().__init__()
+        self.icon_size = icon_size
+        self.workers = workers
+        self.signals = signals
+
+    # Collects the entries, waits on the batch_regen process pool and stores its icons off the GUI thread, which is left with only saving the new paths.
+    def run(self):
+        start = time.perf_counter()
+        try:
+            results = regenerate_icons(collect_regen_tasks(self.icon_size), self.workers)
+            icon_paths = store_regen_results(results)
+        except Exception as e:
+            logger.error(f"Icon regeneration failed: {e}")
+            results = []
+            icon_paths = []
+        self.signals.finished.emit(icon_paths, format_regen_report(results, time.perf_counter() - start))
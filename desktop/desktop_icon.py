@@ -1,11 +1,16 @@
 from PySide6.QtWidgets import QGraphicsItem, QDialog, QMenu, QMessageBox, QToolTip, QGraphicsPixmapItem
 from PySide6.QtCore import Qt, QRectF, QTimer
-from PySide6.QtGui import QPainter, QColor, QFont, QFontMetrics, QPixmap, QPainterPath, QPen, QAction, QMovie, QPixmapCache
-from util.settings import get_setting
-from util.config import get_icon_data, is_default, get_data_directory, change_launch, set_entry_to_default, get_icon_font_size, get_icon_font_color, delete_entry
+from PySide6.QtGui import QPainter, QFont, QAction
+from util.config import get_icon_data, is_default, get_entry_data_path, change_launch, get_icon_style, delete_entry
+from desktop.label_cache import get_label_layout
+from util.pixmap_cache import get_scaled_pixmap, invalidate_path
+from util.blob_store import is_blob_path
+from util.icon_loader import load_scaled_pixmap_async, get_placeholder_pixmap
+from desktop.animation_clock import get_animation_clock
+from util.launcher import get_launcher
 from menus.run_menu_dialog import RunMenuDialog
-from menus.display_warning import (display_no_successful_launch_error, display_file_not_found_error, display_no_default_type_error, display_failed_cleanup_warning, 
-                                   display_path_and_parent_not_exist_warning, display_delete_icon_warning, display_cannot_swap_icons_warning)
+from menus.display_warning import (display_no_successful_launch_error, display_file_not_found_error,
+                                   display_path_and_parent_not_exist_warning, display_delete_icon_warning)
 import os
 import logging
 import shlex
@@ -14,6 +19,8 @@ import send2trash
 
 logger = logging.getLogger(__name__)
 
+# Settings a DesktopIcon draws with, DesktopGrid forwards changes to them to every live icon.
+DESKTOP_ICON_SETTINGS = ("font", "global_font_size", "global_font_color")
 
 
 class DesktopIcon(QGraphicsItem):
@@ -26,32 +33,26 @@ class DesktopIcon(QGraphicsItem):
         self.row = row
         self.col = col
         self.pixmap = None
+        # Identifies the latest load_pixmap call, images decoded for an older request (previous icon_path/size/cell) are ignored.
+        self.pixmap_request = None
 
-        data = get_icon_data(row, col)
-        self.name = data['name']
-        self.icon_path = data['icon_path']
-        self.executable_path = data['executable_path']
-        self.command_args = data['command_args']
-        self.website_link = data['website_link']
-        self.launch_option = data['launch_option']
-        self.use_global_font_size = data['use_global_font_size']
-        self.use_global_font_color = data['use_global_font_color']
-        self.font_size = get_icon_font_size(self.row, self.col)
-        self.font_color = get_icon_font_color(self.row, self.col)
-
-        self.movie = None # For loading a gif
-        self.init_movie() # Load movie if .gif icon_path
+        self.load_record()
+
+        self.animation = None # Shared pre-scaled frames if icon_path is a .gif (see animation_clock.py)
 
         self.text_height = 0
+        # Cached wrapped lines + outlined label pixmap for self.name (see label_cache.py), reset whenever name/font/color/size changes.
+        self.label_layout = None
 
         self.setFlag(QGraphicsItem.ItemIsMovable, True)
         self.setAcceptDrops(True)
 
         self.icon_size = icon_size
+        self.init_animation() # Load animation if .gif icon_path
         self.setAcceptHoverEvents(True)
         self.hovered = False
         self.padding = 30
-        self.font = QFont(get_setting("font", "Arial"), self.font_size)
+        self.font = QFont(self.font_family, self.font_size)
 
         self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         self.load_pixmap()
@@ -65,88 +66,138 @@ class DesktopIcon(QGraphicsItem):
         self.dragging = False
         self.distance = 0
 
-    def reload_from_config(self):
-        data = get_icon_data(self.row, self.col)
-        self.name = data['name']
-        self.icon_path = data['icon_path']
-        self.executable_path = data['executable_path']
-        self.command_args = data['command_args']
-        self.website_link = data['website_link']
-        self.launch_option = data['launch_option']
-        self.use_global_font_size = data['use_global_font_size']
-        self.use_global_font_color = data['use_global_font_color']
-        self.font_size = get_icon_font_size(self.row, self.col)
-        self.font_color = get_icon_font_color(self.row, self.col)
-        self.init_movie()
-        self.load_pixmap(True)
+    # reset_cache=False reuses an already cached pixmap for icon_path (used when recycling a pooled icon), blob icons always reuse it.
+    def reload_from_config(self, reset_cache=True):
+        self.load_record()
+        self.label_layout = None
+        self.init_animation()
+        self.load_pixmap(reset_cache)
         self.update_font()
 
+    # Reads the entry's IconRecord and resolved label style (see STYLE_TABLE in config.py) for self.row, self.col.
+    def load_record(self):
+        # name and font size decide the label height, so the old bounding rect has to be dropped before they change.
+        self.prepareGeometryChange()
+        record = get_icon_data(self.row, self.col)
+        self.entry_id = record.id
+        self.name = record.name
+        self.icon_path = record.icon_path
+        self.executable_path = record.executable_path
+        self.command_args = record.command_args
+        self.website_link = record.website_link
+        self.launch_option = record.launch_option
+        self.use_global_font_size = record.use_global_font_size
+        self.use_global_font_color = record.use_global_font_color
+        style = get_icon_style(self.row, self.col)
+        self.font_family = style.font_family
+        self.font_size = style.font_size
+        self.font_color = style.font_color
+
+    # Points a pooled DesktopIcon at a new cell. DesktopGrid recycles icons as cells come in and out of view.
+    def bind(self, row, col, icon_size):
+        self.row = row
+        self.col = col
+        if self.icon_size != icon_size:
+            self.update_size(icon_size)
+        self.reload_from_config(reset_cache=False)
+
+    # Drops what a hidden pooled DesktopIcon does not need until it is bound to a cell again.
+    def release(self):
+        self.hover_timer.stop()
+        if self.animation:
+            get_animation_clock().unsubscribe(self)
+            self.animation = None
+        self.pixmap = None
+        self.pixmap_request = None
+        self.log_paints = False
+        self.dragging = False
+
+    # Re-reads the resolved style, only icons whose label actually changed (those using the global font size / color) redo any work.
+    def on_settings_changed(self, change):
+        style = get_icon_style(self.row, self.col)
+        if style.font_family != self.font_family or style.font_size != self.font_size:
+            self.font_family = style.font_family
+            self.font_size = style.font_size
+            # Label height changes with the font.
+            self.prepareGeometryChange()
+            self.update_font()
+        if style.font_color != self.font_color:
+            self.update_font_color(style.font_color)
+
     def update_font(self, font_size= None):
         if font_size == None:
-            self.font = QFont(get_setting("font", "Arial"), self.font_size)
+            self.font = QFont(self.font_family, self.font_size)
         else:
             print(f"using custom font size")
-            self.font = QFont(get_setting("font", "Arial"), font_size)
+            self.font = QFont(self.font_family, font_size)
+        self.label_layout = None
         self.update()
 
     def update_font_color(self, font_color= None):
         self.font_color = font_color
+        self.label_layout = None
         self.update()
 
 
     def update_size(self, new_size):
-        self.icon_size = new_size
         self.prepareGeometryChange()
+        self.icon_size = new_size
+        self.label_layout = None
+        if self.animation:
+            # Frames are pre-scaled, switch to the frames for the new size.
+            self.init_animation()
 
     def boundingRect(self) -> QRectF:
-        self.text_height = self.calculate_text_height(self.name)
+        self.text_height = self.get_label_layout().text_height
         return QRectF(0, 0, self.icon_size, self.icon_size + self.text_height + self.padding)
+
+    def get_label_layout(self):
+        if self.label_layout is None:
+            self.label_layout = get_label_layout(self.name, self.font, self.font_color, self.icon_size, self.icon_size + self.padding / 2)
+        return self.label_layout
     
 
-    # reset_cache variable defaults to false, when True will place the new icon into cache and discard old icon.
+    # reset_cache variable defaults to false, when True drops every cached size of this icon_path before loading it.
+    # Blobs are content addressed and never rewritten, so their cached pixmaps are never stale and are kept.
     def load_pixmap(self, reset_cache=False):
-        if self.movie:
+        if self.animation:
             return
         if self.icon_path and os.path.exists(self.icon_path):
-            cached_pixmap = QPixmapCache.find(self.icon_path)
-            # If cached pixmap is found and function called without an override to reset the cached version, load from cache.
-            # Else, get the new pixmap from path, and store it.
-            if cached_pixmap and not reset_cache:
-                logger.debug(f"Cached pixmap found for {self.icon_path}")
-                self.pixmap = cached_pixmap
-            else:
-                self.pixmap = QPixmap(self.icon_path)
-                if self.pixmap.isNull():
-                    logger.error(f"Failed to load pixmap from {self.icon_path}")
-                    self.load_unknown_pixmap()
-                else:
-                    self.pixmap = self.pixmap.scaled(
-                        self.icon_size - 4,
-                        self.icon_size - 2,
-                        Qt.KeepAspectRatio,
-                        Qt.SmoothTransformation
-                    )
-                    QPixmapCache.insert(self.icon_path, self.pixmap)  # Cache the loaded pixmap
+            if reset_cache and not is_blob_path(self.icon_path):
+                invalidate_path(self.icon_path)
+            # Decoded on a worker pool (icon_loader.py) and cached per (path, mtime, size) in pixmap_cache.py.
+            # Already cached pixmaps arrive immediately, otherwise a placeholder is shown until the decode finishes.
+            # Blob icons are decoded from their nearest mipmap level, so a new icon_size never re-decodes the full source.
+            request = object()
+            self.pixmap_request = request
+            self.pixmap = None
+            load_scaled_pixmap_async(self.icon_path, self.icon_size - 4, self.icon_size - 2,
+                                     lambda pixmap, request=request: self.on_pixmap_loaded(pixmap, request))
+            if self.pixmap is None:
+                self.pixmap = get_placeholder_pixmap(self.icon_size - 4, self.icon_size - 2)
             self.update()
         else:
+            self.pixmap_request = None
             if self.icon_path != "":
                 logger.warning(f"Invalid icon path for icon at {self.row}, {self.col}: {self.icon_path} Loading unknown.png instead")
             self.load_unknown_pixmap()
 
+    def on_pixmap_loaded(self, pixmap, request):
+        if request is not self.pixmap_request:
+            return
+        self.pixmap_request = None
+        if pixmap.isNull():
+            self.load_unknown_pixmap()
+        else:
+            self.pixmap = pixmap
+            self.update()
+
     def load_unknown_pixmap(self):
         unknown_path = "assets/images/unknown.png"
         if os.path.exists(unknown_path):
-            self.pixmap = QPixmap(unknown_path)
+            self.pixmap = get_scaled_pixmap(unknown_path, self.icon_size - 4, self.icon_size - 2)
             if self.pixmap.isNull():
                 logger.error(f"Failed to load unknown.png")
-            else:
-                self.pixmap = self.pixmap.scaled(
-                        self.icon_size - 4,
-                        self.icon_size - 2,
-                        Qt.KeepAspectRatio,
-                        Qt.SmoothTransformation
-                )
-                QPixmapCache.insert("unknown", self.pixmap)
         else:
             logger.error(f"unknown.png not found at {unknown_path}")
         self.update()
@@ -160,20 +211,20 @@ class DesktopIcon(QGraphicsItem):
             self.paints += 1
 
         if not is_default(self.row, self.col):
-            if self.movie:
-                # Get the current frame and draw it
-                frame = self.movie.currentPixmap()
-                if not frame.isNull():
-                    scaled_frame = frame.scaled(self.icon_size - 4, self.icon_size - 2, 
-                                             Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    x_offset = (self.icon_size - scaled_frame.width()) / 2
-                    y_offset = (self.icon_size - scaled_frame.height()) / 2
-                    painter.drawPixmap(x_offset, y_offset, scaled_frame)
+            if self.animation:
+                # Get the current (already scaled) frame from the shared animation clock and draw it
+                frame = get_animation_clock().current_frame(self)
+                if frame is not None and not frame.isNull():
+                    frame_size = frame.deviceIndependentSize()
+                    x_offset = (self.icon_size - frame_size.width()) / 2
+                    y_offset = (self.icon_size - frame_size.height()) / 2
+                    painter.drawPixmap(x_offset, y_offset, frame)
                 else:
                     logger.error(f"Warning: Frame: {frame} is null.")
             elif self.pixmap and not self.pixmap.isNull():
-                x_offset = (self.icon_size - self.pixmap.width()) / 2
-                y_offset = (self.icon_size - self.pixmap.height()) / 2
+                pixmap_size = self.pixmap.deviceIndependentSize()
+                x_offset = (self.icon_size - pixmap_size.width()) / 2
+                y_offset = (self.icon_size - pixmap_size.height()) / 2
                 painter.drawPixmap(x_offset, y_offset, self.pixmap)
             else:
                 logger.warning(f"No valid pixmap for {self.row}, {self.col}")
@@ -185,115 +236,26 @@ class DesktopIcon(QGraphicsItem):
 
         # If the user has set the font size to 0, do not render the text.
         if self.font_size > 0:
-            painter.setFont(self.font)
-
-            lines = self.get_multiline_text(self.font, self.name)
-
-            # Define the outline color and main text color
-            outline_color = QColor(0, 0, 0)  # Black outline Eventually will have a setting
-
-            text_color = QColor(self.font_color)
-
-            for i, line in enumerate(lines):
-                text_y = self.icon_size + self.padding / 2 + i * 15
-
-                # Create a QPainterPath for the text outline
-                path = QPainterPath()
-                path.addText(0, text_y, self.font, line)
-
-                # Draw the text outline with a thicker pen
-                painter.setPen(QColor(outline_color))
-                painter.setBrush(Qt.NoBrush)
-                painter.setPen(QPen(outline_color, 4, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)) # 4 = pixels of outline eventually will have a setting
-                painter.drawPath(path)
-
-                # Draw the main text in the middle
-                painter.setPen(text_color)
-                painter.drawText(0, text_y, line)
+            # Wrapped and outlined once per name/font/color/size in label_cache.py
+            label_layout = self.get_label_layout()
+            if label_layout.pixmap is not None:
+                painter.drawPixmap(label_layout.offset, label_layout.pixmap)
 
                 
 
-    def init_movie(self):
+    def init_animation(self):
+        clock = get_animation_clock()
         if self.icon_path.lower().endswith('.gif'):
             logger.info(f"Loading GIF: {self.icon_path}")
-            self.movie = QMovie(self.icon_path)
-            if not self.movie.isValid():
-                logger.error("Error: GIF failed to load.")
-                self.movie = None
-                return
-
-            self.movie.frameChanged.connect(self.on_frame_changed)
-            self.movie.start()
+            # One decode per GIF and size shared by every icon, advanced by the global animation clock.
+            self.animation = clock.subscribe(self, self.icon_path, self.icon_size - 4, self.icon_size - 2)
         else:
-            self.movie = None
-    
-    def on_frame_changed(self, frame):
-        if frame != -1:
-            self.update() 
+            if self.animation:
+                clock.unsubscribe(self)
+            self.animation = None
 
         
 
-    def calculate_text_height(self, text):
-        font_metrics = QFontMetrics(self.font)
-        lines = self.get_multiline_text(font_metrics, text)
-        return len(lines) * 15
-
-    def get_multiline_text(self, font, text):
-        font_metrics = QFontMetrics(font)
-        words = text.split()
-        lines = []
-        current_line = ""
-
-        max_lines = 3
-
-        for word in words:
-            if len(lines) > max_lines:
-                break
-            # Handle long words that exceed the icon size
-            while font_metrics.boundingRect(word).width() > self.icon_size:
-                if len(lines) > max_lines:
-                    break
-                for i in range(1, len(word)):
-                    if font_metrics.boundingRect(word[:i]).width() > self.icon_size:
-                        # Add the max length that fits to the current line
-                        lines.append(word[:i-1])
-                        # Continue processing the remaining part of the word
-                        word = word[i-1:]
-                        break
-                else:
-                    # This else is part of the for-else construct; it means the word fits entirely
-                    break
-
-            # Word fits within line
-            new_line = current_line + " " + word if current_line else word
-            if font_metrics.boundingRect(new_line).width() <= self.icon_size:
-                current_line = new_line
-            else:
-                lines.append(current_line)
-                current_line = word
-
-        if current_line:
-            lines.append(current_line)
-
-
-
-        # If we exceed the limit, cut it down to 3 lines + "..."
-        if len(lines) > max_lines:
-            # Cut it to max_lines (total) lines
-            lines = lines[:max_lines]
-
-            last_line = lines[max_lines -1]
-            # Make sure the last line fits with the "..." within the icon size
-            while font_metrics.boundingRect(last_line + "...").width() > self.icon_size:
-                last_line = last_line[:-1]  # Remove one character at a time till it fits
-
-            last_line += "..."
-
-            lines = lines[:max_lines -1]  # Keep the lines < max lines
-            lines.append(last_line)
-
-        return lines
-    
     def show_tooltip(self):
         if self.last_pos:
             QToolTip.showText(
@@ -338,16 +300,11 @@ class DesktopIcon(QGraphicsItem):
             self.last_pos = None
         super().hoverMoveEvent(event)
 
+    # Text area is the icon_size wide strip of text_height directly below the image.
     def hover_in_text_area(self, pos):
         if self.text_height == 0:
             return False
-        bottom_rect = QRectF(
-            0,
-            self.boundingRect().height() - self.text_height - self.padding,
-            self.boundingRect().width(),
-            self.text_height
-        )
-        return bottom_rect.contains(pos)
+        return 0 <= pos.x() <= self.icon_size and self.icon_size <= pos.y() <= self.icon_size + self.text_height
 
 
     def double_click(self, event):
@@ -380,7 +337,8 @@ class DesktopIcon(QGraphicsItem):
     
     def launch_first_found(self):
         logger.info("launch option = 0")
-        return self.run_executable() or self.run_website_link()
+        # If the executable fails after it was started in the background fall back to the website link then.
+        return self.run_executable(fallback=self.get_website_link_fallback()) or self.run_website_link()
     def launch_prio_web_link(self):
         logger.info("launch option = 1")
         return self.run_website_link() or self.run_executable()
@@ -394,7 +352,8 @@ class DesktopIcon(QGraphicsItem):
         logger.info("launch option = 4")
         return self.run_website_link()
 
-    def run_executable(self):
+    # fallback is called if the executable fails after being started (see util/launcher.py)
+    def run_executable(self, fallback=None):
         #returns running = true if runs program, false otherwise
         running = False
 
@@ -427,27 +386,9 @@ class DesktopIcon(QGraphicsItem):
                 running = True
                 os.startfile(file_path)
             else:
-                try:
-
-                    #when shell=True exceptions like FileNotFoundError are no longer raised but put into stderr
-                    process = subprocess.Popen(command, shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-                    running = True
-                    stdout, stderr = process.communicate(timeout=0.5)
-                    
-
-                    text = stderr.decode('utf-8')
-                    if "is not recognized as an internal or external command" in text:
-                        running = False
-                        
-                        logger.error(f"Error opening file, Seems like user does not have a default application for this file type and windows is not popping up for them to select a application to open with., path = {self.executable_path}")
-                        self.show_warning_count += 1
-                        display_no_default_type_error(self.executable_path)
-                    
-                #kill the connection between this process and the subprocess we just launched.
-                #this will not kill the subprocess but just set it free from the connection
-                except Exception as e:
-                    logger.info("killing connection to new subprocess")
-                    process.kill()
+                # Started and watched for an early exit on a worker thread, failures are reported through launcher.launch_failed to DesktopGrid.
+                get_launcher().launch(command, self.executable_path, fallback)
+                running = True
 
         except Exception as e:
             logger.error(f"An error occurred: {e}")
@@ -455,21 +396,17 @@ class DesktopIcon(QGraphicsItem):
         
     def run_website_link(self):
         logger.info("run_web_link attempted")
-        running = True
-        url = self.website_link
-
-        if(url == ""): 
-            running = False
-            return running
-        #append http:// to website to get it to open as a web link
-        #for example google.com will not open as a link, but www.google.com, http://google.com, www.google.com all will, even http://google will open in the web browser (it just won't put you at google.com)
-        elif not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
-        
-        os.startfile(url)
+        running = open_website_link(self.website_link)
         logger.info(f"Run website link running status = {running}")
         return running
 
+    # Website link as it is now, the icon may be pointed at another cell by the time a background launch fails.
+    def get_website_link_fallback(self):
+        website_link = self.website_link
+        if website_link == "":
+            return None
+        return lambda: open_website_link(website_link)
+
     
     def choose_launch(self):
         
@@ -605,15 +542,15 @@ class DesktopIcon(QGraphicsItem):
         
     
     def delete_folder_items(self):
+        if not self.entry_id:
+            logger.warning(f"No entry id for {self.row}, {self.col}, no data folder to delete.")
+            return
         # Check if the directory exists
-        data_directory = get_data_directory()
-        folder_path = os.path.join(data_directory, f'[{self.row}, {self.col}]')
+        folder_path = get_entry_data_path(self.entry_id)
         if os.path.exists(folder_path) and os.path.isdir(folder_path):
-            # Loop through all the items in the directory
-            for item in os.listdir(folder_path):
-                item_path = os.path.join(folder_path, item)
-                logger.info(f"Deleting ITEM = {item_path}")
-                send2trash.send2trash(item_path)
+            # The folder belongs only to this entry (keyed by its id), so trash it as a whole.
+            logger.info(f"Deleting folder = {folder_path}")
+            send2trash.send2trash(folder_path)
         else:
             logger.warning(f"{folder_path} does not exist or is not a directory.")
 
@@ -638,8 +575,8 @@ class DesktopIcon(QGraphicsItem):
     def update_icon_path(self, icon_path):
         if self.icon_path != icon_path:
             self.icon_path = icon_path
-            self.init_movie()
-        if not self.movie:
+            self.init_animation()
+        if not self.animation:
             self.load_pixmap(reset_cache=True)
         self.update()
 
@@ -649,7 +586,9 @@ class DesktopIcon(QGraphicsItem):
             self.distance = 0
             self.dragging = True
             self.start_pos = event.pos()  # Store the initial position
-            self.preview_pixmap_item = QGraphicsPixmapItem(self.pixmap)
+            # Same cached pixmap the icon paints (GIFs use their first frame) so dragging never decodes the file again.
+            preview_pixmap = self.animation.frames[0] if self.animation else self.pixmap
+            self.preview_pixmap_item = QGraphicsPixmapItem(preview_pixmap)
             self.preview_pixmap_item.setOpacity(0.6)
             self.preview_pixmap_item.setZValue(1000)
             self.preview_pixmap_item.hide()
@@ -662,7 +601,7 @@ class DesktopIcon(QGraphicsItem):
             self.distance = (event.pos() - self.start_pos).manhattanLength()
             if self.distance > 5:  # A threshold to consider as dragging
                 self.setCursor(Qt.ClosedHandCursor) 
-                self.preview_pixmap_item.setPos(event.scenePos() - self.pixmap.rect().center())
+                self.preview_pixmap_item.setPos(event.scenePos() - self.preview_pixmap_item.boundingRect().center())
                 self.scene().addItem(self.preview_pixmap_item)
                 self.preview_pixmap_item.show()
 
@@ -724,3 +663,14 @@ class DesktopIcon(QGraphicsItem):
         view = self.scene().views()[0]
         view.show_grid_menu(self.row, self.col, file_path)
 
+
+def open_website_link(url):
+    if(url == ""): 
+        return False
+    #append http:// to website to get it to open as a web link
+    #for example google.com will not open as a link, but www.google.com, http://google.com, www.google.com all will, even http://google will open in the web browser (it just won't put you at google.com)
+    elif not url.startswith(('http://', 'https://')):
+        url = 'http://' + url
+    
+    os.startfile(url)
+    return True
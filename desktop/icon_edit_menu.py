@@ -5,15 +5,10 @@ from PySide6.QtGui import QDragEnterEvent, QDropEvent, QColor
 from PySide6.QtCore import QSize, Qt
 from util.utils import ClearableLineEdit
 from icon_gen.icon_utils import get_exact_img_file, make_local_icon
-from icon_gen.extract_ico_file import extract_ico_file
-from icon_gen.lnk_to_image import lnk_to_image
-from icon_gen.exe_to_image import exe_to_image
-from icon_gen.url_to_image import url_to_image
-from icon_gen.icon_selection import select_icon_from_paths
-from icon_gen.favicon_to_image import favicon_to_image
-from icon_gen.browser_to_image import browser_to_image
-from icon_gen.default_icon_to_image import default_icon_to_image
-from util.config import (load_desktop_config, entry_exists, get_entry, save_config_to_file, get_data_directory, get_icon_font_size, get_icon_font_color)
+from icon_gen.auto_gen import build_auto_gen_jobs
+from icon_gen.icon_selection import select_icon_from_auto_gen
+from icon_gen.batch_regen import record_auto_gen_source
+from util.config import (entry_exists, get_entry, get_entry_id, save_entry, transaction, get_data_directory, get_icon_font_size, get_icon_font_color)
 from util.settings import get_setting
 from menus.display_warning import display_lnk_cli_args_warning, display_icon_path_not_exist_warning, display_executable_file_path_warning, display_icon_path_already_exists_warning
 import os
@@ -34,6 +29,8 @@ class Menu(QDialog):
 
         ROW = row
         COL = col
+        # Data folder for this entry is keyed by its id. New entries get their id now so icons can be generated before saving.
+        self.entry_id = get_entry_id(ROW, COL)
         self.font_size_changed = False
         self.font_color_changed = False
         # Tracker to set font_size back to default if "Reset" button pressed.
@@ -184,15 +181,15 @@ class Menu(QDialog):
         global LAUNCH_OPTIONS
         entry = get_entry(ROW, COL)
         if entry:
-            self.name_le.setText(entry['name'])
-            self.icon_path_le.setText(entry['icon_path'])
-            self.exec_path_le.setText(entry['executable_path'])
-            self.web_link_le.setText(entry['website_link'])
-            self.command_args_le.setText(entry['command_args'])
-            self.launch_option_cb.setCurrentIndex(entry['launch_option'])
-            self.use_global_font_size = entry.get('use_global_font_size', True)
-            self.use_global_font_color = entry.get('use_global_font_color', True)
-            LAUNCH_OPTIONS = entry['launch_option']
+            self.name_le.setText(entry.name)
+            self.icon_path_le.setText(entry.icon_path)
+            self.exec_path_le.setText(entry.executable_path)
+            self.web_link_le.setText(entry.website_link)
+            self.command_args_le.setText(entry.command_args)
+            self.launch_option_cb.setCurrentIndex(entry.launch_option)
+            self.use_global_font_size = entry.use_global_font_size
+            self.use_global_font_color = entry.use_global_font_color
+            LAUNCH_OPTIONS = entry.launch_option
         else:
             self.use_global_font_size = True
             self.use_global_font_color = True
@@ -303,134 +300,18 @@ class Menu(QDialog):
         self.parent().draw_red_border(ROW, COL)
 
     def auto_gen_icon(self):
-        self.parent().set_cursor(Qt.BusyCursor) 
-        data_path = self.parent().get_data_icon_dir(ROW, COL)
+        data_path = self.parent().get_data_icon_dir(self.entry_id)
         icon_size = self.parent().get_autogen_icon_size()
 
-        #default icon saves:
-        # icon.png extract_ico_file, url_to_image (unique, getting image from .url file does not check for .ico files in location)
-        # icon2.png exe_to_image, lnk_to_image (both share the same executable_path input so one or the other.)
-        # icon3.png favicon_to_image, browser_to_image (gets favicon from website, fallback to default browser icon if no favicon found)
-        # icon4.png default_icon_to_image (gets icon from default associated filetype program, only exists if exec_path is not .exe, .url, .lnk)
-
-        icon_path = os.path.join(data_path, "icon.png")
-        icon2_path = os.path.join(data_path, "icon2.png")
-        icon3_path = os.path.join(data_path, "icon3.png")
-        icon4_path = os.path.join(data_path, "icon4.png")
-
-        ico_file = False
-        lnk_file = False
-        exe_file = False
-        url_file = False
-        fav_file = False
-        default_file = False
-        path_ico_icon = ""
-        path_exe_icon = ""
-        path_lnk_icon = ""
-        path_url_icon = ""
-        path_fav_icon = ""
-        path_default_file_icon = ""
-
         logger.info(f"Auto gen icon called, data path = {data_path}, icon size = {icon_size}")
 
-        if self.exec_path_le.text() != "" and os.path.isfile(self.exec_path_le.text()) and extract_ico_file(self.exec_path_le.text(), icon_path, icon_size):
-            ico_file = True
-            path_ico_icon = icon_path
-            logger.info(f"Found .ico file in executable path location, saved to: {path_ico_icon}")
-
-        # If no icon path and exec is .lnk
-        if self.icon_path_le.text() == "" and self.exec_path_le.text().endswith(".lnk"):
-            logger.info(f"Exec path is an .lnk")
-            path_ico_icon, path_lnk_icon = lnk_to_image(self.exec_path_le.text(), icon2_path, icon_size)
-
-            if path_lnk_icon != None:
-                logger.info(f"Found icon from lnk target, saved to: {path_lnk_icon}")
-                lnk_file = True
-            if path_ico_icon != None:
-                logger.info(f"Found .ico file from lnk target, saved to: {path_ico_icon}")
-                ico_file = True
-        
-        # If no icon path and exec is .exe
-        elif self.icon_path_le.text() == "" and self.exec_path_le.text().endswith(".exe"):
-            logger.info("Exec path is an .exe")
-            if os.path.isfile(self.exec_path_le.text()):
-                path_exe_icon = exe_to_image(self.exec_path_le.text(), icon2_path, icon_size)  
-                if path_exe_icon != None:
-                    logger.info(f"Found icon from .exe, saved to: {path_exe_icon}")
-                    exe_file = True
-            else:
-                logger.warning(f"Auto gen icon called on non-existing executable_path ending in .exe = {self.exec_path_le.text()}, Caught and not generating an icon for executable path.")
-
-        # If no icon path and exec is a .url
-        elif self.icon_path_le.text() == "" and self.exec_path_le.text().endswith(".url"):
-            logger.info("Exec path is a .url")
-            path_ico_icon = url_to_image(self.exec_path_le.text(), icon_path, icon_size)
-
-            if path_ico_icon != None:
-                logger.info(f"Found icon from .url, saved to: {path_ico_icon}")
-                ico_file = True
-
-        # If no icon path and exec_path exists
-        elif self.icon_path_le.text() == "" and self.exec_path_le.text() != "":
-            logger.info(f"Exec path is not .lnk or .exe: {self.exec_path_le.text()}, generating a default icon")
-            if os.path.isfile(self.exec_path_le.text()):
-                path_default_file_icon = default_icon_to_image(self.exec_path_le.text(), icon4_path, icon_size)
-                if path_default_file_icon != None:
-                    logger.info(f"Icon created from default, saved to: {path_default_file_icon}")
-                    default_file = True
-            else:
-                logger.warning(f"Auto gen icon called on non-existing executable_path = {self.exec_path_le.text()}, Caught and not generating an icon for executable path.")
-
-        # If Web link exists
-        if self.web_link_le.text() != "":
-            logger.info("Web link exists, attempting to generate icon.")
-            url = self.web_link_le.text()
-            if not url.startswith(('http://', 'https://')):
-                url = 'http://' + url
-            
-            path_fav_icon = favicon_to_image(url, icon3_path, icon_size)
-            if path_fav_icon != None:
-                logger.info(f"Icon created from favicon, saved to {path_fav_icon}")
-                fav_file = True
-            #if it fails to create a favicon fallback
-            else:
-                #create a default browser icon for links
-                path_fav_icon = browser_to_image(icon3_path, icon_size)
-                if path_fav_icon != None:
-                    logger.info(f"Favicon not found, created default browser image instead, saved to {path_fav_icon}")
-                    fav_file = True
-
-        # Done loading time for selection.
-        self.parent().set_cursor(Qt.ArrowCursor) 
-
-        if self.has_multiple_icons(path_ico_icon, path_exe_icon, path_lnk_icon, path_url_icon, path_fav_icon, path_default_file_icon):
-            logger.info(f"Multiple icons detected: ico:{path_ico_icon}, exe:{path_exe_icon}, lnk:{path_lnk_icon}, url:{path_url_icon}, fav:{path_fav_icon}, default:{path_default_file_icon}")
-            icon_selected = select_icon_from_paths(path_ico_icon, path_exe_icon, path_lnk_icon, path_url_icon, path_fav_icon, path_default_file_icon)
-            logger.info(f"Icon selected by user: {icon_selected}")
+        # Every source (see icon_gen/auto_gen.py) runs concurrently, candidates stream into the selection dialog as they are generated.
+        # If only one icon is generated it is picked without asking.
+        jobs = build_auto_gen_jobs(self.exec_path_le.text(), self.web_link_le.text(), data_path, icon_size)
+        icon_selected = select_icon_from_auto_gen(jobs)
+        logger.info(f"Icon selected: {icon_selected}")
+        if icon_selected:
             self.icon_path_le.setText(icon_selected)
-        elif ico_file:
-            logger.info(f"Only available icon is ico_icon: {path_ico_icon}")
-            self.icon_path_le.setText(path_ico_icon)
-        elif lnk_file:
-            logger.info(f"Only available icon is lnk_icon: {path_lnk_icon}")
-            self.icon_path_le.setText(path_lnk_icon)
-        elif exe_file:
-            logger.info(f"Only available icon is exe_icon: {path_exe_icon}")
-            self.icon_path_le.setText(path_exe_icon)
-        elif url_file:
-            logger.info(f"Only available icon is url_icon: {path_url_icon}")
-            self.icon_path_le.setText(path_url_icon)
-        elif fav_file:
-            logger.info(f"Only available icon is fav_icon: {path_fav_icon}")
-            self.icon_path_le.setText(path_fav_icon)
-        elif default_file:
-            logger.info(f"Only available icon is default_file_icon: {path_default_file_icon}")
-            self.icon_path_le.setText(path_default_file_icon)
-
-    def has_multiple_icons(self, *variables):
-
-        non_empty_count = sum(1 for arg in variables if arg is not None and arg != "")
-        return non_empty_count >= 2
 
 
     #last minute checks before saving
@@ -439,12 +320,13 @@ class Menu(QDialog):
         #ensure clean paths for icon_path and executable_path
         self.cleanup_path()
 
-        if get_setting("local_icons"):
-            if os.path.isfile(self.icon_path_le.text()) == True:
-                data_directory = get_data_directory()
-                # if icon does not start with the default data directory
-                if not self.icon_path_le.text().startswith(data_directory):
-                    new_dir = make_local_icon(self.icon_path_le.text(), self.parent().get_data_icon_dir(ROW,COL))
+        if os.path.isfile(self.icon_path_le.text()) == True:
+            data_directory = get_data_directory()
+            # Icons in the data directory (auto generated) always go into the blob store, icons elsewhere only with the local_icons setting.
+            if get_setting("local_icons") or self.icon_path_le.text().startswith(data_directory):
+                new_dir = make_local_icon(self.icon_path_le.text())
+                if new_dir:
+                    record_auto_gen_source(self.icon_path_le.text(), new_dir)
                     self.icon_path_le.setText(new_dir)
 
         #.lnks do not have command line arguments supported (possible but annoying to implement)
@@ -463,24 +345,25 @@ class Menu(QDialog):
                 
 
     def save(self):
-        config = load_desktop_config()
-
-        if entry_exists(ROW, COL) == True:
-            new_config = self.edit_entry(config)
-        else:
-            new_config = self.add_entry(config)
-            
-        save_config_to_file(new_config)
+        # Reading the current entry and saving the edited one happen under one transaction, so no other edit lands in between.
+        with transaction():
+            if entry_exists(ROW, COL) == True:
+                entry = self.edit_entry(get_entry(ROW, COL))
+            else:
+                entry = self.add_entry()
+                
+            save_entry(entry)
         self.parent().add_icon(ROW, COL)
         self.close()
 
             
-    def add_entry(self, config):
+    def add_entry(self):
 
         font_size, font_color = self.is_non_default_font()
         print(f"font_size {font_size}, font_color {font_color}")
 
         new_entry = {
+        "id": self.entry_id,
         "row": ROW,
         "column": COL,
         "name": self.name_le.text(),
@@ -494,28 +377,25 @@ class Menu(QDialog):
         "font_color": self.font_color,
         "use_global_font_color": font_color
         }
-        config.append(new_entry)
-        return config
+        return new_entry
 
 
-    def edit_entry(self, config):
+    def edit_entry(self, entry):
         font_size, font_color = self.is_non_default_font()
         print(f"font_size {font_size}, font_color {font_color}")
 
-        for item in config:
-            if item['row'] == ROW and item['column'] == COL:
-                item['name'] = self.name_le.text()
-                item['icon_path'] = self.icon_path_le.text()
-                item['executable_path'] = self.exec_path_le.text()
-                item['command_args'] = self.command_args_le.text()
-                item["website_link"] = self.web_link_le.text()
-                item["launch_option"] = self.launch_option_cb.currentIndex()
-                item['font_size'] = self.font_size_sb.value()
-                item['use_global_font_size'] = font_size
-                item['font_color'] = self.font_color
-                item['use_global_font_color'] = font_color
-                break
-        return config
+        item = entry.to_dict()
+        item['name'] = self.name_le.text()
+        item['icon_path'] = self.icon_path_le.text()
+        item['executable_path'] = self.exec_path_le.text()
+        item['command_args'] = self.command_args_le.text()
+        item["website_link"] = self.web_link_le.text()
+        item["launch_option"] = self.launch_option_cb.currentIndex()
+        item['font_size'] = self.font_size_sb.value()
+        item['use_global_font_size'] = font_size
+        item['font_color'] = self.font_color
+        item['use_global_font_color'] = font_color
+        return item
 
 
     def dragEnterEvent(self, event: QDragEnterEvent):
@@ -553,7 +433,7 @@ class Menu(QDialog):
         logger.info(f"Selected index: {index}, option: {self.launch_option_cb.currentText()}")
     
     def upscale_ico(self, file_path):
-        data_path = self.parent().get_data_icon_dir(ROW,COL)
+        data_path = self.parent().get_data_icon_dir(self.entry_id)
         output_path = os.path.join(data_path, "icon.png")
         icon_size = self.parent().get_autogen_icon_size()
 
@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import QGraphicsView, QGraphicsPixmapItem
 from PySide6.QtGui import QPixmap, QTransform
-from util.settings import get_setting
+from util.settings import get_setting, subscribe
 import logging
 
 
@@ -19,7 +19,15 @@ class ImageBackgroundManager:
         self.pixmap_width = 0
         self.pixmap_height = 0
         self.parent = parent
+        subscribe(self.on_settings_changed, ("image_x_offset", "image_y_offset", "image_zoom", "bg_z_order"))
 
+    def on_settings_changed(self, change):
+        if not self.background_item:
+            return
+        if "bg_z_order" in change:
+            self.set_z_value(-3 if get_setting("bg_z_order", 0) == 0 else -1)
+        if change.touches("image_x_offset", "image_y_offset", "image_zoom"):
+            self.update_from_settings()
     def load_background(self, image_path: str):
         # If there's an existing background, remove it
         if self.background_item:
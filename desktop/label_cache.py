@@ -0,0 +1,142 @@
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QColor, QFontMetrics, QPixmap, QPainterPath, QPen, QGuiApplication
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Wrapped lines and pre-rendered outlined label pixmaps for DesktopIcon names.
+# Keyed on (name, font family, font size, font color, icon_size, baseline, device pixel ratio) so paint is a single drawPixmap.
+LABEL_CACHE = OrderedDict()
+# Least recently used labels are dropped past this many entries.
+MAX_CACHED_LABELS = 1024
+
+LINE_HEIGHT = 15
+MAX_LINES = 3
+OUTLINE_WIDTH = 4 # pixels of outline eventually will have a setting
+OUTLINE_COLOR = QColor(0, 0, 0) # Black outline Eventually will have a setting
+
+
+class LabelLayout:
+    def __init__(self, lines, pixmap, offset):
+        self.lines = lines
+        self.text_height = len(lines) * LINE_HEIGHT
+        # Outlined label, None if there is nothing to draw.
+        self.pixmap = pixmap
+        # Where to draw pixmap inside the DesktopIcon
+        self.offset = offset
+
+
+# Returns the cached LabelLayout for a DesktopIcon name, wrapping and rendering it on a cache miss.
+# baseline_y is where the first line's baseline sits inside the DesktopIcon.
+def get_label_layout(name, font, font_color, icon_size, baseline_y):
+    dpr = QGuiApplication.instance().devicePixelRatio() if QGuiApplication.instance() else 1.0
+    key = (name, font.family(), font.pointSize(), font_color, icon_size, baseline_y, dpr)
+
+    layout = LABEL_CACHE.get(key)
+    if layout is not None:
+        LABEL_CACHE.move_to_end(key)
+        return layout
+
+    lines = get_multiline_text(QFontMetrics(font), name, icon_size)
+    pixmap, offset = render_label(lines, font, font_color, icon_size, baseline_y, dpr)
+    layout = LabelLayout(lines, pixmap, offset)
+
+    LABEL_CACHE[key] = layout
+    if len(LABEL_CACHE) > MAX_CACHED_LABELS:
+        LABEL_CACHE.popitem(last=False)
+    return layout
+
+def render_label(lines, font, font_color, icon_size, baseline_y, dpr):
+    if not lines or font.pointSize() <= 0:
+        return None, QPointF(0, 0)
+
+    font_metrics = QFontMetrics(font)
+    margin = OUTLINE_WIDTH
+    width = icon_size + margin * 2
+    height = font_metrics.ascent() + (len(lines) - 1) * LINE_HEIGHT + font_metrics.descent() + margin * 2
+
+    pixmap = QPixmap(int(width * dpr), int(height * dpr))
+    pixmap.setDevicePixelRatio(dpr)
+    pixmap.fill(Qt.transparent)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.TextAntialiasing)
+    painter.setFont(font)
+    text_color = QColor(font_color)
+    outline_pen = QPen(OUTLINE_COLOR, OUTLINE_WIDTH, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+
+    for i, line in enumerate(lines):
+        text_y = margin + font_metrics.ascent() + i * LINE_HEIGHT
+
+        # Create a QPainterPath for the text outline
+        path = QPainterPath()
+        path.addText(margin, text_y, font, line)
+
+        # Draw the text outline with a thicker pen
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(outline_pen)
+        painter.drawPath(path)
+
+        # Draw the main text in the middle
+        painter.setPen(text_color)
+        painter.drawText(margin, text_y, line)
+    painter.end()
+
+    return pixmap, QPointF(-margin, baseline_y - font_metrics.ascent() - margin)
+
+def get_multiline_text(font_metrics, text, max_width):
+    words = text.split()
+    lines = []
+    current_line = ""
+
+    max_lines = MAX_LINES
+
+    for word in words:
+        if len(lines) > max_lines:
+            break
+        # Handle long words that exceed the icon size
+        while font_metrics.boundingRect(word).width() > max_width:
+            if len(lines) > max_lines:
+                break
+            for i in range(1, len(word)):
+                if font_metrics.boundingRect(word[:i]).width() > max_width:
+                    # Add the max length that fits to the current line
+                    lines.append(word[:i-1])
+                    # Continue processing the remaining part of the word
+                    word = word[i-1:]
+                    break
+            else:
+                # This else is part of the for-else construct; it means the word fits entirely
+                break
+
+        # Word fits within line
+        new_line = current_line + " " + word if current_line else word
+        if font_metrics.boundingRect(new_line).width() <= max_width:
+            current_line = new_line
+        else:
+            lines.append(current_line)
+            current_line = word
+
+    if current_line:
+        lines.append(current_line)
+
+
+
+    # If we exceed the limit, cut it down to 3 lines + "..."
+    if len(lines) > max_lines:
+        # Cut it to max_lines (total) lines
+        lines = lines[:max_lines]
+
+        last_line = lines[max_lines -1]
+        # Make sure the last line fits with the "..." within the icon size
+        while font_metrics.boundingRect(last_line + "...").width() > max_width:
+            last_line = last_line[:-1]  # Remove one character at a time till it fits
+
+        last_line += "..."
+
+        lines = lines[:max_lines -1]  # Keep the lines < max lines
+        lines.append(last_line)
+
+    return lines
@@ -2,7 +2,7 @@ from PySide6.QtWidgets import QGraphicsEllipseItem
 from PySide6.QtCore import Qt, QTimer, QUrl, QSizeF
 from PySide6.QtGui import QColor, QTransform
 from PySide6.QtMultimedia import QMediaPlayer
-from util.settings import get_setting
+from util.settings import get_setting, subscribe
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,7 +36,13 @@ class VideoBackgroundManager:
         global MEDIA_PLAYER
         MEDIA_PLAYER = media_player
         self.parent = parent
+        subscribe(self.on_settings_changed, ("video_x_offset", "video_y_offset", "video_zoom"))
 
+    # Moves / zooms the playing video to the saved offsets, a video still loading applies them in init_center_point().
+    def on_settings_changed(self, change):
+        if self.video_item and self.aspect_ratio is not None and self.aspect_ratio > 0:
+            self.move_video(-1 * get_setting("video_x_offset", 0.00), get_setting("video_y_offset", 0.00))
+            self.zoom_video(get_setting("video_zoom", 1.00))
         
     def get_video_aspect_ratio(self):
         video_sink = MEDIA_PLAYER.videoSink()
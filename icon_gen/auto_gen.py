@@ -0,0 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from icon_gen.extract_ico_file import extract_ico_file
+from icon_gen.lnk_to_image import lnk_to_image
+from icon_gen.exe_to_image import exe_to_image
+from icon_gen.url_to_image import url_to_image
+from icon_gen.favicon_to_image import favicon_to_image
+from icon_gen.browser_to_image import browser_to_image
+from icon_gen.default_icon_to_image import default_icon_to_image
+import threading
+import tempfile
+import shutil
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Qt free icon candidate generation for the icon edit menu's auto generate icon.
+# Each source runs as a job on a worker pool and reports candidates as soon as they are written.
+
+#default icon saves:
+# icon.png extract_ico_file, url_to_image (unique, getting image from .url file does not check for .ico files in location)
+# icon2.png exe_to_image, lnk_to_image (both share the same executable_path input so one or the other.)
+# icon3.png favicon_to_image, browser_to_image (gets favicon from website, fallback to default browser icon if no favicon found)
+# icon4.png default_icon_to_image (gets icon from default associated filetype program, only exists if exec_path is not .exe, .url, .lnk)
+
+# Size icons are generated at (DesktopGrid.get_autogen_icon_size() and batch regeneration)
+AUTOGEN_ICON_SIZE = 256
+
+# Seconds to wait on each source before giving up on it.
+LOCAL_SOURCE_TIMEOUT = 15
+FAVICON_SOURCE_TIMEOUT = 30
+
+
+# Candidate kinds in the order they are preferred, the selection dialog preselects and batch regeneration picks the first one found.
+CANDIDATE_PRIORITY = ["ico", "lnk", "exe", "url", "fav", "default"]
+# Every job writes into its own hidden folder inside the data folder, candidates are moved into the data folder only while the run still wants them.
+STAGING_PREFIX = ".auto_gen_"
+
+
+class AutoGenJob:
+    def __init__(self, name, function, timeout, data_path):
+        self.name = name
+        # function(report, cancelled, output_directory) writes its files into output_directory and calls report(kind, path) for every candidate.
+        self.function = function
+        self.timeout = timeout
+        # Where reported candidates end up.
+        self.data_path = data_path
+
+
+# Returns the AutoGenJobs that apply to exec_path / web_link. Jobs that write the same file (icon.png) are chained into one job.
+def build_auto_gen_jobs(exec_path, web_link, data_path, icon_size):
+    jobs = []
+    exec_is_file = exec_path != "" and os.path.isfile(exec_path)
+
+    def extract_ico(report, cancelled, output_directory):
+        icon_path = os.path.join(output_directory, "icon.png")
+        if exec_is_file and extract_ico_file(exec_path, icon_path, icon_size):
+            logger.info(f"Found .ico file in executable path location, saved to: {icon_path}")
+            report("ico", icon_path)
+
+    # .lnk and .url also write icon.png so run them after the .ico search in the same job.
+    if exec_path.endswith(".lnk"):
+        def lnk_job(report, cancelled, output_directory):
+            extract_ico(report, cancelled, output_directory)
+            if cancelled.is_set():
+                return
+            logger.info(f"Exec path is an .lnk")
+            path_ico_icon, path_lnk_icon = lnk_to_image(exec_path, os.path.join(output_directory, "icon2.png"), icon_size)
+            if path_ico_icon != None:
+                logger.info(f"Found .ico file from lnk target, saved to: {path_ico_icon}")
+                report("ico", path_ico_icon)
+            if path_lnk_icon != None:
+                logger.info(f"Found icon from lnk target, saved to: {path_lnk_icon}")
+                report("lnk", path_lnk_icon)
+        jobs.append(AutoGenJob("lnk", lnk_job, LOCAL_SOURCE_TIMEOUT, data_path))
+
+    elif exec_path.endswith(".url"):
+        def url_job(report, cancelled, output_directory):
+            extract_ico(report, cancelled, output_directory)
+            if cancelled.is_set():
+                return
+            logger.info("Exec path is a .url")
+            path_ico_icon = url_to_image(exec_path, os.path.join(output_directory, "icon.png"), icon_size)
+            if path_ico_icon != None:
+                logger.info(f"Found icon from .url, saved to: {path_ico_icon}")
+                report("ico", path_ico_icon)
+        jobs.append(AutoGenJob("url", url_job, LOCAL_SOURCE_TIMEOUT, data_path))
+
+    else:
+        if exec_is_file:
+            jobs.append(AutoGenJob("ico", extract_ico, LOCAL_SOURCE_TIMEOUT, data_path))
+
+        if exec_path.endswith(".exe"):
+            if exec_is_file:
+                def exe_job(report, cancelled, output_directory):
+                    logger.info("Exec path is an .exe")
+                    path_exe_icon = exe_to_image(exec_path, os.path.join(output_directory, "icon2.png"), icon_size)
+                    if path_exe_icon != None:
+                        logger.info(f"Found icon from .exe, saved to: {path_exe_icon}")
+                        report("exe", path_exe_icon)
+                jobs.append(AutoGenJob("exe", exe_job, LOCAL_SOURCE_TIMEOUT, data_path))
+            else:
+                logger.warning(f"Auto gen icon called on non-existing executable_path ending in .exe = {exec_path}, Caught and not generating an icon for executable path.")
+
+        elif exec_path != "":
+            if exec_is_file:
+                def default_job(report, cancelled, output_directory):
+                    logger.info(f"Exec path is not .lnk or .exe: {exec_path}, generating a default icon")
+                    path_default_file_icon = default_icon_to_image(exec_path, os.path.join(output_directory, "icon4.png"), icon_size)
+                    if path_default_file_icon != None:
+                        logger.info(f"Icon created from default, saved to: {path_default_file_icon}")
+                        report("default", path_default_file_icon)
+                jobs.append(AutoGenJob("default", default_job, LOCAL_SOURCE_TIMEOUT, data_path))
+            else:
+                logger.warning(f"Auto gen icon called on non-existing executable_path = {exec_path}, Caught and not generating an icon for executable path.")
+
+    if web_link != "":
+        url = web_link
+        if not url.startswith(('http://', 'https://')):
+            url = 'http://' + url
+
+        def favicon_job(report, cancelled, output_directory):
+            icon3_path = os.path.join(output_directory, "icon3.png")
+            logger.info("Web link exists, attempting to generate icon.")
+            path_fav_icon = favicon_to_image(url, icon3_path, icon_size)
+            if path_fav_icon != None:
+                logger.info(f"Icon created from favicon, saved to {path_fav_icon}")
+            #if it fails to create a favicon fallback
+            elif not cancelled.is_set():
+                #create a default browser icon for links
+                path_fav_icon = browser_to_image(icon3_path, icon_size)
+                if path_fav_icon != None:
+                    logger.info(f"Favicon not found, created default browser image instead, saved to {path_fav_icon}")
+            if path_fav_icon != None:
+                report("fav", path_fav_icon)
+        jobs.append(AutoGenJob("favicon", favicon_job, FAVICON_SOURCE_TIMEOUT, data_path))
+
+    return jobs
+
+
+class AutoGenRun:
+    def __init__(self, jobs, on_candidate=None):
+        self.jobs = jobs
+        # on_candidate(kind, path) is called from worker threads as soon as a candidate is written.
+        self.on_candidate = on_candidate
+        self.candidates = {}
+        self.cancelled = threading.Event()
+        # Names of jobs that ran past their timeout, anything they write afterwards stays in their staging folder.
+        self.timed_out = set()
+        self.lock = threading.Lock()
+        self.executor = None
+
+    # Moves a candidate out of the job's staging folder into the data folder, unless the run was cancelled or the job timed out.
+    # Checked under the same lock timeouts are marked with, so a late job can never replace a file a newer run is producing.
+    def report(self, job, output_directory, kind, path):
+        with self.lock:
+            if self.cancelled.is_set() or job.name in self.timed_out:
+                logger.info(f"Ignoring {kind} candidate from {job.name}, no longer wanted: {path}")
+                return
+            if os.path.normcase(os.path.dirname(os.path.abspath(path))) == os.path.normcase(os.path.abspath(output_directory)):
+                final_path = os.path.join(job.data_path, os.path.basename(path))
+                try:
+                    os.replace(path, final_path)
+                except OSError as e:
+                    logger.error(f"Failed to move {path} to {final_path}: {e}")
+                    return
+                path = final_path
+            self.candidates[kind] = path
+        if self.on_candidate:
+            self.on_candidate(kind, path)
+
+    def run_job(self, job):
+        if self.cancelled.is_set():
+            return
+        start = time.perf_counter()
+        try:
+            os.makedirs(job.data_path, exist_ok=True)
+            output_directory = tempfile.mkdtemp(prefix=STAGING_PREFIX + job.name + "_", dir=job.data_path)
+        except OSError as e:
+            logger.error(f"Auto gen source {job.name} could not create its staging folder: {e}")
+            return
+        try:
+            job.function(lambda kind, path: self.report(job, output_directory, kind, path), self.cancelled, output_directory)
+        except Exception as e:
+            logger.error(f"Auto gen source {job.name} failed: {e}")
+        finally:
+            shutil.rmtree(output_directory, ignore_errors=True)
+        logger.info(f"Auto gen source {job.name} finished in {time.perf_counter() - start:.2f}s")
+
+    # Runs every job concurrently and blocks until they finish, time out or the run is cancelled.
+    # Returns the candidates found as {kind: path}.
+    def run(self):
+        if not self.jobs:
+            return {}
+        self.executor = ThreadPoolExecutor(max_workers=len(self.jobs), thread_name_prefix="auto_gen")
+        deadlines = {}
+        now = time.monotonic()
+        for job in self.jobs:
+            deadlines[self.executor.submit(self.run_job, job)] = (job, now + job.timeout)
+
+        pending = set(deadlines)
+        while pending and not self.cancelled.is_set():
+            next_deadline = min(deadline for _, deadline in (deadlines[future] for future in pending))
+            done, pending = wait(pending, timeout=max(0, min(next_deadline - time.monotonic(), 0.1)), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(pending):
+                job, deadline = deadlines[future]
+                if now >= deadline:
+                    # Worker threads can not be interrupted, stop waiting on it. Anything it writes later stays in its staging folder.
+                    logger.warning(f"Auto gen source {job.name} timed out after {job.timeout}s")
+                    with self.lock:
+                        self.timed_out.add(job.name)
+                    future.cancel()
+                    pending.discard(future)
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            return dict(self.candidates)
+
+    def cancel(self):
+        if not self.cancelled.is_set():
+            logger.info("Auto gen cancelled")
+            self.cancelled.set()
@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from icon_gen.auto_gen import build_auto_gen_jobs, AutoGenRun, CANDIDATE_PRIORITY
+from util.config import get_populated_positions, get_item, get_item_by_id, get_entry_data_path, save_entry, transaction, CONFIG_LOCK
+from util.blob_store import is_blob_path, get_blob_hash, hash_file, store_blob
+from icon_gen.icon_utils import ensure_mipmaps
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Regenerates the auto generated icon of every desktop.json entry on a process pool, stores the new icons, then writes their paths back in one config transaction.
+# Used by the settings menu and headless by "AlternativeDesktop.py --regenerate-icons".
+
+# Files written by auto_gen.
+AUTO_GEN_FILES = ["icon.png", "icon2.png", "icon3.png", "icon4.png"]
+# {auto generated file name: sha256} in each entry's data folder, written whenever one of its auto generated files is stored as a blob
+# so the file an entry's blob came from is a lookup instead of hashing every file in the folder.
+AUTO_GEN_SOURCES_FILE = "auto_gen_sources.json"
+DEFAULT_WORKERS = 4
+
+
+class RegenTask:
+    def __init__(self, entry_id, name, exec_path, website_link, data_path, current_icon, icon_size):
+        self.entry_id = entry_id
+        self.name = name
+        self.exec_path = exec_path
+        self.website_link = website_link
+        self.data_path = data_path
+        self.current_icon = current_icon
+        self.icon_size = icon_size
+
+
+class RegenResult:
+    def __init__(self, entry_id, name, icon_path=None, seconds=0.0, error=None):
+        self.entry_id = entry_id
+        self.name = name
+        # New icon_path for the entry, None if nothing was generated.
+        self.icon_path = icon_path
+        self.seconds = seconds
+        self.error = error
+
+
+# Returns True if icon_path is empty or one of the auto generated files in the entry's data folder.
+# Icons the user picked themselves are left alone unless include_custom is set.
+def is_auto_gen_icon(icon_path, data_path):
+    if icon_path == "":
+        return True
+    # Saved icons live in the blob store, check which file of the data folder the blob was stored from.
+    if is_blob_path(icon_path):
+        return get_auto_gen_file(icon_path, data_path) is not None
+    return (os.path.normcase(os.path.dirname(os.path.abspath(icon_path))) == os.path.normcase(os.path.abspath(data_path))
+            and os.path.basename(icon_path) in AUTO_GEN_FILES)
+
+# Records that blob_path was stored from source_path if source_path is one of an entry's auto generated files.
+def record_auto_gen_source(source_path, blob_path):
+    file_name = os.path.basename(source_path)
+    if file_name not in AUTO_GEN_FILES:
+        return
+    data_path = os.path.dirname(source_path)
+    sources = read_auto_gen_sources(data_path) or {}
+    sources[file_name] = get_blob_hash(blob_path)
+    sources_path = os.path.join(data_path, AUTO_GEN_SOURCES_FILE)
+    temp_path = sources_path + ".tmp"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(sources, f)
+        os.replace(temp_path, sources_path)
+    except OSError as e:
+        logger.warning(f"Failed to record auto generated icon source {sources_path}: {e}")
+
+# Returns data_path's AUTO_GEN_SOURCES_FILE, None if it has none (data folders from before it existed) or it is unreadable.
+def read_auto_gen_sources(data_path):
+    try:
+        with open(os.path.join(data_path, AUTO_GEN_SOURCES_FILE), "r") as f:
+            sources = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return sources if isinstance(sources, dict) else None
+
+# Returns the auto generated file in data_path that blob_path was stored from, or None.
+def get_auto_gen_file(blob_path, data_path):
+    blob_hash = get_blob_hash(blob_path)
+    sources = read_auto_gen_sources(data_path)
+    if sources is not None:
+        for file_name, source_hash in sources.items():
+            if source_hash == blob_hash and file_name in AUTO_GEN_FILES:
+                return os.path.join(data_path, file_name)
+        return None
+    # No record yet, compare contents with the auto generated files still in the data folder.
+    for file_name in AUTO_GEN_FILES:
+        path = os.path.join(data_path, file_name)
+        try:
+            if os.path.isfile(path) and hash_file(path) == blob_hash:
+                return path
+        except OSError:
+            continue
+    return None
+
+# Builds a RegenTask for every non-default entry with an executable path or website link.
+# Entries are copied under CONFIG_LOCK, checking their icons happens outside it so this can run off the GUI thread.
+def collect_regen_tasks(icon_size, include_custom=False):
+    with CONFIG_LOCK:
+        entries = []
+        for row, col in get_populated_positions():
+            item = get_item(row, col)
+            entries.append((row, col, item.id, item.name, item.executable_path, item.website_link, item.icon_path))
+    tasks = []
+    for row, col, entry_id, name, exec_path, website_link, icon_path in entries:
+        if exec_path == "" and website_link == "":
+            continue
+        data_path = get_entry_data_path(entry_id)
+        if not include_custom and not is_auto_gen_icon(icon_path, data_path):
+            logger.info(f"Skipping {name} ({row}, {col}), it uses a custom icon: {icon_path}")
+            continue
+        current_icon = icon_path
+        if is_blob_path(current_icon):
+            # Which auto generated file the blob came from, so the entry keeps the same kind of icon.
+            current_icon = get_auto_gen_file(current_icon, data_path) or current_icon
+        tasks.append(RegenTask(entry_id, name, exec_path, website_link, data_path, current_icon, icon_size))
+    return tasks
+
+# Runs in a worker process. Regenerates every candidate for one entry and picks the one to use.
+def regenerate_entry(task):
+    start = time.perf_counter()
+    try:
+        os.makedirs(task.data_path, exist_ok=True)
+        jobs = build_auto_gen_jobs(task.exec_path, task.website_link, task.data_path, task.icon_size)
+        candidates = AutoGenRun(jobs).run()
+        icon_path = pick_candidate(candidates, task.current_icon)
+        error = None if icon_path else "no icon could be generated"
+    except Exception as e:
+        icon_path = None
+        error = str(e)
+    return RegenResult(task.entry_id, task.name, icon_path, time.perf_counter() - start, error)
+
+# Keeps the entry on the same auto generated file if it was regenerated, otherwise the first candidate by CANDIDATE_PRIORITY.
+def pick_candidate(candidates, current_icon):
+    for path in candidates.values():
+        if current_icon and os.path.normcase(path) == os.path.normcase(current_icon):
+            return path
+    for kind in CANDIDATE_PRIORITY:
+        if candidates.get(kind):
+            return candidates[kind]
+    return None
+
+# Runs regenerate_entry for every task on up to workers processes. on_result(result, done, total) is called as each entry finishes.
+def regenerate_icons(tasks, workers=DEFAULT_WORKERS, on_result=None):
+    results = []
+    if not tasks:
+        return results
+    workers = max(1, min(workers, len(tasks)))
+    logger.info(f"Regenerating icons for {len(tasks)} entries with {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(regenerate_entry, task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Worker process died (e.g. a crash inside a native icon extractor)
+                result = RegenResult(task.entry_id, task.name, error=f"worker failed: {e}")
+            if result.error:
+                logger.warning(f"Regenerating {result.name} failed after {result.seconds:.2f}s: {result.error}")
+            else:
+                logger.info(f"Regenerated {result.name} in {result.seconds:.2f}s: {result.icon_path}")
+            results.append(result)
+            if on_result:
+                on_result(result, len(results), len(tasks))
+    return results
+
+# Stores every successful result in the blob store and writes its mipmaps. Returns [(entry_id, blob path)] for commit_regen_results().
+# Only touches files, so it runs on the thread waiting on the pool instead of inside the config transaction.
+def store_regen_results(results):
+    icon_paths = []
+    for result in results:
+        if not result.icon_path:
+            continue
+        try:
+            blob_path = store_blob(result.icon_path)
+            # Worker processes have no blob store set up, so their icons have no mipmaps yet.
+            ensure_mipmaps(blob_path)
+            record_auto_gen_source(result.icon_path, blob_path)
+        except OSError as e:
+            logger.error(f"Failed to store regenerated icon {result.icon_path}: {e}")
+            result.error = f"failed to store icon: {e}"
+            continue
+        icon_paths.append((result.entry_id, blob_path))
+    return icon_paths
+
+# Writes the (entry_id, blob path) pairs from store_regen_results() back to desktop.json in a single transaction. Returns the number of entries updated.
+def commit_regen_results(icon_paths):
+    updated = 0
+    with transaction():
+        for entry_id, icon_path in icon_paths:
+            item = get_item_by_id(entry_id)
+            if item is None:
+                # Deleted while regenerating.
+                continue
+            save_entry({"row": item.row, "column": item.column, "icon_path": icon_path})
+            updated += 1
+    logger.info(f"Saved {updated} regenerated icons")
+    return updated
+
+def format_regen_report(results, total_seconds):
+    failures = [result for result in results if result.error]
+    lines = [f"Regenerated {len(results) - len(failures)} of {len(results)} icons in {total_seconds:.1f}s"]
+    for result in sorted(results, key=lambda result: result.seconds, reverse=True):
+        status = f"FAILED: {result.error}" if result.error else result.icon_path
+        lines.append(f"  {result.seconds:6.2f}s  {result.name}  {status}")
+    return "\n".join(lines)
@@ -1,6 +1,7 @@
 import ctypes
 from ctypes import wintypes
 from PIL import Image
+from icon_gen.icon_utils import save_icon_image
 import logging
 
 # Constants for SHGetFileInfo function
@@ -115,9 +116,7 @@ def default_icon_to_image(file_path, output_path, icon_size, retries=5):
         logger.info("Successfully retrieved bitmap data.")
 
         img = Image.frombuffer('RGBA', (width, height), buffer, 'raw', 'BGRA', 0, 1)
-        img_resized = img.resize((icon_size, icon_size), Image.Resampling.LANCZOS)
-
-        img_resized.save(output_path)
+        save_icon_image(img, output_path, icon_size)
         logger.info(f"Icon saved to {output_path}")
 
     finally:
@@ -0,0 +1,230 @@
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from PIL import Image
+from icon_gen.icon_utils import write_file_atomic
+import requests
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# HTTP layer for favicon downloads: one pooled session per process, strict timeouts and an on disk response cache.
+# AppData/AlternativeDesktop/favicons/<domain>/<sha1 of url>.body + .json (url, ETag, Last-Modified, fetch time)
+# Fresh entries are served without a request, stale ones are revalidated with If-None-Match / If-Modified-Since.
+# Failures are cached too: per url (404, not an image) and per domain (connection errors, timeouts), so unreachable sites are not retried on every icon.
+FAVICON_CACHE_DIRECTORY = None
+# (connect, read) timeout in seconds for favicon requests.
+FAVICON_TIMEOUT = (3.05, 10)
+FAVICON_CACHE_TTL = 7 * 24 * 60 * 60
+NEGATIVE_CACHE_TTL = 60 * 60
+# Responses larger than this are not favicons, stop reading them.
+MAX_RESPONSE_BYTES = 5 * 1024 * 1024
+# Connections kept open per host, batch regeneration fetches many favicons through the same session.
+POOL_SIZE = 16
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AlternativeDesktop"
+
+SESSION = None
+SESSION_LOCK = threading.Lock()
+DOMAIN_FAILURE_FILE = "domain_failure.json"
+
+
+class FetchError(Exception):
+    pass
+
+
+def set_favicon_cache_directory(directory):
+    global FAVICON_CACHE_DIRECTORY
+    FAVICON_CACHE_DIRECTORY = directory
+    os.makedirs(FAVICON_CACHE_DIRECTORY, exist_ok=True)
+
+def get_favicon_cache_directory():
+    if FAVICON_CACHE_DIRECTORY is None:
+        set_favicon_cache_directory(os.path.join(os.getenv('APPDATA'), 'AlternativeDesktop', 'favicons'))
+    return FAVICON_CACHE_DIRECTORY
+
+def get_session():
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+            SESSION.mount("http://", adapter)
+            SESSION.mount("https://", adapter)
+            SESSION.headers["User-Agent"] = USER_AGENT
+        return SESSION
+
+def get_domain(url):
+    parts = urlsplit(url)
+    domain = (parts.hostname or "").lower()
+    if parts.port:
+        domain += f"_{parts.port}"
+    # Only characters safe in a folder name.
+    return re.sub(r"[^a-z0-9.\-]", "_", domain) or "_"
+
+def get_cache_paths(url):
+    domain_directory = os.path.join(get_favicon_cache_directory(), get_domain(url))
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return domain_directory, os.path.join(domain_directory, name + ".json"), os.path.join(domain_directory, name + ".body")
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_file_atomic(json.dumps(data).encode("utf-8"), path)
+
+def is_fresh(fetched_at, ttl):
+    return time.time() - fetched_at < ttl
+
+# True if data decodes as an image Pillow (and so the icon pipeline) can read.
+def is_image_data(data):
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        return True
+    except Exception:
+        return False
+
+def domain_failed_recently(url):
+    domain_directory, _, _ = get_cache_paths(url)
+    failure = read_json(os.path.join(domain_directory, DOMAIN_FAILURE_FILE))
+    return failure is not None and is_fresh(failure.get("fetched_at", 0), NEGATIVE_CACHE_TTL)
+
+def record_domain_failure(url, error):
+    domain_directory, _, _ = get_cache_paths(url)
+    logger.warning(f"Caching failure of {get_domain(url)} for {NEGATIVE_CACHE_TTL}s: {error}")
+    try:
+        write_json(os.path.join(domain_directory, DOMAIN_FAILURE_FILE), {"error": str(error), "fetched_at": time.time()})
+    except OSError as e:
+        logger.warning(f"Failed to cache failure of {get_domain(url)}: {e}")
+
+def clear_domain_failure(url):
+    domain_directory, _, _ = get_cache_paths(url)
+    try:
+        os.remove(os.path.join(domain_directory, DOMAIN_FAILURE_FILE))
+    except OSError:
+        pass
+
+def read_body(response):
+    body = bytearray()
+    for chunk in response.iter_content(64 * 1024):
+        body.extend(chunk)
+        if len(body) > MAX_RESPONSE_BYTES:
+            raise FetchError(f"response larger than {MAX_RESPONSE_BYTES} bytes")
+    return bytes(body)
+
+
+class FetchResult:
+    def __init__(self, body, final_url):
+        self.body = body
+        # url after redirects, relative links in the body resolve against it.
+        self.final_url = final_url
+
+
+# Returns the body of url, from the cache when possible. validate(body) rejects responses that should not be used or cached (e.g. is_image_data).
+# Returns None if the url failed now or recently.
+def fetch_url(url, validate=None, ttl=FAVICON_CACHE_TTL):
+    result = fetch(url, validate, ttl)
+    return result.body if result is not None else None
+
+# fetch_url, returning a FetchResult.
+def fetch(url, validate=None, ttl=FAVICON_CACHE_TTL):
+    try:
+        domain_directory, metadata_path, body_path = get_cache_paths(url)
+    except (OSError, TypeError) as e:
+        logger.error(f"Favicon cache unavailable: {e}")
+        return None
+    metadata = read_json(metadata_path)
+
+    if metadata is not None:
+        if metadata.get("failed"):
+            if is_fresh(metadata.get("fetched_at", 0), NEGATIVE_CACHE_TTL):
+                logger.info(f"Skipping {url}, it failed recently: {metadata.get('error')}")
+                return None
+            metadata = None
+        elif is_fresh(metadata.get("fetched_at", 0), ttl) and os.path.exists(body_path):
+            logger.info(f"Using cached response for {url}")
+            return cached_result(metadata, body_path)
+
+    if domain_failed_recently(url):
+        logger.info(f"Skipping {url}, {get_domain(url)} failed recently")
+        return None
+
+    headers = {}
+    if metadata is not None and os.path.exists(body_path):
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    try:
+        with get_session().get(url, headers=headers, timeout=FAVICON_TIMEOUT, stream=True) as response:
+            if response.status_code == 304 and headers:
+                logger.info(f"{url} not modified, refreshing cached response")
+                metadata["fetched_at"] = time.time()
+                write_json(metadata_path, metadata)
+                clear_domain_failure(url)
+                return cached_result(metadata, body_path)
+            response.raise_for_status()
+            body = read_body(response)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            content_type = response.headers.get("Content-Type", "")
+            final_url = response.url
+    except (requests.ConnectionError, requests.Timeout) as e:
+        record_domain_failure(url, e)
+        return None
+    except (requests.RequestException, FetchError) as e:
+        logger.error(f"Error downloading {url}: {e}")
+        record_url_failure(metadata_path, url, e)
+        return None
+
+    # The server answered, whatever failed before is over.
+    clear_domain_failure(url)
+    if validate is not None and not validate(body):
+        logger.warning(f"Rejected response from {url} ({content_type}, {len(body)} bytes)")
+        record_url_failure(metadata_path, url, "response failed validation")
+        return None
+
+    try:
+        os.makedirs(domain_directory, exist_ok=True)
+        write_file_atomic(body, body_path)
+        write_json(metadata_path, {"url": url, "final_url": final_url, "etag": etag, "last_modified": last_modified,
+                                   "content_type": content_type, "fetched_at": time.time()})
+    except OSError as e:
+        logger.warning(f"Failed to cache response from {url}: {e}")
+    return FetchResult(body, final_url)
+
+def read_cached_body(body_path):
+    try:
+        with open(body_path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Failed to read cached response {body_path}: {e}")
+        return None
+
+def cached_result(metadata, body_path):
+    body = read_cached_body(body_path)
+    if body is None:
+        return None
+    return FetchResult(body, metadata.get("final_url") or metadata.get("url"))
+
+def record_url_failure(metadata_path, url, error):
+    try:
+        write_json(metadata_path, {"url": url, "failed": True, "error": str(error), "fetched_at": time.time()})
+    except OSError as e:
+        logger.warning(f"Failed to cache failure of {url}: {e}")
+
+# Returns the image bytes at url, None if it could not be downloaded or is not an image.
+def fetch_favicon(url):
+    return fetch_url(url, validate=is_image_data)
@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+from PIL import Image
+from icon_gen.favicon_fetch import fetch, fetch_favicon
+from icon_gen.ico_reader import read_icon_frames, is_icon_data, IconReaderError
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Finds a site's favicon from the site itself: <link rel="icon">, apple-touch-icon and web manifest icons.
+# Every candidate is downloaded concurrently (through favicon_fetch.py's cache) and the highest resolution image wins.
+# Falls back to /favicon.ico, favicon_to_image falls back to the Google favicon service after that.
+
+# Pages and manifests change more often than icons, revalidate them daily.
+PAGE_CACHE_TTL = 24 * 60 * 60
+# Only the <head> is needed, stop parsing after this much of the page.
+MAX_PARSED_PAGE_BYTES = 512 * 1024
+MAX_CONCURRENT_PROBES = 6
+ICON_RELS = {"icon", "shortcut icon", "apple-touch-icon", "apple-touch-icon-precomposed"}
+# Pillow can not decode these, do not bother downloading them.
+UNSUPPORTED_TYPES = ("image/svg+xml",)
+UNSUPPORTED_EXTENSIONS = (".svg",)
+
+
+class FaviconCandidate:
+    def __init__(self, url, declared_size=0, source=""):
+        self.url = url
+        # Largest size from the sizes attribute / manifest entry, 0 if not declared.
+        self.declared_size = declared_size
+        self.source = source
+
+    def __repr__(self):
+        return f"FaviconCandidate({self.url!r}, {self.declared_size}, {self.source})"
+
+
+class FaviconLinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.base_href = None
+        self.icons = []
+        self.manifest_href = None
+        self.finished = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.finished:
+            return
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "base" and self.base_href is None and attrs.get("href"):
+            self.base_href = attrs["href"]
+        elif tag == "link" and attrs.get("href"):
+            rel = " ".join(attrs.get("rel", "").lower().split())
+            if rel in ICON_RELS or "icon" in rel.split():
+                self.icons.append((attrs["href"], attrs.get("sizes", ""), attrs.get("type", "").lower(), rel))
+            elif rel == "manifest":
+                self.manifest_href = attrs["href"]
+        elif tag == "body":
+            # Icon links belong in <head>.
+            self.finished = True
+
+
+# Largest size in a sizes attribute ("16x16 32x32", "any"), 0 if none.
+def parse_sizes(sizes):
+    largest = 0
+    for size in sizes.lower().split():
+        width, _, height = size.partition("x")
+        if width.isdigit() and height.isdigit():
+            largest = max(largest, min(int(width), int(height)))
+    return largest
+
+def is_supported(url, icon_type=""):
+    return icon_type not in UNSUPPORTED_TYPES and not urlsplit(url).path.lower().endswith(UNSUPPORTED_EXTENSIONS)
+
+def parse_page_candidates(html, page_url):
+    parser = FaviconLinkParser()
+    try:
+        parser.feed(html)
+    except Exception as e:
+        # Broken markup, use whatever was found before it.
+        logger.warning(f"Failed to parse {page_url}: {e}")
+    base_url = urljoin(page_url, parser.base_href) if parser.base_href else page_url
+
+    candidates = []
+    for href, sizes, icon_type, rel in parser.icons:
+        url = urljoin(base_url, href.strip())
+        if url.startswith(("http://", "https://")) and is_supported(url, icon_type):
+            declared_size = parse_sizes(sizes)
+            if not declared_size and rel.startswith("apple-touch-icon"):
+                # Apple touch icons without sizes are 180x180 by convention.
+                declared_size = 180
+            candidates.append(FaviconCandidate(url, declared_size, rel))
+    manifest_url = urljoin(base_url, parser.manifest_href.strip()) if parser.manifest_href else None
+    return candidates, manifest_url
+
+def parse_manifest_candidates(data, manifest_url):
+    try:
+        manifest = json.loads(data.decode("utf-8", errors="replace"))
+        icons = manifest.get("icons", [])
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"Invalid web manifest {manifest_url}: {e}")
+        return []
+    candidates = []
+    for icon in icons if isinstance(icons, list) else []:
+        if not isinstance(icon, dict) or not isinstance(icon.get("src"), str):
+            continue
+        url = urljoin(manifest_url, icon["src"].strip())
+        if url.startswith(("http://", "https://")) and is_supported(url, str(icon.get("type", "")).lower()):
+            candidates.append(FaviconCandidate(url, parse_sizes(str(icon.get("sizes", ""))), "manifest"))
+    return candidates
+
+# Icon candidates declared by the page at url, including its web manifest.
+def find_candidates(url):
+    page = fetch(url, ttl=PAGE_CACHE_TTL)
+    if page is None:
+        return []
+    html = page.body[:MAX_PARSED_PAGE_BYTES].decode("utf-8", errors="replace")
+    candidates, manifest_url = parse_page_candidates(html, page.final_url or url)
+    if manifest_url:
+        manifest = fetch(manifest_url, ttl=PAGE_CACHE_TTL)
+        if manifest is not None:
+            candidates.extend(parse_manifest_candidates(manifest.body, manifest.final_url or manifest_url))
+
+    unique = []
+    seen = set()
+    for candidate in candidates:
+        if candidate.url not in seen:
+            seen.add(candidate.url)
+            unique.append(candidate)
+    logger.info(f"Found {len(unique)} favicon candidates for {url}")
+    return unique
+
+# Actual resolution of downloaded image data: the largest frame of an .ico, the image size otherwise.
+def get_image_resolution(data):
+    try:
+        if is_icon_data(data):
+            return max((min(frame.width, frame.height) for frame in read_icon_frames(data)), default=0)
+        with Image.open(io.BytesIO(data)) as image:
+            return min(image.size)
+    except (IconReaderError, OSError):
+        return 0
+
+def probe(candidate):
+    data = fetch_favicon(candidate.url)
+    if data is None:
+        return None
+    return data, get_image_resolution(data)
+
+# Downloads every candidate concurrently, returns (data, resolution, candidate) of the highest resolution one, None if none downloaded.
+def probe_candidates(candidates):
+    if not candidates:
+        return None
+    best = None
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_PROBES, len(candidates)), thread_name_prefix="favicon_probe") as executor:
+        for candidate, result in zip(candidates, executor.map(probe, candidates)):
+            if result is None:
+                continue
+            data, resolution = result
+            logger.info(f"Favicon candidate {candidate.url} ({candidate.source}) is {resolution}px")
+            # Ties keep the earlier candidate, pages list their preferred icons first.
+            if best is None or resolution > best[1]:
+                best = (data, resolution, candidate)
+    return best
+
+def get_origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+# Returns the image bytes of the best favicon the site at url provides itself, None if it has none that can be downloaded.
+def resolve_favicon(url):
+    best = probe_candidates(find_candidates(url))
+    if best is not None:
+        data, resolution, candidate = best
+        logger.info(f"Using {candidate.url} ({resolution}px) as the favicon of {url}")
+        return data
+
+    favicon_ico = urljoin(get_origin(url) + "/", "favicon.ico")
+    data = fetch_favicon(favicon_ico)
+    if data is not None:
+        logger.info(f"Using {favicon_ico} as the favicon of {url}")
+    return data
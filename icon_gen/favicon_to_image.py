@@ -1,46 +1,48 @@
-import requests
-from PIL import Image
+from icon_gen.icon_utils import process_icon_image
+from icon_gen.favicon_fetch import fetch_favicon
+from icon_gen.favicon_resolver import resolve_favicon
 import logging
 
 FAVICON_SIZE = 128
+# Last resort when the site itself has no favicon.
+GOOGLE_FAVICON_SERVICE = "https://www.google.com/s2/favicons?domain={url}&sz={size}"
 
 logger = logging.getLogger(__name__)
 
 def favicon_to_image(url, output_path, icon_size):
     logger.info(f"Called with arguments: url = {url}, output_path = {output_path}, icon_size = {icon_size}")
-    # attempt to get favicon from google favicon service
-    google_api = f"https://www.google.com/s2/favicons?domain={url}&sz={FAVICON_SIZE}"
-    try:
-        saved_path = save_favicon(google_api, output_path, icon_size)
-        logger.info(f"Saved path set to: {saved_path}")
-        return saved_path
-    except requests.RequestException as e:
-        logger.error(f"Failed to fetch Google favicon: {e}")
+    # Favicon straight from the site (link rel icons, apple-touch-icon, manifest, /favicon.ico), highest resolution first.
+    data = resolve_favicon(url)
+    if data is not None:
+        saved_path = save_favicon_data(data, output_path, icon_size)
+        if saved_path is not None:
+            logger.info(f"Saved path set to: {saved_path}")
+            return saved_path
+
+    # last resort, get favicon from google favicon service
+    google_api = GOOGLE_FAVICON_SERVICE.format(url=url, size=FAVICON_SIZE)
+    saved_path = save_favicon(google_api, output_path, icon_size)
+    logger.info(f"Saved path set to: {saved_path}")
+    return saved_path
 
 
     
 
 def save_favicon(favicon_url, save_path, icon_size):
     logger.info(f"save_favicon called with: favicon_url = {favicon_url}, save_path = {save_path}, icon_size = {icon_size}")
+    # Pooled, cached and validated download (favicon_fetch.py), None if it failed now or recently.
+    data = fetch_favicon(favicon_url)
+    if data is None:
+        return None
+    return save_favicon_data(data, save_path, icon_size)
+
+def save_favicon_data(data, save_path, icon_size):
     try:
-        response = requests.get(favicon_url, stream=True)
-        response.raise_for_status()
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(1024):
-                file.write(chunk)
-        logger.info(f"Favicon saved as {save_path}")
-        
-        # Resize the image to 128x128
-        image = Image.open(save_path)
-        resized_image = image.resize((icon_size, icon_size), Image.Resampling.LANCZOS)
-        resized_image.save(save_path)
-        logger.info(f"icon resized to {icon_size}")
+        # Decoded straight from the downloaded bytes, only the final resized icon is written.
+        process_icon_image(data, save_path, icon_size)
+        logger.info(f"Favicon saved as {save_path}, resized to {icon_size}")
         
         return save_path
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error downloading the favicon: {e}")
     except Exception as e:
         logger.error(f"Other unknown error: {e}")
     return None
-
-
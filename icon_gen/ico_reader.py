@@ -0,0 +1,255 @@
+from PIL import Image
+import io
+import mmap
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pure python reader for .ico files and the icon resources of PE files (.exe, .dll).
+# The source is memory mapped, only the icon directory is parsed and only the one frame closest to the requested size is decoded.
+
+ICO_MAGIC = b"\x00\x00\x01\x00"
+PE_MAGIC = b"MZ"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+# Resource types
+RT_ICON = 3
+RT_GROUP_ICON = 14
+
+ICONDIR = struct.Struct("<HHH")
+# width, height, color count, reserved, planes, bit count, size, offset (.ico) or resource id (RT_GROUP_ICON)
+ICONDIRENTRY = struct.Struct("<BBBBHHII")
+GRPICONDIRENTRY = struct.Struct("<BBBBHHIH")
+BITMAPINFOHEADER = struct.Struct("<IiiHH")
+RESOURCE_DIRECTORY = struct.Struct("<IIHHHH")
+RESOURCE_DIRECTORY_ENTRY = struct.Struct("<II")
+RESOURCE_DATA_ENTRY = struct.Struct("<IIII")
+SECTION_HEADER = struct.Struct("<8sIIII")
+SECTION_HEADER_SIZE = 40
+
+
+class IconReaderError(Exception):
+    pass
+
+
+class IconFrame:
+    def __init__(self, width, height, bit_count, offset, size):
+        self.width = width
+        self.height = height
+        self.bit_count = bit_count
+        # Location of the frame's PNG or DIB data in the source file.
+        self.offset = offset
+        self.size = size
+
+    def __repr__(self):
+        return f"IconFrame({self.width}x{self.height}, {self.bit_count}bpp)"
+
+
+def unpack_from(layout, buffer, offset):
+    if offset < 0 or offset + layout.size > len(buffer):
+        raise IconReaderError(f"Truncated icon data at offset {offset}")
+    return layout.unpack_from(buffer, offset)
+
+# Frame dimensions from the frame data itself, the directory entry stores 0 for 256 and can not describe anything larger.
+def read_frame(buffer, width, height, bit_count, offset, size):
+    if size <= 0 or offset < 0 or offset + size > len(buffer):
+        raise IconReaderError(f"Icon frame at offset {offset} ({size} bytes) is outside the file")
+    if buffer[offset:offset + 8] == PNG_MAGIC:
+        if size >= 24:
+            width, height = struct.unpack_from(">II", buffer, offset + 16)
+        # PNG frames are decoded as 32 bit regardless of what the directory says.
+        bit_count = 32
+    else:
+        header_size, dib_width, dib_height, _, dib_bit_count = unpack_from(BITMAPINFOHEADER, buffer, offset)
+        if header_size >= BITMAPINFOHEADER.size and dib_width > 0:
+            # DIB height covers the XOR and AND masks.
+            width, height = dib_width, abs(dib_height) // 2
+            bit_count = dib_bit_count or bit_count
+    return IconFrame(width or 256, height or 256, bit_count, offset, size)
+
+def read_ico_frames(buffer):
+    reserved, icon_type, count = unpack_from(ICONDIR, buffer, 0)
+    if reserved != 0 or icon_type != 1:
+        raise IconReaderError("Not an .ico file")
+    frames = []
+    for i in range(count):
+        width, height, _, _, _, bit_count, size, offset = unpack_from(ICONDIRENTRY, buffer, ICONDIR.size + i * ICONDIRENTRY.size)
+        try:
+            frames.append(read_frame(buffer, width, height, bit_count, offset, size))
+        except IconReaderError as e:
+            logger.warning(f"Skipping frame {i} of .ico: {e}")
+    return frames
+
+# Returns the PE sections as (virtual address, virtual size, raw offset, raw size) and the RVA of the resource directory.
+def read_pe_layout(buffer):
+    pe_offset = unpack_from(struct.Struct("<I"), buffer, 0x3C)[0]
+    if buffer[pe_offset:pe_offset + 4] != b"PE\x00\x00":
+        raise IconReaderError("Not a PE file")
+    coff_offset = pe_offset + 4
+    _, section_count, _, _, _, optional_size, _ = unpack_from(struct.Struct("<HHIIIHH"), buffer, coff_offset)
+    optional_offset = coff_offset + 20
+    magic = unpack_from(struct.Struct("<H"), buffer, optional_offset)[0]
+    if magic == 0x10B:
+        directories_offset = optional_offset + 96
+    elif magic == 0x20B:
+        directories_offset = optional_offset + 112
+    else:
+        raise IconReaderError(f"Unknown PE optional header magic {magic:#x}")
+    # Data directory 2 is the resource table.
+    resource_rva, resource_size = unpack_from(struct.Struct("<II"), buffer, directories_offset + 2 * 8)
+    if resource_rva == 0 or resource_size == 0:
+        raise IconReaderError("PE file has no resources")
+
+    sections = []
+    section_offset = optional_offset + optional_size
+    for i in range(section_count):
+        _, virtual_size, virtual_address, raw_size, raw_offset = unpack_from(SECTION_HEADER, buffer, section_offset + i * SECTION_HEADER_SIZE)
+        sections.append((virtual_address, max(virtual_size, raw_size), raw_offset, raw_size))
+    return sections, resource_rva
+
+def rva_to_offset(sections, rva):
+    for virtual_address, virtual_size, raw_offset, raw_size in sections:
+        if virtual_address <= rva < virtual_address + virtual_size:
+            if rva - virtual_address >= raw_size:
+                break
+            return raw_offset + rva - virtual_address
+    raise IconReaderError(f"RVA {rva:#x} is not in any section")
+
+# Returns the entries of the resource directory at offset as [(name or id, offset of the subdirectory or data entry, is_directory)].
+# Named entries come first, then id entries in ascending order, the order Windows uses for icon indexes.
+def read_resource_directory(buffer, resource_offset, offset):
+    _, _, _, _, named_count, id_count = unpack_from(RESOURCE_DIRECTORY, buffer, resource_offset + offset)
+    entries = []
+    for i in range(named_count + id_count):
+        name, target = unpack_from(RESOURCE_DIRECTORY_ENTRY, buffer, resource_offset + offset + RESOURCE_DIRECTORY.size + i * RESOURCE_DIRECTORY_ENTRY.size)
+        # High bit of the name marks a string name, only ids are needed to match RT_GROUP_ICON to RT_ICON.
+        entry_id = None if name & 0x80000000 else name
+        entries.append((entry_id, target & 0x7FFFFFFF, bool(target & 0x80000000)))
+    return entries
+
+# Follows the name and language levels of a resource type, returns [(id, (file offset, size))] of the first language of every resource.
+def read_resources(buffer, sections, resource_offset, type_offset):
+    resources = []
+    for entry_id, name_offset, is_directory in read_resource_directory(buffer, resource_offset, type_offset):
+        target, target_is_directory = name_offset, is_directory
+        # Descend to the first language, bounded so a malformed directory pointing at itself can not loop forever.
+        for _ in range(2):
+            if not target_is_directory:
+                break
+            languages = read_resource_directory(buffer, resource_offset, target)
+            if not languages:
+                break
+            _, target, target_is_directory = languages[0]
+        if target_is_directory:
+            continue
+        data_rva, size, _, _ = unpack_from(RESOURCE_DATA_ENTRY, buffer, resource_offset + target)
+        try:
+            resources.append((entry_id, (rva_to_offset(sections, data_rva), size)))
+        except IconReaderError as e:
+            logger.warning(f"Skipping resource {entry_id}: {e}")
+    return resources
+
+# Returns the frames of every RT_GROUP_ICON in the PE file, in icon index order.
+def read_pe_icon_groups(buffer):
+    sections, resource_rva = read_pe_layout(buffer)
+    resource_offset = rva_to_offset(sections, resource_rva)
+
+    group_directory = None
+    icon_directory = None
+    for entry_id, offset, is_directory in read_resource_directory(buffer, resource_offset, 0):
+        if is_directory and entry_id == RT_GROUP_ICON:
+            group_directory = offset
+        elif is_directory and entry_id == RT_ICON:
+            icon_directory = offset
+    if group_directory is None or icon_directory is None:
+        raise IconReaderError("PE file has no icon resources")
+
+    icons = dict(read_resources(buffer, sections, resource_offset, icon_directory))
+    groups = []
+    for group_id, (group_offset, group_size) in read_resources(buffer, sections, resource_offset, group_directory):
+        try:
+            reserved, icon_type, count = unpack_from(ICONDIR, buffer, group_offset)
+        except IconReaderError as e:
+            logger.warning(f"Skipping icon group {group_id}: {e}")
+            continue
+        frames = []
+        for i in range(min(count, (group_size - ICONDIR.size) // GRPICONDIRENTRY.size)):
+            width, height, _, _, _, bit_count, _, icon_id = unpack_from(GRPICONDIRENTRY, buffer, group_offset + ICONDIR.size + i * GRPICONDIRENTRY.size)
+            if icon_id not in icons:
+                continue
+            offset, size = icons[icon_id]
+            try:
+                frames.append(read_frame(buffer, width, height, bit_count, offset, size))
+            except IconReaderError as e:
+                logger.warning(f"Skipping icon {icon_id} of group {group_id}: {e}")
+        if frames:
+            groups.append((group_id, frames))
+    return groups
+
+# Smallest frame at least icon_size wide (so it is only ever scaled down), the largest frame if none are.
+# Ties go to the higher bit depth.
+def select_frame(frames, icon_size):
+    if not frames:
+        return None
+    large_enough = [frame for frame in frames if min(frame.width, frame.height) >= icon_size]
+    if large_enough:
+        return min(large_enough, key=lambda frame: (min(frame.width, frame.height), -frame.bit_count))
+    return max(frames, key=lambda frame: (min(frame.width, frame.height), frame.bit_count))
+
+def decode_frame(buffer, frame):
+    # Copies out only this frame's bytes.
+    data = bytes(buffer[frame.offset:frame.offset + frame.size])
+    if data[:8] == PNG_MAGIC:
+        image = Image.open(io.BytesIO(data))
+    else:
+        # Wrap the DIB in a single frame .ico so Pillow applies the AND mask / alpha channel.
+        header = ICONDIR.pack(0, 1, 1) + ICONDIRENTRY.pack(frame.width % 256, frame.height % 256, 0, 0, 1, frame.bit_count, len(data), ICONDIR.size + ICONDIRENTRY.size)
+        image = Image.open(io.BytesIO(header + data))
+    image.load()
+    return image.convert("RGBA")
+
+# Returns the frames of the icon at index in buffer (a mapped .ico or PE file).
+# For PE files a negative index is a resource id, like the icon index of .lnk and .url files.
+def read_icon_frames(buffer, index=0):
+    magic = buffer[:4]
+    if magic == ICO_MAGIC:
+        return read_ico_frames(buffer)
+    if magic[:2] == PE_MAGIC:
+        groups = read_pe_icon_groups(buffer)
+        if index < 0:
+            for group_id, frames in groups:
+                if group_id == -index:
+                    return frames
+            raise IconReaderError(f"No icon group with resource id {-index}")
+        if index >= len(groups):
+            raise IconReaderError(f"Icon index {index} out of range, file has {len(groups)} icons")
+        return groups[index][1]
+    raise IconReaderError("Not an .ico or PE file")
+
+# Decodes the frame of buffer (mapped file or downloaded bytes) closest to icon_size as an RGBA PIL image.
+# Raises IconReaderError if there is no usable icon.
+def load_icon_buffer(buffer, icon_size, index=0, name="icon"):
+    frame = select_frame(read_icon_frames(buffer, index), icon_size)
+    if frame is None:
+        raise IconReaderError(f"{name} has no icon frames")
+    logger.info(f"Decoding {frame} of {name} for icon size {icon_size}")
+    try:
+        return decode_frame(buffer, frame)
+    except (OSError, SyntaxError, ValueError) as e:
+        raise IconReaderError(f"Failed to decode {frame} of {name}: {e}")
+
+def load_icon(path, icon_size, index=0):
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise IconReaderError(f"{path} is empty")
+    try:
+        return load_icon_buffer(buffer, icon_size, index, path)
+    finally:
+        buffer.close()
+
+# True if data starts like something load_icon_buffer can read.
+def is_icon_data(data):
+    return data[:4] == ICO_MAGIC or data[:2] == PE_MAGIC
@@ -1,6 +1,11 @@
 from PySide6.QtWidgets import QDialog, QHBoxLayout, QVBoxLayout, QPushButton, QLabel, QRadioButton, QButtonGroup, QSpacerItem, QSizePolicy
-from PySide6.QtGui import QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal
+from util.pixmap_cache import get_scaled_pixmap, invalidate_path
+from util.settings import get_setting
+from icon_gen.auto_gen import AutoGenRun, CANDIDATE_PRIORITY
+import logging
+
+logger = logging.getLogger(__name__)
 
 class ClickableLabel(QLabel):
     def __init__(self, parent=None):
@@ -13,64 +18,159 @@ class ClickableLabel(QLabel):
             self.radio_button.clicked.emit()
 
 class IconSelectionDialog(QDialog):
-    def __init__(self, icon_paths):
+    # generating=True shows the dialog while candidates are still being generated, they are added with add_icon() as they arrive.
+    def __init__(self, icon_paths, generating=False):
         super().__init__()
         self.setWindowTitle("Select an Icon")
-        self.selected_icon = None 
-        
+        self.selected_icon = None
+        self.icon_labels = {}
+        # Radio buttons and priorities of the previews, in the order they are shown.
+        self.icon_radios = []
+        self.icon_priorities = []
+        # Priority of the preselected icon. Once the user picks one themselves nothing is preselected anymore.
+        self.selected_priority = None
+        self.user_selected = False
+
         # Main layout
         main_layout = QVBoxLayout()
-        
+
         # Prompt label
-        prompt_label = QLabel("Multiple icons detected. Please select one to use:")
-        main_layout.addWidget(prompt_label)
-        
+        self.prompt_label = QLabel("Generating icons..." if generating else "Multiple icons detected. Please select one to use:")
+        main_layout.addWidget(self.prompt_label)
+
         # Icons layout
-        icons_layout = QHBoxLayout()
-        
+        self.icons_layout = QHBoxLayout()
+
         # Button group for radio buttons
         self.button_group = QButtonGroup(self)
-        
+
+        self.preview_size = get_setting("icon_size", 100)
+
+        # Confirm button, enabled once there is an icon to select
+        self.confirm_button = QPushButton("Confirm Selection")
+        self.confirm_button.clicked.connect(self.accept)
+        self.confirm_button.setEnabled(False)
+
         # Create labels and radio buttons for each icon path
-        for index, icon_path in enumerate(icon_paths):
+        for icon_path in icon_paths:
             if icon_path:
-                icon_layout = QVBoxLayout()
-                icon_pixmap = QPixmap(icon_path)
-                icon_label = ClickableLabel()
-                icon_label.setPixmap(icon_pixmap)
-                icon_radio = QRadioButton(f"Option {index + 1}")
-                
-                # Set default selected icon
-                if index == 0:
-                    icon_radio.setChecked(True)
-                    self.selected_icon = icon_path
-                
-                icon_radio.clicked.connect(lambda _, path=icon_path: self.select_icon(path))
-                icon_label.radio_button = icon_radio
-                self.button_group.addButton(icon_radio)
-                icon_layout.addWidget(icon_label)
-                icon_layout.addSpacerItem(QSpacerItem(0, 10, QSizePolicy.Minimum, QSizePolicy.Fixed))
-                icon_layout.addWidget(icon_radio, alignment=Qt.AlignHCenter)
-                icons_layout.addLayout(icon_layout)
-        
-        main_layout.addLayout(icons_layout)
-        
+                self.add_icon(icon_path)
+
+        main_layout.addLayout(self.icons_layout)
+
         # Add padding between the icons layout and the confirm button
         main_layout.addSpacerItem(QSpacerItem(0, 10, QSizePolicy.Minimum, QSizePolicy.Fixed))
-        
-        # Confirm button
-        confirm_button = QPushButton("Confirm Selection")
-        confirm_button.clicked.connect(self.accept)
-        main_layout.addWidget(confirm_button)
-        
+
+        main_layout.addWidget(self.confirm_button)
+
         self.setLayout(main_layout)
-    
+
+    # Previews are kept sorted by priority (lower first, icons without one go last in the order added),
+    # and the highest priority icon so far is preselected so the default never depends on which source finished first.
+    def add_icon(self, icon_path, priority=None):
+        if priority is None:
+            priority = len(CANDIDATE_PRIORITY)
+        # A source can rewrite a file another source already produced (icon.png), just refresh its preview.
+        if icon_path in self.icon_labels:
+            invalidate_path(icon_path)
+            self.icon_labels[icon_path].setPixmap(get_scaled_pixmap(icon_path, self.preview_size, self.preview_size))
+            if priority < self.selected_priority and not self.user_selected:
+                self.icon_labels[icon_path].radio_button.setChecked(True)
+                self.selected_icon = icon_path
+                self.selected_priority = priority
+            return
+
+        index = len([existing for existing in self.icon_priorities if existing <= priority])
+        icon_layout = QVBoxLayout()
+        # Preview at the desktop icon size, shared with the desktop through pixmap_cache.py
+        icon_pixmap = get_scaled_pixmap(icon_path, self.preview_size, self.preview_size)
+        icon_label = ClickableLabel()
+        icon_label.setPixmap(icon_pixmap)
+        icon_radio = QRadioButton()
+
+        # Set default selected icon
+        if not self.user_selected and (self.selected_priority is None or priority < self.selected_priority):
+            icon_radio.setChecked(True)
+            self.selected_icon = icon_path
+            self.selected_priority = priority
+
+        icon_radio.clicked.connect(lambda _, path=icon_path: self.select_icon(path))
+        icon_label.radio_button = icon_radio
+        self.button_group.addButton(icon_radio)
+        icon_layout.addWidget(icon_label)
+        icon_layout.addSpacerItem(QSpacerItem(0, 10, QSizePolicy.Minimum, QSizePolicy.Fixed))
+        icon_layout.addWidget(icon_radio, alignment=Qt.AlignHCenter)
+        self.icons_layout.insertLayout(index, icon_layout)
+        self.icon_labels[icon_path] = icon_label
+        self.icon_radios.insert(index, icon_radio)
+        self.icon_priorities.insert(index, priority)
+        for number, radio in enumerate(self.icon_radios, start=1):
+            radio.setText(f"Option {number}")
+        self.confirm_button.setEnabled(True)
+
     def select_icon(self, icon_path):
         self.selected_icon = icon_path
+        self.user_selected = True
+
+
+class AutoGenSignals(QObject):
+    # (kind, path) from auto_gen worker threads, delivered on the GUI thread.
+    candidate_found = Signal(str, str)
+    finished = Signal()
+
+
+class AutoGenTask(QRunnable):
+    def __init__(self, auto_gen_run, signals):
+        super().__init__()
+        self.auto_gen_run = auto_gen_run
+        self.signals = signals
+
+    def run(self):
+        self.auto_gen_run.run()
+        self.signals.finished.emit()
 
-def select_icon_from_paths(*icon_paths):
-    dialog = IconSelectionDialog([path for path in icon_paths if path])
+
+class AutoGenSelectionDialog(IconSelectionDialog):
+    def __init__(self, jobs):
+        super().__init__([], generating=True)
+        self.generating = True
+        self.signals = AutoGenSignals()
+        self.auto_gen_run = AutoGenRun(jobs, on_candidate=self.signals.candidate_found.emit)
+        self.signals.candidate_found.connect(self.on_candidate_found)
+        self.signals.finished.connect(self.on_generation_finished)
+        QThreadPool.globalInstance().start(AutoGenTask(self.auto_gen_run, self.signals))
+
+    def on_candidate_found(self, kind, path):
+        if self.generating:
+            logger.info(f"Auto gen candidate {kind}: {path}")
+            self.add_icon(path, CANDIDATE_PRIORITY.index(kind) if kind in CANDIDATE_PRIORITY else None)
+
+    def on_generation_finished(self):
+        if not self.generating:
+            return
+        self.generating = False
+        if len(self.icon_labels) == 0:
+            logger.info("Auto gen found no icons")
+            self.reject()
+        elif len(self.icon_labels) == 1:
+            logger.info(f"Only available icon is {self.selected_icon}")
+            self.accept()
+        else:
+            self.prompt_label.setText("Multiple icons detected. Please select one to use:")
+
+    # Closing the dialog (confirm, cancel or the window X) stops any sources still running.
+    def done(self, result):
+        self.generating = False
+        self.auto_gen_run.cancel()
+        super().done(result)
+
+
+# Runs the auto_gen jobs concurrently, streaming candidates into the selection dialog as they are generated.
+# Returns the selected (or only) icon path, None if no icons were generated or the dialog was closed.
+def select_icon_from_auto_gen(jobs):
+    if not jobs:
+        return None
+    dialog = AutoGenSelectionDialog(jobs)
     if dialog.exec() == QDialog.Accepted:
         return dialog.selected_icon
     return None
-
@@ -1,92 +1,148 @@
 import os
-import shutil
-import stat
+import io
+import hashlib
+import threading
 from PIL import Image
 import logging
-import ctypes
+from icon_gen.ico_reader import load_icon, load_icon_buffer, is_icon_data
+from util.blob_store import store_blob, is_blob_path, get_blob_hash, has_mipmaps, get_mipmap_directory, get_mipmap_path, MIPMAP_SIZES
 
 logger = logging.getLogger(__name__)
 
+# Single pass image pipeline every icon_gen source writes through.
+# The source (a file or downloaded bytes) is read once, decoded at a reduced size where the format allows it,
+# resized in memory and written to its final path in one atomic replace. Nothing is copied and reopened.
 
-# Copy exact image file to local directory and upscale it.
+ICON_EXTENSIONS = (".ico", ".exe", ".dll")
+# resize() first shrinks by whole factors with reduce() while the image is at least this many times icon_size, then resamples.
+REDUCING_GAP = 3.0
+
+
+# Opens source (a path or bytes) as a PIL image no larger than needed for icon_size.
+# .ico and PE files go through ico_reader and decode only their best sized frame, icon_index picks the icon of a PE file.
+def open_icon_source(source, icon_size, icon_index=0):
+    if isinstance(source, (bytes, bytearray)):
+        if is_icon_data(source):
+            return load_icon_buffer(source, icon_size, icon_index, "downloaded icon")
+        image = Image.open(io.BytesIO(source))
+    elif source.lower().endswith(ICON_EXTENSIONS):
+        return load_icon(source, icon_size, icon_index)
+    else:
+        image = Image.open(source)
+    # JPEGs decode straight at 1/2, 1/4 or 1/8 scale while staying at least icon_size, other formats ignore this.
+    image.draft(None, (icon_size, icon_size))
+    image.load()
+    return image
+
+# Resizes image to icon_size x icon_size in memory, returns it unchanged if it already is.
+def resize_icon_image(image, icon_size):
+    if image.mode not in ("RGB", "RGBA"):
+        # LANCZOS is not available for palette images.
+        image = image.convert("RGBA")
+    if image.size == (icon_size, icon_size):
+        return image
+    return image.resize((icon_size, icon_size), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+# Scales image to fit within size x size keeping its aspect ratio, like the desktop draws it.
+def fit_icon_image(image, size):
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    scale = size / max(image.size)
+    fitted_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if fitted_size == image.size:
+        return image
+    return image.resize(fitted_size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+# Writes data to output_path through a temporary file so readers (pixmap cache, blob store) never see a half written icon.
+def write_file_atomic(data, output_path):
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, output_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Encodes image in the format of output_path's extension and writes it atomically. Returns the sha256 of the written file.
+def write_image_atomic(image, output_path):
+    image_format = Image.registered_extensions().get(os.path.splitext(output_path)[1].lower(), "PNG")
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    data = buffer.getvalue()
+    write_file_atomic(data, output_path)
+    return hashlib.sha256(data).hexdigest()
+
+# Writes the MIPMAP_SIZES levels of image for content_hash, each scaled from the next larger level so the source is only scaled once.
+# Does nothing if the blob store is not set up (e.g. in batch_regen worker processes), those get theirs from ensure_mipmaps.
+def write_mipmaps(image, content_hash):
+    if get_mipmap_directory() is None:
+        return
+    level = image
+    for size in sorted(MIPMAP_SIZES, reverse=True):
+        level = fit_icon_image(level, size)
+        mipmap_path = get_mipmap_path(content_hash, size)
+        if not os.path.exists(mipmap_path):
+            write_image_atomic(level, mipmap_path)
+
+# Writes any missing mipmaps of a stored blob, decoding it once.
+def ensure_mipmaps(blob_path):
+    if not is_blob_path(blob_path) or has_mipmaps(blob_path):
+        return
+    try:
+        with Image.open(blob_path) as image:
+            image.load()
+            write_mipmaps(image, get_blob_hash(blob_path))
+        logger.info(f"Wrote mipmaps for {blob_path}")
+    except OSError as e:
+        logger.error(f"Failed to write mipmaps for {blob_path}: {e}")
+
+# Resizes an already decoded image to icon_size and writes it to output_path, with its mipmaps. Returns output_path.
+def save_icon_image(image, output_path, icon_size):
+    image = resize_icon_image(image, icon_size)
+    content_hash = write_image_atomic(image, output_path)
+    # Keyed by content hash, so once this icon is saved into the blob store its mipmaps are already in place.
+    try:
+        write_mipmaps(image, content_hash)
+    except OSError as e:
+        logger.warning(f"Failed to write mipmaps for {output_path}: {e}")
+    return output_path
+
+# Reads source once and writes it to output_path as an icon_size x icon_size image. Returns output_path.
+# Raises IconReaderError for unusable .ico/PE sources and OSError (PIL.UnidentifiedImageError) for unreadable images.
+def process_icon_image(source, output_path, icon_size, icon_index=0):
+    return save_icon_image(open_icon_source(source, icon_size, icon_index), output_path, icon_size)
+
+
+# Writes an exact image file (e.g. a dropped .ico) to output_path at icon_size.
 def get_exact_img_file(source_file, output_path, icon_size):
     logger.info(f"get_exact_img_file called with arguments: source_file = {source_file}, output_path = {output_path}, icon_size = {icon_size}")
 
     found = False
     
     try:
-        # Copy the .ico file to the output path
-        shutil.copy2(source_file, output_path)
-        
-        # Remove permissions and remove hidden attribute from our version of the .ico
-        os.chmod(output_path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
-        remove_hidden_attribute(output_path)
-        logger.info("Removed hidden attributes on local icon")
-        
-        # Resize the image
-        image = Image.open(output_path)
-        resized_image = image.resize((icon_size, icon_size), Image.Resampling.LANCZOS)
-        resized_image.save(output_path)
-
+        process_icon_image(source_file, output_path, icon_size)
         found = True
-        logger.info(f"Copied {os.path.basename(source_file)} to {output_path}")
+        logger.info(f"Saved {os.path.basename(source_file)} to {output_path}")
 
     except FileNotFoundError as e:
-        logger.error(f"Error: File not found after copying to data directory: {e}")
+        logger.error(f"Error: Source file not found: {e}")
     except Exception as e:
         logger.error(f"Unexpected error occurred: {e}")
 
 
     return found
 
-def remove_hidden_attribute(file_path):
-    # Define the Windows constants for attributes
-    FILE_ATTRIBUTE_HIDDEN = 0x2
-
-    # Get the current attributes of the file
-    attrs = ctypes.windll.kernel32.GetFileAttributesW(file_path)
-
-    if attrs == -1:
-        logger.error(f"File not found when removing hidden attributes: {file_path}")
-        raise FileNotFoundError(f"File not found: {file_path}")
-
-    # Remove the hidden attribute
-    new_attrs = attrs & ~FILE_ATTRIBUTE_HIDDEN
-    ctypes.windll.kernel32.SetFileAttributesW(file_path, new_attrs)
-
-# Does not upscale, just a direct copy paste.
-def make_local_icon(icon_path, data_path):
-    #ensure datapath for [row, col] exists
-    if not os.path.exists(data_path):
-        os.makedirs(data_path)
-        
-    #get original image name
-    file_name = os.path.basename(icon_path)
-    
-    #join it to data path for full save location
-    output_path = os.path.join(data_path, file_name)
-    #ensure that it has a unique file name to not overwrite if named icon.png etc.
-    output_path = get_unique_folder_name(output_path)
-    
+# Does not upscale, just a direct copy paste into the content addressed blob store (see util/blob_store.py).
+# Returns the blob path, which is shared with every other icon using an identical image.
+def make_local_icon(icon_path):
     try:
-        logger.info(f"Trying to copy {icon_path} to {output_path}")
-        shutil.copy(icon_path, output_path)
-        remove_hidden_attribute(output_path)
-        return output_path
+        logger.info(f"Trying to store {icon_path} in the blob store")
+        blob_path = store_blob(icon_path)
+        ensure_mipmaps(blob_path)
+        return blob_path
     
     except Exception as e:
         logger.error(f"Error copying file: {e}")
         return None
-    
-#takes output path and injects _local before the file extention
-#if a copy with the same name already exists it becomes _local1, _local2, _local3 etc.
-def get_unique_folder_name(folder_path):
-    base, ext = os.path.splitext(folder_path)
-    counter = 1
-    new_folder = f"{base}_local{ext}"
-    
-    while os.path.exists(new_folder):
-        new_folder = f"{base}_local{counter}{ext}"
-        counter += 1
-        
-    return new_folder
\ No newline at end of file
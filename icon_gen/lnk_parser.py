@@ -0,0 +1,236 @@
+from collections import OrderedDict
+import ntpath
+import os
+import struct
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pure python reader for Windows shortcut (.lnk) files, [MS-SHLLINK].
+# Replaces resolving shortcuts through a WScript.Shell COM object, and also reads the icon location and icon index.
+
+LINK_CLSID = b"\x01\x14\x02\x00\x00\x00\x00\x00\xc0\x00\x00\x00\x00\x00\x00\x46"
+# header size, clsid, link flags, file attributes, creation/access/write time, file size, icon index, show command, hotkey
+SHELL_LINK_HEADER = struct.Struct("<I16sII8s8s8sIiIH10x")
+
+# LinkFlags
+HAS_LINK_TARGET_ID_LIST = 0x1
+HAS_LINK_INFO = 0x2
+HAS_NAME = 0x4
+HAS_RELATIVE_PATH = 0x8
+HAS_WORKING_DIR = 0x10
+HAS_ARGUMENTS = 0x20
+HAS_ICON_LOCATION = 0x40
+IS_UNICODE = 0x80
+
+# LinkInfoFlags
+VOLUME_ID_AND_LOCAL_BASE_PATH = 0x1
+COMMON_NETWORK_RELATIVE_LINK_AND_PATH_SUFFIX = 0x2
+
+# ExtraData block signatures
+ENVIRONMENT_VARIABLE_DATA_BLOCK = 0xA0000001
+ICON_ENVIRONMENT_DATA_BLOCK = 0xA0000007
+
+# Parsed shortcuts keyed by normalized path, reused while the file's mtime and size are unchanged.
+LNK_CACHE = OrderedDict()
+MAX_CACHED_LINKS = 256
+LNK_CACHE_LOCK = threading.Lock()
+
+
+class LnkParseError(Exception):
+    pass
+
+
+class ShellLink:
+    def __init__(self):
+        self.target_path = None
+        self.arguments = ""
+        self.working_dir = None
+        self.relative_path = None
+        self.name = None
+        # Icon file from the shortcut's "Change Icon", None if the target's own icon is used.
+        self.icon_location = None
+        # Index of the icon in icon_location (or the target), negative values are resource ids.
+        self.icon_index = 0
+
+    def __repr__(self):
+        return f"ShellLink(target_path={self.target_path!r}, arguments={self.arguments!r}, icon_location={self.icon_location!r}, icon_index={self.icon_index})"
+
+
+def unpack_from(layout, data, offset):
+    if offset < 0 or offset + layout.size > len(data):
+        raise LnkParseError(f"Truncated shortcut at offset {offset}")
+    return layout.unpack_from(data, offset)
+
+def read_c_string(data, offset, unicode=False):
+    if offset <= 0 or offset >= len(data):
+        return ""
+    if unicode:
+        end = offset
+        while end + 1 < len(data) and data[end:end + 2] != b"\x00\x00":
+            end += 2
+        return data[offset:end].decode("utf-16-le", errors="replace")
+    end = data.find(b"\x00", offset)
+    if end == -1:
+        end = len(data)
+    return decode_ansi(data[offset:end])
+
+# Non unicode strings are in the system code page, which is not known off Windows.
+def decode_ansi(raw):
+    return raw.decode("mbcs" if os.name == "nt" else "cp1252", errors="replace")
+
+# Best effort path from the shell item id list, used when a shortcut has no LinkInfo (e.g. ForceNoLinkInfo).
+# Only understands drive and file system items, returns None for anything else (special folders, network, ...).
+def read_id_list_path(data, offset, size):
+    end = offset + size
+    parts = []
+    while offset + 2 <= end:
+        item_size = struct.unpack_from("<H", data, offset)[0]
+        if item_size == 0:
+            break
+        item = data[offset:offset + item_size]
+        offset += item_size
+        if len(item) < 3:
+            return None
+        item_type = item[2] & 0x70
+        if item_type == 0x10:
+            # Root folder (My Computer), contributes nothing to the path.
+            continue
+        elif item_type == 0x20:
+            parts.append(read_c_string(item, 3).rstrip("\\") + "\\")
+        elif item_type == 0x30 and len(item) > 14:
+            parts.append(read_file_entry_name(item))
+        else:
+            return None
+    if not parts or not parts[0].endswith(":\\"):
+        return None
+    return ntpath.join(*parts)
+
+# Long name of a file entry shell item from its 0xBEEF0004 extension block, the 8.3 short name if it has none.
+def read_file_entry_name(item):
+    short_name = read_c_string(item, 14)
+    extension_offset = struct.unpack_from("<H", item, len(item) - 2)[0] if len(item) >= 2 else 0
+    if 0 < extension_offset < len(item) - 8:
+        extension_size, version, signature = struct.unpack_from("<HHI", item, extension_offset)
+        if signature == 0xBEEF0004 and version >= 3:
+            # Long name offset moved with each extension version.
+            name_offset = extension_offset + (46 if version >= 9 else 42 if version >= 8 else 38 if version >= 7 else 20)
+            long_name = read_c_string(item, name_offset, unicode=True)
+            if long_name:
+                return long_name
+    return short_name
+
+def read_link_info(data, offset):
+    link_info_size, header_size, flags, _, local_base_path_offset, network_offset, suffix_offset = unpack_from(struct.Struct("<IIIIIII"), data, offset)
+    link_info = data[offset:offset + link_info_size]
+    unicode = header_size >= 0x24
+    if unicode:
+        local_base_path_offset_unicode, suffix_offset_unicode = unpack_from(struct.Struct("<II"), data, offset + 28)
+
+    suffix = read_c_string(link_info, suffix_offset_unicode, True) if unicode and suffix_offset_unicode else read_c_string(link_info, suffix_offset)
+    if flags & VOLUME_ID_AND_LOCAL_BASE_PATH:
+        if unicode and local_base_path_offset_unicode:
+            base = read_c_string(link_info, local_base_path_offset_unicode, True)
+        else:
+            base = read_c_string(link_info, local_base_path_offset)
+        return base + suffix if base else None
+    if flags & COMMON_NETWORK_RELATIVE_LINK_AND_PATH_SUFFIX:
+        _, _, net_name_offset = unpack_from(struct.Struct("<III"), link_info, network_offset)
+        net_name = read_c_string(link_info, network_offset + net_name_offset)
+        if net_name:
+            return ntpath.join(net_name, suffix) if suffix else net_name
+    return None
+
+def read_string_data(data, offset, unicode):
+    count = unpack_from(struct.Struct("<H"), data, offset)[0]
+    size = count * 2 if unicode else count
+    if offset + 2 + size > len(data):
+        raise LnkParseError(f"Truncated string data at offset {offset}")
+    raw = data[offset + 2:offset + 2 + size]
+    text = raw.decode("utf-16-le", errors="replace") if unicode else decode_ansi(raw)
+    return text, offset + 2 + size
+
+# Returns {signature: unicode target} of the environment variable blocks (paths containing %VARIABLES%).
+def read_environment_blocks(data, offset):
+    blocks = {}
+    while offset + 8 <= len(data):
+        block_size, signature = struct.unpack_from("<II", data, offset)
+        if block_size < 8:
+            break
+        if signature in (ENVIRONMENT_VARIABLE_DATA_BLOCK, ICON_ENVIRONMENT_DATA_BLOCK) and block_size >= 788:
+            # 260 byte ANSI target followed by a 520 byte unicode target.
+            target = (data[offset + 268:offset + 788].decode("utf-16-le", errors="replace").split("\x00")[0]
+                      or decode_ansi(data[offset + 8:offset + 268]).split("\x00")[0])
+            if target:
+                blocks[signature] = target
+        offset += block_size
+    return blocks
+
+def expand_path(path):
+    # %VARIABLE% expansion regardless of the platform parsing the shortcut.
+    return ntpath.expandvars(path) if path else path
+
+def parse_lnk(data):
+    header_size, clsid, flags, _, _, _, _, _, icon_index, _, _ = unpack_from(SHELL_LINK_HEADER, data, 0)
+    if header_size != SHELL_LINK_HEADER.size or clsid != LINK_CLSID:
+        raise LnkParseError("Not a shortcut (.lnk) file")
+
+    link = ShellLink()
+    link.icon_index = icon_index
+    offset = SHELL_LINK_HEADER.size
+    id_list_path = None
+    if flags & HAS_LINK_TARGET_ID_LIST:
+        id_list_size = unpack_from(struct.Struct("<H"), data, offset)[0]
+        try:
+            id_list_path = read_id_list_path(data, offset + 2, id_list_size)
+        except struct.error:
+            id_list_path = None
+        offset += 2 + id_list_size
+
+    if flags & HAS_LINK_INFO:
+        link_info_size = unpack_from(struct.Struct("<I"), data, offset)[0]
+        try:
+            link.target_path = read_link_info(data, offset)
+        except (LnkParseError, struct.error) as e:
+            logger.warning(f"Failed to read shortcut LinkInfo: {e}")
+        offset += link_info_size
+
+    unicode = bool(flags & IS_UNICODE)
+    for flag, attribute in ((HAS_NAME, "name"), (HAS_RELATIVE_PATH, "relative_path"), (HAS_WORKING_DIR, "working_dir"),
+                            (HAS_ARGUMENTS, "arguments"), (HAS_ICON_LOCATION, "icon_location")):
+        if flags & flag:
+            value, offset = read_string_data(data, offset, unicode)
+            setattr(link, attribute, value)
+
+    blocks = read_environment_blocks(data, offset)
+    if ICON_ENVIRONMENT_DATA_BLOCK in blocks:
+        link.icon_location = blocks[ICON_ENVIRONMENT_DATA_BLOCK]
+    link.icon_location = expand_path(link.icon_location) or None
+    if not link.target_path:
+        link.target_path = expand_path(blocks.get(ENVIRONMENT_VARIABLE_DATA_BLOCK)) or id_list_path
+    return link
+
+# Returns the parsed ShellLink of lnk_path, from LNK_CACHE if the file has not changed since it was last parsed.
+# A relative target is resolved against the shortcut's folder. Raises LnkParseError or OSError.
+def read_lnk(lnk_path):
+    stat = os.stat(lnk_path)
+    key = os.path.normcase(os.path.abspath(lnk_path))
+    with LNK_CACHE_LOCK:
+        cached = LNK_CACHE.get(key)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            LNK_CACHE.move_to_end(key)
+            return cached[1]
+
+    with open(lnk_path, "rb") as f:
+        link = parse_lnk(f.read())
+    if not link.target_path and link.relative_path:
+        # Shortcuts store Windows separators, convert them so the relative path also resolves off Windows.
+        link.target_path = os.path.normpath(os.path.join(os.path.dirname(lnk_path), link.relative_path.replace("\\", os.sep)))
+
+    with LNK_CACHE_LOCK:
+        LNK_CACHE[key] = ((stat.st_mtime_ns, stat.st_size), link)
+        LNK_CACHE.move_to_end(key)
+        while len(LNK_CACHE) > MAX_CACHED_LINKS:
+            LNK_CACHE.popitem(last=False)
+    return link
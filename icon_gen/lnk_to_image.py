@@ -1,7 +1,7 @@
 import os
 from icon_gen.exe_to_image import exe_to_image
 from icon_gen.extract_ico_file import extract_ico_file
-import win32com.client
+from icon_gen.lnk_parser import read_lnk, LnkParseError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,39 +10,62 @@ def lnk_to_image(lnk_path, output_path, icon_size):
     logger.info(f"Called with arguments: lnk_path = {lnk_path}, output_path = {output_path}, icon_size = {icon_size}")
 
     ico_path_exists = None
+    new_path = None
 
-    # Get the target path and icon index
-    target_path = get_lnk_target(lnk_path)
+    # Get the target path, icon location and icon index
+    link = get_lnk(lnk_path)
+    target_path = get_lnk_target(lnk_path, link)
     logger.info(f"Target path = {target_path}")
-    #icon_index = lnk.icon_index
 
     # Swapping icon2.png path (output_path) for ico's path which is icon.png
     output_path_parent = os.path.dirname(output_path)
     ico_path = os.path.join(output_path_parent, "icon.png")
 
-    if extract_ico_file(target_path, ico_path, icon_size) == True:
+    if target_path != None and extract_ico_file(target_path, ico_path, icon_size) == True:
         logger.info(f".ico file found copying to path = {ico_path}")
         ico_path_exists = ico_path
 
-    if target_path != None:
-        new_path = exe_to_image(target_path, output_path, icon_size)
+    # The shortcut's own icon (set with "Change Icon") if it has one, otherwise the target's icon at the shortcut's icon index.
+    icon_source = target_path
+    icon_index = link.icon_index if link else 0
+    if link and link.icon_location:
+        if os.path.isfile(link.icon_location):
+            icon_source = link.icon_location
+        else:
+            logger.warning(f"Shortcut icon location does not exist: {link.icon_location}, using the target's icon")
+            icon_index = 0
+    logger.info(f"Icon source = {icon_source}, icon index = {icon_index}")
+
+    if icon_source != None:
+        new_path = exe_to_image(icon_source, output_path, icon_size, icon_index)
+        if new_path is None and icon_index != 0:
+            # Index not present in the file (e.g. an index into a system dll resolved differently), fall back to the first icon.
+            new_path = exe_to_image(icon_source, output_path, icon_size)
         logger.info(f"exe_to_image returned with path = {new_path}")
 
     return ico_path_exists, new_path
     
 
-def get_lnk_target(lnk_path):
+# Returns the parsed ShellLink of lnk_path (see lnk_parser.py), None if it does not exist or can not be read.
+def get_lnk(lnk_path):
     if not os.path.exists(lnk_path):
         logger.error(f"lnk_path does not exists: {lnk_path}")
         return None
-    
-    shell = win32com.client.Dispatch("WScript.Shell")
-    shortcut = shell.CreateShortCut(lnk_path)
-    target_path = shortcut.Targetpath
-    
-    if not os.path.exists(target_path):
+    try:
+        return read_lnk(lnk_path)
+    except (LnkParseError, OSError) as e:
+        logger.error(f"Failed to read shortcut {lnk_path}: {e}")
+        return None
+
+def get_lnk_target(lnk_path, link=None):
+    if link is None:
+        link = get_lnk(lnk_path)
+    if link is None:
+        return None
+
+    target_path = link.target_path
+    if not target_path or not os.path.exists(target_path):
         logger.error(f"target_path does not exists: {target_path}")
         return None
     
     return target_path
-
@@ -171,6 +171,21 @@ def display_reset_default_font_size_warning():
         "This will reset <b>ALL</b> font sizes for <b>ALL</b> icons. ", 
         QMessageBox.Ok | QMessageBox.Cancel
     )
+def display_regenerate_all_icons_warning():
+    logger.warning("Displaying Warning to regenerate ALL auto generated icons.")
+    return show_highlightable_message_box(
+        "Regenerate ALL Icons",
+        "This will regenerate the icon of <b>ALL</b> icons that use an auto generated icon. Icons you picked yourself are not changed.",
+        QMessageBox.Ok | QMessageBox.Cancel
+    )
+
+def display_icon_regen_report(report):
+    logger.info(f"Displaying icon regeneration report: {report}")
+    show_highlightable_message_box(
+        "Icon Regeneration Finished",
+        report
+    )
+
 def display_reset_default_font_color_warning():
     logger.warning("Displaying Warning to reset all Icon Name colors to the Name Font Color in settings.")
     return show_highlightable_message_box(
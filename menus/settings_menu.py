@@ -3,10 +3,10 @@ from PySide6.QtWidgets import (QPushButton, QMessageBox, QHBoxLayout, QCheckBox,
 from PySide6.QtCore import Qt, QEvent, QSize, QTimer, QPoint, QStandardPaths
 from PySide6.QtGui import QKeySequence, QColor
 from util.utils import ClearableLineEdit, SliderWithInput, create_separator
-from util.settings import get_setting, set_setting, load_settings, save_settings
+from util.settings import get_setting, set_setting, get_settings, save_settings
 from util.config import reset_all_to_default_font_size, reset_all_to_default_font_color
 from menus.display_warning import (display_bg_video_not_exist, display_bg_image_not_exist, display_settings_not_saved, display_reset_default_font_color_warning,
-                                display_multiple_working_keybind_warning, display_reset_default_font_size_warning)
+                                display_multiple_working_keybind_warning, display_reset_default_font_size_warning, display_regenerate_all_icons_warning)
 import os
 import logging
 
@@ -42,9 +42,8 @@ class SettingsDialog(QDialog):
         icon_tab.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         icon_tab.setLayout(icon_layout)
 
-        # Small optimization to load settings once for the entire file then use .get() from that
-        # Instead of using get_setting() which calls a load_settings() every instance.
-        self.settings = load_settings()
+        # Copy of the in memory settings, the dialog reads its initial values from it with .get()
+        self.settings = get_settings()
 
         self.add_general_tab(general_layout)
         self.add_background_tab(background_layout)
@@ -329,6 +328,12 @@ class SettingsDialog(QDialog):
         self.icon_size_slider.setSliderPosition(self.settings.get("icon_size", 100))
         self.icon_size_slider.valueChanged.connect(self.label_size_changed)
 
+        # Max frames per second animated (.gif) icons are advanced at
+        self.animation_fps_cap_sb = QSpinBox()
+        self.animation_fps_cap_sb.setRange(1, 120)
+        self.animation_fps_cap_sb.setValue(self.settings.get("animation_fps_cap", 30))
+        self.animation_fps_cap_sb.valueChanged.connect(self.set_changed)
+
         ### Icon Name
         ## Name font color:
         self.icon_name_color_box = QPushButton("", self)
@@ -361,6 +366,22 @@ class SettingsDialog(QDialog):
         font_size_layout.addWidget(self.icon_name_font_size_sb)
         font_size_layout.addWidget(reset_name_font_size_pb)
 
+        ### Icon Regeneration
+        # Worker processes used to regenerate all icons at once
+        self.icon_regen_workers_sb = QSpinBox()
+        self.icon_regen_workers_sb.setRange(1, max(os.cpu_count() or 1, 1))
+        self.icon_regen_workers_sb.setValue(self.settings.get("icon_regen_workers", 4))
+        self.icon_regen_workers_sb.valueChanged.connect(self.set_changed)
+
+        regenerate_icons_pb = QPushButton("Regenerate")
+        regenerate_icons_pb.setAutoDefault(False)
+        regenerate_icons_pb.setDefault(False)
+        regenerate_icons_pb.setFixedWidth(100)
+        regenerate_icons_pb.clicked.connect(self.regenerate_all_icons_clicked)
+        regenerate_layout = QHBoxLayout()
+        regenerate_layout.addWidget(self.icon_regen_workers_sb)
+        regenerate_layout.addWidget(regenerate_icons_pb)
+
 
         left_padding = 20
 
@@ -369,6 +390,8 @@ class SettingsDialog(QDialog):
         icon_appearance_inner_layout = QFormLayout()
         icon_appearance_inner_layout.setContentsMargins(left_padding, 0, 0, 0)
         icon_appearance_inner_layout.addRow("Desktop Icon Size", self.icon_size_slider)
+        icon_appearance_inner_layout.addRow("Animated icon FPS cap", self.animation_fps_cap_sb)
+        icon_appearance_inner_layout.itemAt(2).widget().setToolTip("Limits how often animated (.gif) icons advance a frame. Lower values use less CPU.")
         outer_layout.addLayout(icon_appearance_inner_layout)
 
         outer_layout.addLayout(create_separator("Icon Name"))
@@ -380,6 +403,14 @@ class SettingsDialog(QDialog):
         icon_name_inner_layout.itemAt(2).widget().setToolTip("Sets the default font size for icon names. This can be adjusted individually in the icon edit menu.")
         outer_layout.addLayout(icon_name_inner_layout)
 
+        outer_layout.addLayout(create_separator("Icon Regeneration"))
+
+        icon_regen_inner_layout = QFormLayout()
+        icon_regen_inner_layout.setContentsMargins(left_padding, 0, 0, 0)
+        icon_regen_inner_layout.addRow("Regenerate all icons (workers)", regenerate_layout)
+        icon_regen_inner_layout.itemAt(0).widget().setToolTip("Re-runs auto generate icon for every icon using an auto generated icon, e.g. after updating installed programs.")
+        outer_layout.addLayout(icon_regen_inner_layout)
+
         # Adds a spacer at the end which pushes up all other separators/content in the tab
         outer_layout.addStretch(1)
         icon_layout.addLayout(outer_layout, 0)
@@ -702,8 +733,8 @@ class SettingsDialog(QDialog):
         self.good_keybind()
 
 
-        # More optimized to load and modify all settings then save. Than to set_setting() for each setting as set_setting() has load and save overhead.
-        settings = load_settings()
+        # Applied to the in memory settings in one go, settings.json is written once in the background.
+        settings = {}
         settings["update_on_launch"] = self.update_on_launch_cb.isChecked()
         settings["toggle_overlay_keybind"] = self.toggle_overlay_keybind_button.get_keybind()
         settings["window_opacity"] = self.window_opacity_slider.value()
@@ -728,18 +759,10 @@ class SettingsDialog(QDialog):
         settings["image_zoom"] = self.slider_to_image_zoom()
         settings["bg_z_order"] = self.bg_z_order_selector.currentIndex()
         settings["global_font_size"] = self.icon_name_font_size_sb.value()
+        settings["animation_fps_cap"] = self.animation_fps_cap_sb.value()
+        settings["icon_regen_workers"] = self.icon_regen_workers_sb.value()
+        # Subscribers (grid, icons, backgrounds, hotkey, animation clock) update only for the keys that actually changed, see util/settings.py
         save_settings(settings)
-        if self.parent():
-            self.parent().set_hotkey()
-            self.parent().grid_widget.render_bg()
-            
-            
-
-            # Can be a quite heavy impact so only redraw when these values have changed.
-            if self.redraw_request:
-                self.parent().grid_widget.change_max_grid_dimensions(self.max_rows_sb.value(), self.max_cols_sb.value())
-                self.parent().grid_widget.update_icon_size(self.icon_size_slider.value())
-                pass
         
         # No need to reload self.settings as after saving this will terminate (self.accept()) and reload settings on next launch.
         self.accept()
@@ -835,6 +858,13 @@ class SettingsDialog(QDialog):
         else:
             logger.info("User chose NOT to reset all font sizes.")
 
+    def regenerate_all_icons_clicked(self):
+        if display_regenerate_all_icons_warning() == QMessageBox.Ok:
+            logger.info(f"User chose to regenerate all icons with {self.icon_regen_workers_sb.value()} workers.")
+            self.parent().grid_widget.regenerate_all_icons(self.icon_regen_workers_sb.value())
+        else:
+            logger.info("User chose NOT to regenerate all icons.")
+
     def reset_default_font_color_clicked(self):
         if display_reset_default_font_color_warning() == QMessageBox.Ok:
             logger.info(f"User chose to reset all icons to default font color: {self.global_font_color}.")
@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+
+# Tests import the application modules the same way AlternativeDesktop.py does, from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURE_DIRECTORY, name)
+
+def read_fixture(name):
+    with open(fixture_path(name), "rb") as f:
+        return f.read()
+
+
+# Local stand-in HTTP server for the favicon tests. routes maps a path to (status, headers, body).
+# Requests are recorded, and conditional requests matching a route's ETag / Last-Modified get a 304.
+class FixtureServer:
+    def __init__(self):
+        self.routes = {}
+        # (path, request headers) of every request, in order.
+        self.requests = []
+        # Client (host, port) of every connection that sent a request.
+        self.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), make_fixture_handler(self))
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    def url(self, path="/"):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def requested_paths(self):
+        return [path for path, _ in self.requests]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def make_fixture_handler(fixture_server):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so connection reuse can be observed.
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            fixture_server.requests.append((self.path, dict(self.headers)))
+            fixture_server.connections.add(self.client_address)
+            # Routes match the full path first, then the path without its query string.
+            route = fixture_server.routes.get(self.path) or fixture_server.routes.get(self.path.split("?")[0])
+            status, headers, body = route or (404, {}, b"not found")
+            etag = headers.get("ETag")
+            last_modified = headers.get("Last-Modified")
+            if (etag and self.headers.get("If-None-Match") == etag) or (last_modified and self.headers.get("If-Modified-Since") == last_modified):
+                status, body = 304, b""
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+@pytest.fixture
+def http_server():
+    server = FixtureServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def favicon_cache(tmp_path, monkeypatch):
+    import icon_gen.favicon_fetch as favicon_fetch
+    favicon_fetch.set_favicon_cache_directory(str(tmp_path / "favicons"))
+    # Fresh session per test, connection reuse is counted per test.
+    monkeypatch.setattr(favicon_fetch, "SESSION", None)
+    return tmp_path / "favicons"
+
+def read_page(name):
+    return read_fixture(os.path.join("pages", name))
+
+def png_data(size=32, color=(0, 128, 255, 255)):
+    output = io.BytesIO()
+    Image.new("RGBA", (size, size), color).save(output, format="PNG")
+    return output.getvalue()
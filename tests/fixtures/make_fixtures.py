@@ -0,0 +1,205 @@
+import io
+import os
+import struct
+from PIL import Image
+
+# Regenerates the binary fixtures in this folder. The generated files are checked in, run this only when changing them:
+#   python tests/fixtures/make_fixtures.py
+
+FIXTURE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Every frame is a solid color unique to its size, so tests can tell which frame was decoded.
+FRAME_COLORS = {
+    16: (255, 0, 0, 255),
+    32: (0, 255, 0, 255),
+    48: (0, 0, 255, 255),
+    64: (255, 255, 0, 255),
+    256: (255, 0, 255, 255),
+}
+
+
+def solid(size):
+    return Image.new("RGBA", (size, size), FRAME_COLORS[size])
+
+def png_bytes(image):
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+# DIB (BITMAPINFOHEADER + XOR + AND mask) of a frame, as stored in a BMP framed .ico and in RT_ICON resources.
+def dib_bytes(image):
+    output = io.BytesIO()
+    image.save(output, format="ICO", sizes=[image.size], bitmap_format="bmp")
+    data = output.getvalue()
+    _, _, _, _, _, _, size, offset = struct.unpack_from("<BBBBHHII", data, 6)
+    return data[offset:offset + size]
+
+# .ico file from [(width, height, bit count, frame data)]
+def build_ico(frames):
+    header = struct.pack("<HHH", 0, 1, len(frames))
+    offset = len(header) + 16 * len(frames)
+    entries = b""
+    body = b""
+    for width, height, bit_count, data in frames:
+        entries += struct.pack("<BBBBHHII", width % 256, height % 256, 0, 0, 1, bit_count, len(data), offset + len(body))
+        body += data
+    return header + entries + body
+
+def resource_directory(entries):
+    # entries: [(id, offset relative to the resource section, is_directory)], ids ascending
+    data = struct.pack("<IIHHHH", 0, 0, 0, 0, 0, len(entries))
+    for entry_id, offset, is_directory in entries:
+        data += struct.pack("<II", entry_id, offset | (0x80000000 if is_directory else 0))
+    return data
+
+# Minimal PE32 .dll with a .rsrc section holding icon groups. groups: [(group id, [(icon id, size, frame data)])]
+def build_pe(groups):
+    section_rva = 0x1000
+    section_offset = 0x200
+    icons = [icon for _, group_icons in groups for icon in group_icons]
+
+    # Layout: root dir, RT_ICON dirs, RT_GROUP_ICON dirs, data entries, then the raw data.
+    resource = bytearray()
+    def reserve(size):
+        offset = len(resource)
+        resource.extend(b"\x00" * size)
+        return offset
+    def directory_size(count):
+        return 16 + 8 * count
+
+    root = reserve(directory_size(2))
+    icon_type = reserve(directory_size(len(icons)))
+    icon_languages = [reserve(directory_size(1)) for _ in icons]
+    group_type = reserve(directory_size(len(groups)))
+    group_languages = [reserve(directory_size(1)) for _ in groups]
+    icon_entries = [reserve(16) for _ in icons]
+    group_entries = [reserve(16) for _ in groups]
+
+    def add_data(entry_offset, data):
+        while len(resource) % 4:
+            resource.append(0)
+        data_offset = len(resource)
+        resource.extend(data)
+        resource[entry_offset:entry_offset + 16] = struct.pack("<IIII", section_rva + data_offset, len(data), 0, 0)
+
+    for icon, entry in zip(icons, icon_entries):
+        add_data(entry, icon[2])
+    for (group_id, group_icons), entry in zip(groups, group_entries):
+        group = struct.pack("<HHH", 0, 1, len(group_icons))
+        for icon_id, size, data in group_icons:
+            group += struct.pack("<BBBBHHIH", size % 256, size % 256, 0, 0, 1, 32, len(data), icon_id)
+        add_data(entry, group)
+
+    def put(offset, data):
+        resource[offset:offset + len(data)] = data
+
+    put(root, resource_directory([(3, icon_type, True), (14, group_type, True)]))
+    put(icon_type, resource_directory([(icon[0], language, True) for icon, language in zip(icons, icon_languages)]))
+    for language, entry in zip(icon_languages, icon_entries):
+        put(language, resource_directory([(1033, entry, False)]))
+    put(group_type, resource_directory([(group[0], language, True) for group, language in zip(groups, group_languages)]))
+    for language, entry in zip(group_languages, group_entries):
+        put(language, resource_directory([(1033, entry, False)]))
+
+    raw_size = (len(resource) + 0x1FF) & ~0x1FF
+    pe_offset = 0x80
+    dos_header = b"MZ" + b"\x00" * 0x3A + struct.pack("<I", pe_offset)
+    coff = struct.pack("<HHIIIHH", 0x14C, 1, 0, 0, 0, 224, 0x2102)
+    optional = bytearray(224)
+    struct.pack_into("<H", optional, 0, 0x10B)
+    # Data directory 2 (resources)
+    struct.pack_into("<II", optional, 96 + 2 * 8, section_rva, len(resource))
+    section = struct.pack("<8sIIIIIIHHI", b".rsrc", len(resource), section_rva, raw_size, section_offset, 0, 0, 0, 0, 0x40000040)
+
+    headers = dos_header.ljust(pe_offset, b"\x00") + b"PE\x00\x00" + coff + bytes(optional) + section
+    return headers.ljust(section_offset, b"\x00") + bytes(resource).ljust(raw_size, b"\x00")
+
+def write(name, data):
+    with open(os.path.join(FIXTURE_DIRECTORY, name), "wb") as f:
+        f.write(data)
+
+def make_icon_fixtures():
+    # PNG framed .ico, 16 / 32 / 256
+    write("png_frames.ico", build_ico([(size, size, 32, png_bytes(solid(size))) for size in (16, 32, 256)]))
+    # BMP (DIB) framed .ico, 16 / 32 / 48
+    write("bmp_frames.ico", build_ico([(size, size, 32, dib_bytes(solid(size))) for size in (16, 32, 48)]))
+    # Group 101: 16 (DIB) + 64 (PNG), group 102: 48 (DIB)
+    write("icons.dll", build_pe([
+        (101, [(1, 16, dib_bytes(solid(16))), (2, 64, png_bytes(solid(64)))]),
+        (102, [(3, 48, dib_bytes(solid(48)))]),
+    ]))
+
+LINK_CLSID = b"\x01\x14\x02\x00\x00\x00\x00\x00\xc0\x00\x00\x00\x00\x00\x00\x46"
+HAS_LINK_INFO = 0x2
+HAS_RELATIVE_PATH = 0x8
+HAS_WORKING_DIR = 0x10
+HAS_ICON_LOCATION = 0x40
+IS_UNICODE = 0x80
+HAS_EXP_STRING = 0x200
+HAS_EXP_ICON = 0x4000
+
+# LinkInfo for a local path (VolumeID + LocalBasePath) or a network share (CommonNetworkRelativeLink + suffix)
+def build_link_info(local_base_path=None, net_name=None, suffix=""):
+    header_size = 0x1C
+    body = b""
+    volume_offset = local_offset = network_offset = 0
+    if local_base_path is not None:
+        volume_offset = header_size
+        # VolumeID: size, drive type (fixed), serial number, label offset, empty label
+        volume = struct.pack("<IIII", 0x11, 3, 0x1234ABCD, 0x10) + b"\x00"
+        body += volume
+        local_offset = header_size + len(body)
+        body += local_base_path.encode("cp1252") + b"\x00"
+        flags = 0x1
+    else:
+        network_offset = header_size
+        net_name_bytes = net_name.encode("cp1252") + b"\x00"
+        # size, flags, net name offset, device name offset, network provider type
+        body += struct.pack("<IIIII", 0x14 + len(net_name_bytes), 0, 0x14, 0, 0x20000) + net_name_bytes
+        flags = 0x2
+    suffix_offset = header_size + len(body)
+    body += suffix.encode("cp1252") + b"\x00"
+    size = header_size + len(body)
+    return struct.pack("<IIIIIII", size, header_size, flags, volume_offset, local_offset, network_offset, suffix_offset) + body
+
+def string_data(text):
+    return struct.pack("<H", len(text)) + text.encode("utf-16-le")
+
+# EnvironmentVariableDataBlock / IconEnvironmentDataBlock
+def environment_block(signature, target):
+    return (struct.pack("<II", 788, signature) + target.encode("cp1252").ljust(260, b"\x00")
+            + target.encode("utf-16-le").ljust(520, b"\x00"))
+
+def build_lnk(link_info=None, relative_path=None, working_dir=None, icon_location=None, icon_index=0, blocks=()):
+    flags = IS_UNICODE
+    body = b""
+    if link_info is not None:
+        flags |= HAS_LINK_INFO
+        body += link_info
+    for flag, value in ((HAS_RELATIVE_PATH, relative_path), (HAS_WORKING_DIR, working_dir), (HAS_ICON_LOCATION, icon_location)):
+        if value is not None:
+            flags |= flag
+            body += string_data(value)
+    for signature, _ in blocks:
+        flags |= HAS_EXP_STRING if signature == 0xA0000001 else HAS_EXP_ICON
+    for signature, target in blocks:
+        body += environment_block(signature, target)
+    body += struct.pack("<I", 0)
+    header = struct.pack("<I16sII8s8s8sIiIH10x", 0x4C, LINK_CLSID, flags, 0x20, b"\x00" * 8, b"\x00" * 8, b"\x00" * 8, 0, icon_index, 1, 0)
+    return header + body
+
+def make_lnk_fixtures():
+    write("local.lnk", build_lnk(build_link_info(local_base_path="C:\\Program Files\\App\\app.exe"), working_dir="C:\\Program Files\\App"))
+    write("relative.lnk", build_lnk(relative_path=".\\tools\\tool.exe"))
+    write("icon_index.lnk", build_lnk(build_link_info(local_base_path="C:\\Games\\game.exe"),
+                                      icon_location="C:\\Windows\\System32\\shell32.dll", icon_index=12))
+    write("environment.lnk", build_lnk(icon_location="%SystemRoot%\\System32\\imageres.dll", icon_index=-5, blocks=[
+        (0xA0000001, "%ProgramFiles%\\App\\app.exe"),
+        (0xA0000007, "%SystemRoot%\\System32\\imageres.dll"),
+    ]))
+    write("network.lnk", build_lnk(build_link_info(net_name="\\\\server\\share", suffix="folder\\report.docx")))
+
+
+if __name__ == "__main__":
+    make_icon_fixtures()
+    make_lnk_fixtures()
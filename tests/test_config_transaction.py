@@ -0,0 +1,60 @@
+import json
+import pytest
+import util.config as config
+from util.config import (IconRecord, transaction, save_entry, delete_entry, swap_icons_by_position, reset_all_to_default_font_size,
+                         rebuild_lookup_table, get_item)
+
+
+@pytest.fixture
+def desktop(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOURNAL_PATH", str(tmp_path / "desktop.journal"))
+    monkeypatch.setattr(config, "schedule_compaction", lambda: None)
+    monkeypatch.setattr(config, "JSON", [
+        IconRecord({"id": "a", "row": 0, "column": 0, "name": "A", "use_global_font_size": False}),
+        IconRecord({"id": "b", "row": 0, "column": 1, "name": "B"}),
+    ])
+    monkeypatch.setattr(config, "JOURNAL_LENGTH", 0)
+    rebuild_lookup_table()
+    return tmp_path / "desktop.journal"
+
+def snapshot():
+    return sorted((item.row, item.column, item.to_dict()["id"], item.name, item.use_global_font_size) for item in config.JSON)
+
+def fail_inside(edit):
+    with pytest.raises(RuntimeError):
+        with transaction():
+            edit()
+            raise RuntimeError("edit failed")
+
+def test_commit_writes_one_journal_append(desktop):
+    with transaction():
+        save_entry({"row": 0, "column": 0, "name": "Renamed"})
+        save_entry({"row": 2, "column": 2, "name": "New"})
+    records = [json.loads(line) for line in desktop.read_text().splitlines()]
+    assert [record["entry"]["name"] for record in records] == ["Renamed", "New"]
+    assert config.JOURNAL_LENGTH == 2
+
+def test_rollback_restores_touched_records_in_place(desktop):
+    before = snapshot()
+    item_a = get_item(0, 0)
+    item_b = get_item(0, 1)
+
+    def edit():
+        save_entry({"row": 0, "column": 0, "name": "Renamed"})
+        swap_icons_by_position(0, 0, 0, 1)
+        delete_entry(0, 0)
+        save_entry({"row": 3, "column": 3, "name": "New"})
+    fail_inside(edit)
+
+    assert snapshot() == before
+    # The same record objects are back at their positions, nothing else was rebuilt.
+    assert get_item(0, 0) is item_a and get_item(0, 1) is item_b
+    assert get_item(3, 3) is None
+    assert config.NON_DEFAULT_ITEMS == {(0, 0), (0, 1)}
+    assert not desktop.exists()
+
+def test_rollback_restores_update_all_fields(desktop):
+    before = snapshot()
+    fail_inside(reset_all_to_default_font_size)
+    assert snapshot() == before
+    assert get_item(0, 0).use_global_font_size is False
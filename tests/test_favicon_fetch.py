@@ -0,0 +1,69 @@
+import socket
+from conftest import png_data
+from icon_gen.favicon_fetch import fetch_url, fetch_favicon, domain_failed_recently
+
+
+def test_fresh_response_is_served_from_cache(http_server, favicon_cache):
+    http_server.routes["/favicon.png"] = (200, {"Content-Type": "image/png"}, png_data())
+    url = http_server.url("/favicon.png")
+    assert fetch_favicon(url) == png_data()
+    assert fetch_favicon(url) == png_data()
+    assert http_server.requested_paths() == ["/favicon.png"]
+
+def test_etag_revalidation_serves_cached_body_on_304(http_server, favicon_cache):
+    http_server.routes["/etag.png"] = (200, {"Content-Type": "image/png", "ETag": '"v1"'}, png_data())
+    url = http_server.url("/etag.png")
+    assert fetch_url(url) == png_data()
+    # Stale straight away, so the second fetch revalidates.
+    assert fetch_url(url, ttl=0) == png_data()
+    assert http_server.requested_paths() == ["/etag.png", "/etag.png"]
+    assert http_server.requests[1][1].get("If-None-Match") == '"v1"'
+
+def test_last_modified_revalidation_serves_cached_body_on_304(http_server, favicon_cache):
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    http_server.routes["/modified.png"] = (200, {"Content-Type": "image/png", "Last-Modified": last_modified}, png_data())
+    url = http_server.url("/modified.png")
+    assert fetch_url(url) == png_data()
+    assert fetch_url(url, ttl=0) == png_data()
+    assert http_server.requests[1][1].get("If-Modified-Since") == last_modified
+
+def test_changed_resource_replaces_cached_body(http_server, favicon_cache):
+    http_server.routes["/changing.png"] = (200, {"ETag": '"v1"'}, png_data(color=(255, 0, 0, 255)))
+    url = http_server.url("/changing.png")
+    fetch_url(url)
+    http_server.routes["/changing.png"] = (200, {"ETag": '"v2"'}, png_data(color=(0, 255, 0, 255)))
+    assert fetch_url(url, ttl=0) == png_data(color=(0, 255, 0, 255))
+    assert fetch_url(url) == png_data(color=(0, 255, 0, 255))
+    assert len(http_server.requests) == 2
+
+def test_negative_cache_suppresses_repeat_fetch(http_server, favicon_cache):
+    url = http_server.url("/missing.ico")
+    assert fetch_favicon(url) is None
+    assert fetch_favicon(url) is None
+    assert http_server.requested_paths() == ["/missing.ico"]
+
+def test_non_image_body_is_rejected_and_not_cached_as_image(http_server, favicon_cache):
+    http_server.routes["/favicon.ico"] = (200, {"Content-Type": "text/html"}, b"<html><body>Not found</body></html>")
+    url = http_server.url("/favicon.ico")
+    assert fetch_favicon(url) is None
+    # The rejection is cached like any other failure.
+    assert fetch_favicon(url) is None
+    assert http_server.requested_paths() == ["/favicon.ico"]
+
+def test_unreachable_domain_is_not_retried(favicon_cache):
+    # A port nothing listens on, the connection is refused.
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert fetch_favicon(f"http://127.0.0.1:{port}/favicon.ico") is None
+    assert domain_failed_recently(f"http://127.0.0.1:{port}/other.png")
+    assert fetch_favicon(f"http://127.0.0.1:{port}/other.png") is None
+
+def test_batch_reuses_pooled_connection(http_server, favicon_cache):
+    for i in range(10):
+        http_server.routes[f"/icon{i}.png"] = (200, {"Content-Type": "image/png"}, png_data())
+    for i in range(10):
+        assert fetch_favicon(http_server.url(f"/icon{i}.png")) == png_data()
+    assert len(http_server.requests) == 10
+    # Every request went over the same keep-alive connection of the shared session.
+    assert len(http_server.connections) == 1
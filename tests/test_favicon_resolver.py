@@ -0,0 +1,60 @@
+from PIL import Image
+import icon_gen.favicon_to_image as favicon_to_image
+from conftest import png_data, read_page
+from icon_gen.favicon_resolver import find_candidates, resolve_favicon, parse_page_candidates
+
+
+def serve_page(http_server, path, name, content_type="text/html"):
+    http_server.routes[path] = (200, {"Content-Type": content_type}, read_page(name))
+
+def serve_png(http_server, path, size):
+    http_server.routes[path] = (200, {"Content-Type": "image/png"}, png_data(size))
+
+def candidate_paths(http_server, candidates):
+    return [candidate.url.replace(http_server.url(""), "") for candidate in candidates]
+
+def test_candidates_in_page_then_manifest_order(http_server, favicon_cache):
+    serve_page(http_server, "/", "icons.html")
+    serve_page(http_server, "/site.webmanifest", "site.webmanifest", "application/manifest+json")
+    candidates = find_candidates(http_server.url("/"))
+    # SVG icons are skipped, links after <body> are ignored, manifest icons follow the page's own links.
+    assert candidate_paths(http_server, candidates) == ["/icon-16.png", "/apple-touch-icon.png", "/android-chrome-192.png", "/android-chrome-512.png"]
+    assert [candidate.declared_size for candidate in candidates] == [16, 180, 192, 512]
+    assert [candidate.source for candidate in candidates] == ["icon", "apple-touch-icon", "manifest", "manifest"]
+
+def test_relative_href_resolves_against_base(http_server, favicon_cache):
+    serve_page(http_server, "/page/index.html", "base.html")
+    candidates = find_candidates(http_server.url("/page/index.html"))
+    assert candidate_paths(http_server, candidates) == ["/static/img/favicon.png"]
+
+def test_parse_page_candidates_without_base_uses_page_url():
+    candidates, manifest_url = parse_page_candidates('<link rel="icon" href="favicon.png">', "https://example.com/a/b.html")
+    assert [candidate.url for candidate in candidates] == ["https://example.com/a/favicon.png"]
+    assert manifest_url is None
+
+def test_resolve_picks_highest_resolution(http_server, favicon_cache):
+    serve_page(http_server, "/", "icons.html")
+    serve_page(http_server, "/site.webmanifest", "site.webmanifest", "application/manifest+json")
+    serve_png(http_server, "/icon-16.png", 16)
+    serve_png(http_server, "/apple-touch-icon.png", 180)
+    serve_png(http_server, "/android-chrome-192.png", 192)
+    # Declares 512 but is actually smaller, the downloaded size decides.
+    serve_png(http_server, "/android-chrome-512.png", 64)
+    assert resolve_favicon(http_server.url("/")) == png_data(192)
+    assert "/favicon.ico" not in http_server.requested_paths()
+
+def test_no_icon_links_falls_back_to_favicon_ico(http_server, favicon_cache):
+    serve_page(http_server, "/", "no_icons.html")
+    serve_png(http_server, "/favicon.ico", 32)
+    assert resolve_favicon(http_server.url("/")) == png_data(32)
+    assert http_server.requested_paths() == ["/", "/favicon.ico"]
+
+def test_no_favicon_at_all_falls_back_to_google_service(http_server, favicon_cache, monkeypatch, tmp_path):
+    serve_page(http_server, "/", "no_icons.html")
+    serve_png(http_server, "/s2/favicons", 128)
+    monkeypatch.setattr(favicon_to_image, "GOOGLE_FAVICON_SERVICE", http_server.url("/s2/favicons?domain={url}&sz={size}"))
+    output_path = str(tmp_path / "icon3.png")
+    assert favicon_to_image.favicon_to_image(http_server.url("/"), output_path, 64) == output_path
+    assert [path.split("?")[0] for path in http_server.requested_paths()] == ["/", "/favicon.ico", "/s2/favicons"]
+    with Image.open(output_path) as image:
+        assert image.size == (64, 64)
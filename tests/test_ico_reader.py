@@ -0,0 +1,114 @@
+import pytest
+from conftest import fixture_path, read_fixture
+from icon_gen.ico_reader import (read_icon_frames, select_frame, load_icon, load_icon_buffer, is_icon_data,
+                                 IconFrame, IconReaderError)
+
+# Colors of the frames written by fixtures/make_fixtures.py
+RED_16 = (255, 0, 0, 255)
+GREEN_32 = (0, 255, 0, 255)
+BLUE_48 = (0, 0, 255, 255)
+YELLOW_64 = (255, 255, 0, 255)
+MAGENTA_256 = (255, 0, 255, 255)
+
+
+def sizes(frames):
+    return [frame.width for frame in frames]
+
+def test_reads_png_framed_ico():
+    frames = read_icon_frames(read_fixture("png_frames.ico"))
+    assert sizes(frames) == [16, 32, 256]
+    assert all(frame.bit_count == 32 for frame in frames)
+
+def test_reads_bmp_framed_ico_sizes_from_dib_header():
+    frames = read_icon_frames(read_fixture("bmp_frames.ico"))
+    assert sizes(frames) == [16, 32, 48]
+    assert [frame.height for frame in frames] == [16, 32, 48]
+
+@pytest.mark.parametrize("icon_size, expected", [(1, 16), (16, 16), (17, 32), (32, 32), (33, 256), (256, 256), (512, 256)])
+def test_select_frame_smallest_at_least_icon_size_else_largest(icon_size, expected):
+    frames = read_icon_frames(read_fixture("png_frames.ico"))
+    assert select_frame(frames, icon_size).width == expected
+
+def test_select_frame_prefers_higher_bit_depth_on_ties():
+    frames = [IconFrame(32, 32, 8, 0, 1), IconFrame(32, 32, 32, 0, 1), IconFrame(16, 16, 32, 0, 1)]
+    assert select_frame(frames, 24).bit_count == 32
+    assert select_frame(frames, 64).bit_count == 32
+    assert select_frame([], 32) is None
+
+@pytest.mark.parametrize("name, icon_size, size, color", [
+    ("png_frames.ico", 24, 32, GREEN_32),
+    ("png_frames.ico", 100, 256, MAGENTA_256),
+    ("bmp_frames.ico", 16, 16, RED_16),
+    ("bmp_frames.ico", 40, 48, BLUE_48),
+])
+def test_load_icon_decodes_chosen_frame(name, icon_size, size, color):
+    image = load_icon(fixture_path(name), icon_size)
+    assert image.mode == "RGBA"
+    assert image.size == (size, size)
+    assert image.getpixel((size // 2, size // 2)) == color
+
+def test_reads_pe_icon_groups_in_index_order():
+    data = read_fixture("icons.dll")
+    assert sizes(read_icon_frames(data, 0)) == [16, 64]
+    assert sizes(read_icon_frames(data, 1)) == [48]
+
+def test_pe_negative_index_is_resource_id():
+    data = read_fixture("icons.dll")
+    assert sizes(read_icon_frames(data, -102)) == [48]
+    with pytest.raises(IconReaderError):
+        read_icon_frames(data, -999)
+
+def test_pe_index_out_of_range():
+    with pytest.raises(IconReaderError):
+        read_icon_frames(read_fixture("icons.dll"), 2)
+
+@pytest.mark.parametrize("icon_size, index, size, color", [(16, 0, 16, RED_16), (20, 0, 64, YELLOW_64), (16, 1, 48, BLUE_48)])
+def test_load_icon_from_pe(icon_size, index, size, color):
+    image = load_icon(fixture_path("icons.dll"), icon_size, index)
+    assert image.size == (size, size)
+    assert image.getpixel((size // 2, size // 2)) == color
+
+def test_is_icon_data():
+    assert is_icon_data(read_fixture("png_frames.ico"))
+    assert is_icon_data(read_fixture("icons.dll"))
+    assert not is_icon_data(b"\x89PNG\r\n\x1a\n")
+
+def test_truncated_ico_skips_frames_outside_the_file():
+    data = read_fixture("png_frames.ico")
+    frames = read_icon_frames(data)
+    # Cut the file inside the last (256px) frame.
+    truncated = data[:frames[-1].offset + 10]
+    assert sizes(read_icon_frames(truncated)) == [16, 32]
+    assert load_icon_buffer(truncated, 256).size == (32, 32)
+
+def test_truncated_directory_raises():
+    with pytest.raises(IconReaderError):
+        read_icon_frames(read_fixture("bmp_frames.ico")[:20])
+
+def test_ico_without_usable_frames_raises():
+    data = read_fixture("png_frames.ico")
+    with pytest.raises(IconReaderError):
+        load_icon_buffer(data[:6 + 16 * 3], 32)
+
+def test_corrupt_frame_data_raises_icon_reader_error():
+    data = bytearray(read_fixture("png_frames.ico"))
+    frame = read_icon_frames(bytes(data))[1]
+    # Keep the PNG signature and size, break the image data after it.
+    data[frame.offset + 24:frame.offset + frame.size] = b"\xff" * (frame.size - 24)
+    with pytest.raises(IconReaderError):
+        load_icon_buffer(bytes(data), 32)
+
+def test_truncated_pe_raises():
+    data = read_fixture("icons.dll")
+    with pytest.raises(IconReaderError):
+        read_icon_frames(data[:0x180])
+
+def test_not_an_icon_raises():
+    with pytest.raises(IconReaderError):
+        read_icon_frames(b"GIF89a" + b"\x00" * 32)
+
+def test_empty_file_raises(tmp_path):
+    path = tmp_path / "empty.ico"
+    path.write_bytes(b"")
+    with pytest.raises(IconReaderError):
+        load_icon(str(path), 32)
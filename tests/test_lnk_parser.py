@@ -0,0 +1,89 @@
+import os
+import shutil
+import pytest
+from conftest import fixture_path
+from icon_gen.lnk_parser import read_lnk, parse_lnk, LnkParseError, LNK_CACHE
+
+
+@pytest.fixture
+def lnk_copy(tmp_path):
+    # Tests that touch LNK_CACHE work on their own copy so cached results never leak between tests.
+    def copy(name):
+        path = tmp_path / name
+        shutil.copyfile(fixture_path(name), path)
+        return str(path)
+    return copy
+
+def test_local_target():
+    link = read_lnk(fixture_path("local.lnk"))
+    assert link.target_path == "C:\\Program Files\\App\\app.exe"
+    assert link.working_dir == "C:\\Program Files\\App"
+    assert link.icon_location is None
+    assert link.icon_index == 0
+
+def test_relative_path_resolves_against_shortcut_folder(lnk_copy):
+    path = lnk_copy("relative.lnk")
+    link = read_lnk(path)
+    assert link.relative_path == ".\\tools\\tool.exe"
+    assert link.target_path == os.path.join(os.path.dirname(path), "tools", "tool.exe")
+
+def test_icon_location_with_index():
+    link = read_lnk(fixture_path("icon_index.lnk"))
+    assert link.target_path == "C:\\Games\\game.exe"
+    assert link.icon_location == "C:\\Windows\\System32\\shell32.dll"
+    assert link.icon_index == 12
+
+def test_environment_variables_are_expanded(monkeypatch, lnk_copy):
+    monkeypatch.setenv("SystemRoot", "C:\\Windows")
+    monkeypatch.setenv("ProgramFiles", "D:\\Programs")
+    link = read_lnk(lnk_copy("environment.lnk"))
+    assert link.target_path == "D:\\Programs\\App\\app.exe"
+    assert link.icon_location == "C:\\Windows\\System32\\imageres.dll"
+    assert link.icon_index == -5
+
+def test_network_target():
+    link = read_lnk(fixture_path("network.lnk"))
+    assert link.target_path == "\\\\server\\share\\folder\\report.docx"
+
+def test_not_a_shortcut():
+    with pytest.raises(LnkParseError):
+        parse_lnk(b"\x00" * 76)
+
+def test_truncated_shortcut():
+    with open(fixture_path("icon_index.lnk"), "rb") as f:
+        data = f.read()
+    with pytest.raises(LnkParseError):
+        parse_lnk(data[:100])
+
+def test_cache_reused_while_mtime_and_size_unchanged(lnk_copy):
+    path = lnk_copy("local.lnk")
+    first = read_lnk(path)
+    stat = os.stat(path)
+    # Same size and mtime: the file is not parsed again, even though its contents differ.
+    with open(fixture_path("local.lnk"), "rb") as f:
+        data = bytearray(f.read())
+    data[-10] ^= 0xFF
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert read_lnk(path) is first
+    assert os.path.normcase(os.path.abspath(path)) in LNK_CACHE
+
+def test_cache_invalidated_when_mtime_changes(lnk_copy):
+    path = lnk_copy("local.lnk")
+    first = read_lnk(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = read_lnk(path)
+    assert second is not first
+    assert second.target_path == first.target_path
+
+def test_cache_invalidated_when_size_changes(lnk_copy):
+    path = lnk_copy("local.lnk")
+    first = read_lnk(path)
+    stat = os.stat(path)
+    shutil.copyfile(fixture_path("icon_index.lnk"), path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    second = read_lnk(path)
+    assert second is not first
+    assert second.target_path == "C:\\Games\\game.exe"
@@ -0,0 +1,51 @@
+import os
+import pickle
+import pytest
+from util.startup_snapshot import read_snapshot, write_snapshot, get_snapshot_path, get_schema_version
+
+SCHEMA = ("id", "row", "column")
+DATA = {"entries": [1, 2, 3]}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "desktop.json"
+    path.write_text("[]")
+    return str(path)
+
+def write_raw_snapshot(source, payload):
+    with open(get_snapshot_path(source), "wb") as f:
+        f.write(payload)
+
+def test_round_trip(source):
+    write_snapshot(source, DATA, SCHEMA)
+    assert get_snapshot_path(source).endswith("desktop.snapshot")
+    assert read_snapshot(source, SCHEMA) == DATA
+
+def test_schema_version_follows_schema():
+    assert get_schema_version(SCHEMA) == get_schema_version(list(SCHEMA))
+    assert get_schema_version(SCHEMA) != get_schema_version(SCHEMA + ("name",))
+
+def test_changed_schema_is_a_miss(source):
+    write_snapshot(source, DATA, SCHEMA)
+    assert read_snapshot(source, SCHEMA + ("name",)) is None
+
+def test_changed_source_is_a_miss(source):
+    write_snapshot(source, DATA, SCHEMA)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert read_snapshot(source, SCHEMA) is None
+
+def test_missing_snapshot_is_a_miss(source):
+    assert read_snapshot(source, SCHEMA) is None
+
+@pytest.mark.parametrize("payload", [
+    b"",
+    b"not a pickle",
+    pickle.dumps(("only", "two")),
+    # References an attribute that does not exist (a class removed or renamed since the snapshot was written)
+    b"\x80\x04cutil.startup_snapshot\nNoSuchRecord\n.",
+], ids=["empty", "garbage", "wrong_layout", "missing_attribute"])
+def test_unreadable_snapshot_is_a_miss(source, payload):
+    write_raw_snapshot(source, payload)
+    assert read_snapshot(source, SCHEMA) is None
@@ -0,0 +1,140 @@
+import os
+import shutil
+import hashlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Content addressed icon store: DATA_DIRECTORY/blobs/<sha256><extension>
+# Identical images (the same favicon, default browser icon or shared .ico used by many cells) are stored once and every entry's icon_path points at the same blob.
+# Since identical images share a path they also share one decoded pixmap (pixmap_cache.py) and one thumbnail (thumbnail_cache.py).
+# Blobs are never modified, config.collect_unreferenced_blobs() removes the ones no entry references anymore.
+BLOB_DIRECTORY = None
+# Pre-scaled copies of every blob: BLOB_DIRECTORY/mipmaps/<sha256>_<size>.png, written by icon_gen.icon_utils when an icon is generated or stored.
+# Icons are drawn from the smallest level covering their size, so changing icon_size never decodes the full source again.
+MIPMAP_DIRECTORY = None
+MIPMAP_SIZES = [32, 48, 64, 96, 128, 256]
+# Animated icons are drawn by animation_clock.py from their frames, they get no mipmaps.
+NO_MIPMAP_EXTENSIONS = (".gif",)
+# Unreferenced blobs younger than this are kept, they may belong to an edit menu that has not saved yet.
+BLOB_GC_GRACE_SECONDS = 24 * 60 * 60
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def set_blob_directory(blob_directory):
+    global BLOB_DIRECTORY, MIPMAP_DIRECTORY
+    BLOB_DIRECTORY = blob_directory
+    MIPMAP_DIRECTORY = os.path.join(blob_directory, "mipmaps")
+    os.makedirs(MIPMAP_DIRECTORY, exist_ok=True)
+
+def get_blob_directory():
+    return BLOB_DIRECTORY
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def is_blob_path(path):
+    if not path or BLOB_DIRECTORY is None:
+        return False
+    return os.path.dirname(normalize_path(path)) == normalize_path(BLOB_DIRECTORY)
+
+# sha256 of a blob from its file name, without reading it.
+def get_blob_hash(blob_path):
+    return os.path.splitext(os.path.basename(blob_path))[0]
+
+def get_mipmap_directory():
+    return MIPMAP_DIRECTORY
+
+# Mipmaps are keyed by content hash, so an icon generated before it is stored already has its levels when it becomes a blob.
+def get_mipmap_path(content_hash, size):
+    return os.path.join(MIPMAP_DIRECTORY, f"{content_hash}_{size}.png")
+
+def has_mipmaps(blob_path):
+    if MIPMAP_DIRECTORY is None or blob_path.lower().endswith(NO_MIPMAP_EXTENSIONS):
+        return True
+    blob_hash = get_blob_hash(blob_path)
+    return all(os.path.exists(get_mipmap_path(blob_hash, size)) for size in MIPMAP_SIZES)
+
+# Every mipmap path blob_path can be drawn from, empty if it is not a blob or gets no mipmaps.
+def get_mipmap_paths(blob_path):
+    if MIPMAP_DIRECTORY is None or not is_blob_path(blob_path) or blob_path.lower().endswith(NO_MIPMAP_EXTENSIONS):
+        return []
+    blob_hash = get_blob_hash(blob_path)
+    return [get_mipmap_path(blob_hash, size) for size in MIPMAP_SIZES]
+
+# Returns the smallest mipmap of path at least pixel_size pixels, None if path is not a blob, pixel_size is larger than every level or the level was not written.
+def find_mipmap(path, pixel_size):
+    if MIPMAP_DIRECTORY is None or not is_blob_path(path) or path.lower().endswith(NO_MIPMAP_EXTENSIONS):
+        return None
+    for size in MIPMAP_SIZES:
+        if size >= pixel_size:
+            mipmap_path = get_mipmap_path(get_blob_hash(path), size)
+            return mipmap_path if os.path.exists(mipmap_path) else None
+    return None
+
+# Returns the blob path holding the contents of path, copying it into the store only if no identical image is stored yet.
+# The extension is kept so format checks like .gif still work on the blob path.
+def store_blob(path):
+    if is_blob_path(path):
+        return path
+    blob_path = os.path.join(BLOB_DIRECTORY, hash_file(path) + os.path.splitext(path)[1].lower())
+    if os.path.exists(blob_path):
+        # Refresh mtime so a garbage collection running before this entry is saved keeps it.
+        os.utime(blob_path)
+        logger.info(f"{path} already stored as {blob_path}")
+        return blob_path
+
+    temp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        # copyfile copies contents only, so hidden/read only attributes of the source are not carried over.
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, blob_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"Stored {path} as {blob_path}")
+    return blob_path
+
+# Removes every blob with no references in refcounts ({normalized blob path: count}) that is older than BLOB_GC_GRACE_SECONDS,
+# and the mipmaps of every hash that is not a referenced blob (including those of generated icons that were never saved).
+def collect_garbage(refcounts):
+    if BLOB_DIRECTORY is None:
+        return 0
+    referenced_hashes = {get_blob_hash(path) for path, count in refcounts.items() if count > 0}
+    removed = remove_unreferenced(BLOB_DIRECTORY, lambda entry: refcounts.get(normalize_path(entry.path), 0) > 0)
+    if MIPMAP_DIRECTORY is not None and os.path.isdir(MIPMAP_DIRECTORY):
+        remove_unreferenced(MIPMAP_DIRECTORY, lambda entry: entry.name.split("_")[0] in referenced_hashes)
+    return removed
+
+def remove_unreferenced(directory, is_referenced):
+    removed = 0
+    freed = 0
+    now = time.time()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if is_referenced(entry):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime < BLOB_GC_GRACE_SECONDS:
+                continue
+            try:
+                os.remove(entry.path)
+                removed += 1
+                freed += stat.st_size
+            except OSError as e:
+                logger.warning(f"Failed to remove unreferenced file {entry.path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} unreferenced files from {directory} ({freed / 1024:.0f} KB)")
+    return removed
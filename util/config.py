@@ -1,7 +1,13 @@
 import json
 import os
+import sys
 import logging
-from util.settings import get_setting
+import threading
+import uuid
+from contextlib import contextmanager
+from util.settings import get_setting, subscribe
+from util.startup_snapshot import read_snapshot, write_snapshot
+from util.blob_store import set_blob_directory, is_blob_path, store_blob, normalize_path, collect_garbage
 
 
 logger = logging.getLogger(__name__)
@@ -9,11 +15,38 @@ DESKTOP_CONFIG_DIRECTORY = None
 JSON = ""
 DATA_DIRECTORY = None
 
+# Append-only change journal stored next to desktop.json (desktop.journal).
+# Every edit is appended here as a small delta, and the journal is folded back into desktop.json in the background.
+JOURNAL_PATH = None
+# Number of deltas currently in the journal (not yet compacted into desktop.json)
+JOURNAL_LENGTH = 0
+# Seconds without new edits before the journal is compacted into desktop.json
+JOURNAL_COMPACT_DELAY = 5.0
+# Compact straight away once the journal holds this many deltas
+JOURNAL_COMPACT_LIMIT = 200
+COMPACT_TIMER = None
+# Held while changing JSON/ITEM_LOOKUP_TABLE or the journal so the background compaction always sees a consistent state.
+CONFIG_LOCK = threading.RLock()
+# Only one compaction writes desktop.json at a time.
+COMPACT_LOCK = threading.Lock()
+# Journal records collected by the open transaction(), None when no transaction is open.
+TRANSACTION_RECORDS = None
+# Undo data of the open transaction, only for what it touched: ("entry", item, state) / ("fields", [(item, previous values)]), in order.
+TRANSACTION_UNDO = None
+# (row, column) -> the IconRecord (or None) at each position before the open transaction first touched it.
+TRANSACTION_ORIGINALS = None
+
 # Used to directly get a reference to the JSON item at ("row", "column")
 ITEM_LOOKUP_TABLE = {}
+# ("row", "column") of every entry which is not default (i.e. is drawn as a DesktopIcon). Kept up to date alongside ITEM_LOOKUP_TABLE.
+NON_DEFAULT_ITEMS = set()
+# ("row", "column") -> IconStyle, the font an entry's label is actually drawn with (its own or the global settings).
+# Resolved on first read, dropped when the entry is reindexed or a global font setting it follows changes.
+STYLE_TABLE = {}
 
 #These are all active .json arguments and their defaults
 DEFAULT_DESKTOP =  {
+    "id": "",
     "row": 0,
     "column": 0,
     "name": "",
@@ -28,6 +61,68 @@ DEFAULT_DESKTOP =  {
     "use_global_font_color": True
 }
 
+# Keys which describe where/which entry it is, rather than what the DesktopIcon shows.
+POSITION_KEYS = ['id', 'row', 'column']
+
+# Strings many entries share (colors, blob icon paths, browsers / launchers) are interned so every entry references one copy.
+INTERNED_KEYS = {"icon_path", "executable_path", "website_link", "font_color"}
+
+
+# In memory form of a desktop.json entry, JSON and ITEM_LOOKUP_TABLE hold these instead of dicts.
+# One slot per DEFAULT_DESKTOP key, keys missing from desktop.json get their default.
+# Keys this version does not know about are kept in extra so they are written back unchanged.
+class IconRecord:
+    __slots__ = tuple(DEFAULT_DESKTOP) + ("extra",)
+
+    def __init__(self, fields=None):
+        for key, value in DEFAULT_DESKTOP.items():
+            setattr(self, key, value)
+        self.extra = None
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+    # desktop.json form of the record.
+    def to_dict(self):
+        data = {key: getattr(self, key) for key in DEFAULT_DESKTOP}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def update(self, fields):
+        for key, value in fields.items():
+            if key in DEFAULT_DESKTOP:
+                if key in INTERNED_KEYS and isinstance(value, str):
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def copy(self):
+        return IconRecord(self.to_dict())
+
+    # Every slot value, restored in place by set_state() so references to the record stay valid.
+    def get_state(self):
+        return tuple(dict(self.extra) if key == "extra" and self.extra else getattr(self, key) for key in self.__slots__)
+
+    def set_state(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return f"IconRecord({self.id!r}, ({self.row}, {self.column}), {self.name!r})"
+
+# Returned by get_icon_data() for cells without an entry, never modified.
+EMPTY_RECORD = IconRecord()
+
+#id:
+# Permanent id given to an entry when it is created. Its data folder is DATA_DIRECTORY/id so moving/swapping icons never touches the folder.
+
 #launch_option options:
 #0 First come first serve (down the list) i.e. executable_path, then if none -> website_link
 #1 Website link first
@@ -49,11 +144,14 @@ def create_paths():
     logger.info("Created config path")
     create_data_path()
     logger.info("Created data path")
+    migrate_position_folders()
+    migrate_icons_to_blobs()
+    collect_unreferenced_blobs()
 
 
 def create_config_path():
 
-    global DESKTOP_CONFIG_DIRECTORY, DEFAULT_DESKTOP, JSON, ITEM_LOOKUP_TABLE
+    global DESKTOP_CONFIG_DIRECTORY, DEFAULT_DESKTOP, JSON, ITEM_LOOKUP_TABLE, JOURNAL_PATH
 
     app_data_path = os.path.join(os.getenv('APPDATA'), 'AlternativeDesktop')
 
@@ -71,17 +169,43 @@ def create_config_path():
 
     logger.info(f"Configuration file path: {config_path}")
     DESKTOP_CONFIG_DIRECTORY = config_path
+    JOURNAL_PATH = os.path.join(config_dir, 'desktop.journal')
 
     if os.path.exists(DESKTOP_CONFIG_DIRECTORY) and os.path.getsize(DESKTOP_CONFIG_DIRECTORY) > 0:
-        with open(DESKTOP_CONFIG_DIRECTORY, "r") as f:
-            JSON = json.load(f)
-            ITEM_LOOKUP_TABLE = {(item['row'], item['column']): item for item in JSON}
+        if not load_config_snapshot():
+            with open(DESKTOP_CONFIG_DIRECTORY, "r") as f:
+                JSON = [IconRecord.from_dict(entry) for entry in json.load(f)]
+            rebuild_lookup_table()
     else:
         logger.info(f"Creating default settings at: {DESKTOP_CONFIG_DIRECTORY}")
-        JSON = [DEFAULT_DESKTOP]
-        ITEM_LOOKUP_TABLE = {(DEFAULT_DESKTOP['row'], DEFAULT_DESKTOP['column']): DEFAULT_DESKTOP}
-        with open(DESKTOP_CONFIG_DIRECTORY, "w") as f:
-            json.dump([DEFAULT_DESKTOP], f, indent=4)
+        JSON = [IconRecord()]
+        write_config_file([item.to_dict() for item in JSON])
+        rebuild_lookup_table()
+
+    # Apply any edits which were journaled but not yet compacted (i.e. the program closed before the background compaction ran)
+    if replay_journal():
+        compact_journal()
+
+# Loads JSON, ITEM_LOOKUP_TABLE and NON_DEFAULT_ITEMS from desktop.snapshot if desktop.json has not changed since it was written.
+# Returns False if desktop.json has to be parsed instead.
+def load_config_snapshot():
+    global JSON, ITEM_LOOKUP_TABLE, NON_DEFAULT_ITEMS
+    snapshot = read_snapshot(DESKTOP_CONFIG_DIRECTORY, IconRecord.__slots__)
+    try:
+        records, lookup_table, non_default_items = snapshot
+    except (TypeError, ValueError):
+        return False
+    JSON, ITEM_LOOKUP_TABLE, NON_DEFAULT_ITEMS = records, lookup_table, non_default_items
+    STYLE_TABLE.clear()
+    logger.info(f"Loaded {len(JSON)} entries from the startup snapshot of desktop.json")
+    return True
+
+# Writes desktop.snapshot for the entries just written to desktop.json, already as IconRecords and indexed (see startup_snapshot.py)
+def write_config_snapshot(entries):
+    records = [IconRecord.from_dict(entry) for entry in entries]
+    lookup_table = {(item.row, item.column): item for item in records}
+    non_default_items = {position for position, item in lookup_table.items() if not entry_is_default(item)}
+    write_snapshot(DESKTOP_CONFIG_DIRECTORY, (records, lookup_table, non_default_items), IconRecord.__slots__)
 
 def create_data_path():
 
@@ -99,61 +223,191 @@ def create_data_path():
         os.makedirs(data_path)
     
     DATA_DIRECTORY = data_path
+    # Content addressed icon images shared by every entry (see blob_store.py)
+    set_blob_directory(os.path.join(data_path, 'blobs'))
+
+# One time migration from data folders named DATA_DIRECTORY/[row, col] to DATA_DIRECTORY/id.
+# Gives every entry without an id a new one, renames its [row, col] folder and repoints icon_path into the renamed folder.
+def migrate_position_folders():
+    migrated = False
+    for item in JSON:
+        if item.id:
+            continue
+        item.id = new_entry_id()
+        migrated = True
+
+        old_dir = os.path.join(DATA_DIRECTORY, f"[{item.row}, {item.column}]")
+        new_dir = get_entry_data_path(item.id)
+        if not os.path.isdir(old_dir):
+            continue
+        try:
+            os.rename(old_dir, new_dir)
+            logger.info(f"Migrated data folder {old_dir} to {new_dir}")
+        except OSError as e:
+            # icon_path still points at the old folder which remains valid, new icons go in the id folder.
+            logger.error(f"Failed to migrate data folder {old_dir} to {new_dir}: {e}")
+            continue
+
+        icon_path = item.icon_path
+        if icon_path and os.path.normcase(os.path.normpath(icon_path)).startswith(os.path.normcase(old_dir) + os.sep):
+            item.icon_path = os.path.join(new_dir, os.path.relpath(icon_path, old_dir))
+
+    if migrated:
+        logger.info("Assigned ids to desktop.json entries")
+        save_config_to_file(JSON)
+
+# Moves icons that live in entry data folders (auto generated or local copies) into the blob store so identical images are stored once.
+# The original files are left in place, auto generated ones are what batch regeneration compares against.
+def migrate_icons_to_blobs():
+    migrated = False
+    data_directory = normalize_path(DATA_DIRECTORY)
+    for item in JSON:
+        icon_path = item.icon_path
+        if not icon_path or is_blob_path(icon_path) or not os.path.isfile(icon_path):
+            continue
+        if not normalize_path(icon_path).startswith(data_directory + os.sep):
+            continue
+        try:
+            item.icon_path = store_blob(icon_path)
+            migrated = True
+        except OSError as e:
+            logger.error(f"Failed to move {icon_path} into the blob store: {e}")
+
+    if migrated:
+        logger.info("Moved entry icons into the blob store")
+        save_config_to_file(JSON)
+
+# Number of entries referencing each blob, keyed by normalized blob path.
+def get_blob_refcounts():
+    with CONFIG_LOCK:
+        refcounts = {}
+        for item in JSON:
+            icon_path = item.icon_path
+            if is_blob_path(icon_path):
+                key = normalize_path(icon_path)
+                refcounts[key] = refcounts.get(key, 0) + 1
+        return refcounts
+
+# Deletes blobs no entry references anymore (icon changed, entry deleted or reset to default).
+def collect_unreferenced_blobs():
+    try:
+        collect_garbage(get_blob_refcounts())
+    except OSError as e:
+        logger.warning(f"Failed to collect unreferenced blobs: {e}")
+
+def new_entry_id():
+    return uuid.uuid4().hex
+
+# Returns the data folder for an entry id (DATA_DIRECTORY/id)
+def get_entry_data_path(entry_id):
+    return os.path.join(DATA_DIRECTORY, entry_id)
+
+# Returns the id of the entry at row, col, or a fresh id for a new entry that has not been saved yet.
+def get_entry_id(row, col):
+    item = get_item(row, col)
+    if item and item.id:
+        return item.id
+    return new_entry_id()
+
+# Rebuilds ITEM_LOOKUP_TABLE and NON_DEFAULT_ITEMS from JSON
+def rebuild_lookup_table():
+    global ITEM_LOOKUP_TABLE, NON_DEFAULT_ITEMS
+    ITEM_LOOKUP_TABLE = {(item.row, item.column): item for item in JSON}
+    NON_DEFAULT_ITEMS = {position for position, item in ITEM_LOOKUP_TABLE.items() if not entry_is_default(item)}
+    STYLE_TABLE.clear()
+
+# Points ITEM_LOOKUP_TABLE at item for its row, column and refreshes its non-default flag. Call after any change to an entry.
+def index_entry(item):
+    position = (item.row, item.column)
+    ITEM_LOOKUP_TABLE[position] = item
+    STYLE_TABLE.pop(position, None)
+    if entry_is_default(item):
+        NON_DEFAULT_ITEMS.discard(position)
+    else:
+        NON_DEFAULT_ITEMS.add(position)
+
+def unindex_position(row, col):
+    NON_DEFAULT_ITEMS.discard((row, col))
+    STYLE_TABLE.pop((row, col), None)
+    return ITEM_LOOKUP_TABLE.pop((row, col), None)
+
+# Returns ("row", "column") of every non-default entry, sorted by row then column.
+def get_populated_positions():
+    return sorted(NON_DEFAULT_ITEMS)
 
 def get_item(row, col):
     return ITEM_LOOKUP_TABLE.get((row, col))
 
+# Returns the entry with entry_id wherever it currently sits on the grid, or None.
+def get_item_by_id(entry_id):
+    for item in JSON:
+        if item.id == entry_id:
+            return item
+    return None
 
-def get_icon_data(row, column):
-    item = get_item(row, column)
-    if item:
-        return {
-            'icon_path': item.get('icon_path', ""),
-            'name': item.get('name', ""),
-            'executable_path': item.get('executable_path', ""),
-            'command_args': item.get('command_args', ""),
-            'website_link': item.get('website_link', ""),
-            'launch_option': item.get('launch_option', 0),
-            'font_size': item.get('font_size', get_setting("global_font_size", 10)),
-            'use_global_font_size': item.get('use_global_font_size', True),
-            'font_color': item.get('font_color', get_setting("global_font_color", 10)),
-            'use_global_font_color': item.get('use_global_font_color', True)
-            }
-    return {
-        'icon_path': "",
-        'name': "",
-        'executable_path': "",
-        'command_args': "",
-        'website_link': "",
-        'launch_option': 0,
-        'font_size': 10,
-        'use_global_font_size': True,
-        'font_color': "#ffffff",
-        'use_global_font_color': True
-    }
 
+# Returns the IconRecord at row, column (EMPTY_RECORD if there is none). Read only, change entries through save_entry().
+def get_icon_data(row, column):
+    return ITEM_LOOKUP_TABLE.get((row, column), EMPTY_RECORD)
+
+
+class IconStyle:
+    def __init__(self, font_family, font_size, font_color, uses_global_font_size, uses_global_font_color):
+        self.font_family = font_family
+        self.font_size = font_size
+        self.font_color = font_color
+        # Which global settings this style follows, only those changing can change it.
+        self.uses_global_font_size = uses_global_font_size
+        self.uses_global_font_color = uses_global_font_color
+
+    def __repr__(self):
+        return f"IconStyle({self.font_family!r}, {self.font_size}, {self.font_color!r})"
+
+
+# The global font size / color unless the entry uses its own. Entries not in JSON (new items) use the global ones.
+def resolve_icon_style(item):
+    global_font_size = get_setting("global_font_size", 10)
+    global_font_color = get_setting("global_font_color", "#ffffff")
+    if item is None:
+        return IconStyle(get_setting("font", "Arial"), global_font_size, global_font_color, True, True)
+    uses_global_font_size = bool(item.use_global_font_size)
+    uses_global_font_color = bool(item.use_global_font_color)
+    return IconStyle(get_setting("font", "Arial"),
+                     global_font_size if uses_global_font_size else item.font_size,
+                     global_font_color if uses_global_font_color else item.font_color,
+                     uses_global_font_size, uses_global_font_color)
+
+# Returns the IconStyle of the entry at row, col from STYLE_TABLE, resolving it if it is not there yet.
+def get_icon_style(row, col):
+    style = STYLE_TABLE.get((row, col))
+    if style is None:
+        # Resolved and stored under the lock so an invalidation can not land in between and leave a stale style behind.
+        with CONFIG_LOCK:
+            style = resolve_icon_style(get_item(row, col))
+            STYLE_TABLE[(row, col)] = style
+    return style
+
+# Settings change bus subscriber, drops only the styles following a global font setting that changed.
+def on_font_settings_changed(change):
+    with CONFIG_LOCK:
+        if "font" in change:
+            STYLE_TABLE.clear()
+            return
+        size_changed = "global_font_size" in change
+        color_changed = "global_font_color" in change
+        for position, style in list(STYLE_TABLE.items()):
+            if (size_changed and style.uses_global_font_size) or (color_changed and style.uses_global_font_color):
+                del STYLE_TABLE[position]
+
+subscribe(on_font_settings_changed, ("font", "global_font_size", "global_font_color"))
 
 # This is an override which returns the global font_size if the DesktopIcon uses default. And the local font_size if it uses a custom font_size.
 def get_icon_font_size(row, col):
-    item = get_item(row, col)
-    if item:
-        if item.get('use_global_font_size'):
-            return get_setting("global_font_size", 50)
-        else:
-            return item.get('font_size', get_setting("global_font_size", 10))
-    # Return global font size if item not in JSON (new item)
-    return get_setting("global_font_size", 10)
+    return get_icon_style(row, col).font_size
 
 # This is an override which returns the global label_color if the DesktopIcon uses default. And the local font_color if it uses a custom font_color.
 def get_icon_font_color(row, col):
-    item = get_item(row, col)
-    if item:
-        if item.get('use_global_font_color'):
-            return get_setting("global_font_color", "#ffffff")
-        else:
-            return item.get('font_color', get_setting("global_font_color", "#ffffff"))
-    # Return global font color for item not in JSON (new item)
-    return get_setting("global_font_color", "#ffffff")
+    return get_icon_style(row, col).font_color
 
 def get_json():
     return JSON
@@ -168,139 +422,336 @@ def entry_exists(row, col):
 def get_entry(row, col):
     return ITEM_LOOKUP_TABLE.get((row, col), False)
 
+# Keys missing from desktop.json entries are filled with their DEFAULT_DESKTOP values when loaded as IconRecords, this writes them out.
 def check_for_new_config():
-    config = load_desktop_config()
-    new_config = False
-
-    for entry in config:
-        for key, value in DEFAULT_DESKTOP.items():
-            if key not in entry:
-                logger.info(f"key: {key} not in settings")
-                entry[key] = value
-                new_config = True
-
-    if new_config:
-        logger.info(f"Saving new settings {config}")
-        save_config_to_file(config)
+    logger.info("Saving desktop.json with every entry key")
+    save_config_to_file(load_desktop_config())
 
+# Full rewrite of desktop.json from config. Normal edits go through the journal instead, this is only used for migrations.
 def save_config_to_file(config):
+    global JSON
     logger.info("Attempting to save the desktop.json")
-    
-    # Sort the config by row then column
-    sorted_config = sorted(config, key=lambda x: (x['row'], x['column']))
-
-    with open(DESKTOP_CONFIG_DIRECTORY, "w") as f:
-        json.dump(sorted_config, f, indent=4)
-        logger.info("Successfully saved desktop.json")
-    with open(DESKTOP_CONFIG_DIRECTORY, "r") as f:
-        global JSON, ITEM_LOOKUP_TABLE
-        JSON = sorted_config
-        ITEM_LOOKUP_TABLE = {(item['row'], item['column']): item for item in sorted_config}
-        logger.info("Reloaded JSON")
 
+    with CONFIG_LOCK:
+        # Sort the config by row then column
+        JSON = sorted(config, key=lambda x: (x.row, x.column))
+        rebuild_lookup_table()
+        logger.info("Reloaded JSON")
+    # desktop.json now holds everything, so fold in (discard) the journal as well.
+    compact_journal(force=True)
+
+# Writes entries to desktop.json through a temp file so a crash mid-write never leaves a half written desktop.json
+def write_config_file(entries):
+    temp_path = DESKTOP_CONFIG_DIRECTORY + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(entries, f, indent=4)
+    os.replace(temp_path, DESKTOP_CONFIG_DIRECTORY)
+    logger.info("Successfully saved desktop.json")
+
+
+# Journal records, one json object per line:
+# {"op": "put", "entry": {...}}                  add or replace the entry at entry["row"], entry["column"]
+# {"op": "delete", "row": 0, "column": 0}        remove the entry at row, column
+# {"op": "update_all", "fields": {...}}          set fields on every entry
+def journal_put(item):
+    return {"op": "put", "entry": item.to_dict()}
+
+def journal_delete(row, col):
+    return {"op": "delete", "row": row, "column": col}
+
+def journal_update_all(fields):
+    return {"op": "update_all", "fields": fields}
+
+def append_to_journal(records):
+    global JOURNAL_LENGTH
+    if not records:
+        return
+    with CONFIG_LOCK:
+        # Inside a transaction the records are held back and written together when it commits.
+        if TRANSACTION_RECORDS is not None:
+            TRANSACTION_RECORDS.extend(records)
+            return
+        with open(JOURNAL_PATH, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        JOURNAL_LENGTH += len(records)
+        logger.info(f"Journaled {len(records)} change(s) to desktop.json, {JOURNAL_LENGTH} pending compaction")
+    schedule_compaction()
+
+# Groups several edits into one journal write. Edits inside are applied in memory straight away,
+# and rolled back if an exception escapes the with block. i.e.
+#   with transaction():
+#       for entry in entries:
+#           save_entry(entry)
+# Single edits (save_entry, swap_icons_by_position, reset_all_to_default_*) already journal all their records in one write.
+# Nested transactions join the outer one. Rolling back only restores the entries the transaction touched, in place.
+@contextmanager
+def transaction():
+    global TRANSACTION_RECORDS, TRANSACTION_UNDO, TRANSACTION_ORIGINALS
+    with CONFIG_LOCK:
+        if TRANSACTION_RECORDS is not None:
+            yield
+            return
+
+        TRANSACTION_RECORDS = []
+        TRANSACTION_UNDO = []
+        TRANSACTION_ORIGINALS = {}
+        try:
+            yield
+        except Exception:
+            undo, originals = TRANSACTION_UNDO, TRANSACTION_ORIGINALS
+            TRANSACTION_RECORDS = TRANSACTION_UNDO = TRANSACTION_ORIGINALS = None
+            roll_back(undo, originals)
+            logger.error("Exception during desktop.json transaction, rolled back its changes")
+            raise
+        records = TRANSACTION_RECORDS
+        TRANSACTION_RECORDS = TRANSACTION_UNDO = TRANSACTION_ORIGINALS = None
+        append_to_journal(records)
+
+# Called by every edit before it changes the entries at positions ((row, column)), saves their state if a transaction is open.
+def remember_entries(*positions):
+    if TRANSACTION_UNDO is None:
+        return
+    for position in positions:
+        item = ITEM_LOOKUP_TABLE.get(position)
+        TRANSACTION_ORIGINALS.setdefault(position, item)
+        if item is not None:
+            TRANSACTION_UNDO.append(("entry", item, item.get_state()))
+
+# Called before fields are set on every entry (journal_update_all), saves only the values of those fields.
+def remember_fields(fields):
+    if TRANSACTION_UNDO is None:
+        return
+    TRANSACTION_UNDO.append(("fields", [(item, {key: getattr(item, key) for key in fields}) for item in ITEM_LOOKUP_TABLE.values()]))
+
+# Restores the entries a failed transaction touched: their values in reverse order, then the positions they were at.
+def roll_back(undo, originals):
+    updated = []
+    for kind, *data in reversed(undo):
+        if kind == "entry":
+            item, state = data
+            item.set_state(state)
+        else:
+            for item, previous in data[0]:
+                item.update(previous)
+                updated.append(item)
+    restored = {id(item) for item in originals.values() if item is not None}
+    for position in originals:
+        current = unindex_position(*position)
+        # Entries the transaction added are dropped.
+        if current is not None and id(current) not in restored and current in JSON:
+            JSON.remove(current)
+    for item in originals.values():
+        if item is None:
+            continue
+        # Deleted inside the transaction.
+        if item not in JSON:
+            JSON.append(item)
+        index_entry(item)
+    for item in updated:
+        if ITEM_LOOKUP_TABLE.get((item.row, item.column)) is item:
+            index_entry(item)
+
+def apply_journal_record(table, record):
+    op = record.get("op")
+    if op == "put":
+        entry = IconRecord.from_dict(record["entry"])
+        table[(entry.row, entry.column)] = entry
+    elif op == "delete":
+        table.pop((record['row'], record['column']), None)
+    elif op == "update_all":
+        for item in table.values():
+            item.update(record['fields'])
+    else:
+        logger.warning(f"Unknown journal record skipped: {record}")
+
+# Replays desktop.journal (and a leftover desktop.journal.old from an interrupted compaction) on top of the loaded desktop.json.
+# Every record sets absolute values, so replaying records that already made it into desktop.json is harmless.
+# Returns True if anything was replayed.
+def replay_journal():
+    global JSON, JOURNAL_LENGTH
+    replayed = 0
+    for path in (JOURNAL_PATH + ".old", JOURNAL_PATH):
+        if not os.path.exists(path):
+            continue
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn (closed mid append), everything before it is still valid.
+                    logger.error(f"Skipping unreadable journal line in {path}: {line}")
+                    continue
+                apply_journal_record(ITEM_LOOKUP_TABLE, record)
+                replayed += 1
+
+    if replayed:
+        JSON = sorted(ITEM_LOOKUP_TABLE.values(), key=lambda x: (x.row, x.column))
+        rebuild_lookup_table()
+        logger.info(f"Replayed {replayed} journaled change(s) onto desktop.json")
+    JOURNAL_LENGTH = replayed
+    return replayed > 0 or os.path.exists(JOURNAL_PATH + ".old")
+
+def schedule_compaction():
+    global COMPACT_TIMER
+    with CONFIG_LOCK:
+        if COMPACT_TIMER is not None:
+            COMPACT_TIMER.cancel()
+        delay = 0 if JOURNAL_LENGTH >= JOURNAL_COMPACT_LIMIT else JOURNAL_COMPACT_DELAY
+        COMPACT_TIMER = threading.Timer(delay, compact_journal)
+        COMPACT_TIMER.daemon = True
+        COMPACT_TIMER.start()
+
+# Folds the journal into desktop.json. Runs on the background timer thread, or directly for migrations/startup.
+# force=True writes desktop.json even if there is nothing journaled.
+def compact_journal(force=False):
+    global JOURNAL_LENGTH
+    old_journal = JOURNAL_PATH + ".old"
+    with COMPACT_LOCK:
+        with CONFIG_LOCK:
+            if not force and not os.path.exists(JOURNAL_PATH) and not os.path.exists(old_journal) and JOURNAL_LENGTH == 0:
+                return
+            # Copy entries so the main thread can keep editing while this writes.
+            snapshot = [item.to_dict() for item in sorted(JSON, key=lambda x: (x.row, x.column))]
+            # New edits go to a fresh journal while the snapshot is written. Keep the rotated journal until desktop.json is safely replaced.
+            if os.path.exists(JOURNAL_PATH):
+                if os.path.exists(old_journal):
+                    # A previous compaction failed to write desktop.json, keep its records in front of the newer ones.
+                    with open(JOURNAL_PATH, "r") as new_file, open(old_journal, "a") as old_file:
+                        old_file.write(new_file.read())
+                    os.remove(JOURNAL_PATH)
+                else:
+                    os.replace(JOURNAL_PATH, old_journal)
+            JOURNAL_LENGTH = 0
+
+        logger.info("Compacting desktop.journal into desktop.json")
+        try:
+            write_config_file(snapshot)
+        except Exception as e:
+            logger.error(f"Failed to compact desktop.journal into desktop.json, journal kept for next startup: {e}")
+            return
+        write_config_snapshot(snapshot)
+        if os.path.exists(old_journal):
+            os.remove(old_journal)
+
+# Uses the precomputed NON_DEFAULT_ITEMS, so this is a single set lookup.
 def is_default(row, col):
-    item = get_item(row, col)
-    
-    if item:
-        # Check only the keys that are not 'row' or 'column' and that exist in the item
-        for key, default_value in DEFAULT_DESKTOP.items():
-            if key not in ['row', 'column']:
-                if key in item and item[key] != default_value:
-                    return False
+    return (row, col) not in NON_DEFAULT_ITEMS
+
+def entry_is_default(item):
+    # Check only the keys that are not 'id', 'row' or 'column'
+    for key, default_value in DEFAULT_DESKTOP.items():
+        if key not in POSITION_KEYS:
+            if getattr(item, key) != default_value:
+                return False
 
     return True
 
 
-#updates the entry at row,col to DEFAULT_DESKTOP fields (except row/column)
+#updates the entry at row,col to DEFAULT_DESKTOP fields (except id/row/column)
 def set_entry_to_default(row, col):
-    config = load_desktop_config()
-    item = get_item(row, col)
-    if item:
-        # Update the item to default values (except row and column)
-        for key in DEFAULT_DESKTOP:
-            if key not in ['row', 'column']:
-                item[key] = DEFAULT_DESKTOP[key]
-        save_config_to_file(config)
+    with CONFIG_LOCK:
+        item = get_item(row, col)
+        if item:
+            remember_entries((row, col))
+            # Update the item to default values (except id, row and column)
+            for key in DEFAULT_DESKTOP:
+                if key not in POSITION_KEYS:
+                    setattr(item, key, DEFAULT_DESKTOP[key])
+            index_entry(item)
+            append_to_journal([journal_put(item)])
 
 def delete_entry(row, col):
-    global ITEM_LOOKUP_TABLE
-    
-    config = load_desktop_config()
-    # Iterate over the list and remove the entry matching the row and column
-    config = [entry for entry in config if not (entry.get('row') == row and entry.get('column') == col)]
-    ITEM_LOOKUP_TABLE.pop((row, col), None)
-    save_config_to_file(config)
+    with CONFIG_LOCK:
+        remember_entries((row, col))
+        item = unindex_position(row, col)
+        if item is not None:
+            JSON.remove(item)
+        append_to_journal([journal_delete(row, col)])
+
+# Adds entry (a dict of desktop.json keys) at entry["row"], entry["column"], or updates the fields of the entry already there.
+def save_entry(entry):
+    with CONFIG_LOCK:
+        remember_entries((entry['row'], entry['column']))
+        item = get_item(entry['row'], entry['column'])
+        if item:
+            item.update(entry)
+        else:
+            item = IconRecord.from_dict(entry)
+            if not item.id:
+                item.id = new_entry_id()
+            JSON.append(item)
+        index_entry(item)
+        append_to_journal([journal_put(item)])
 
 #swap row/col between two desktop_icons
 def swap_icons_by_position(row1, col1, row2, col2):
-    config = load_desktop_config()
-    
-    # Find the items with the specified row and column values
-    item1 = get_item(row1, col1)
-    item2 = get_item(row2, col2)
-    
-    # if neither icons in desktop.json
-    if item1 is None and item2 is None:
-        logger.info("Moved undefined desktop icon with another undefined desktop icon")
-        return
-    #if only 2nd icon(icon dragged on top of) is in .json
-    elif item1 is None:
-        item2['row'] = row1
-        item2['column'] =  col1
-    #if only item dragged is in .json
-    elif item2 is None:
-        item1['row'] = row2
-        item1['column'] =  col2
-    #when both items are in .json
-    else:
-        # Swap the rows and columns of the specified items
-        item1['row'], item2['row'] = item2['row'], item1['row']
-        item1['column'], item2['column'] = item2['column'], item1['column']
-    
-    save_config_to_file(config)
+    with CONFIG_LOCK:
+        remember_entries((row1, col1), (row2, col2))
+        # Find the items with the specified row and column values
+        item1 = get_item(row1, col1)
+        item2 = get_item(row2, col2)
+        
+        # if neither icons in desktop.json
+        if item1 is None and item2 is None:
+            logger.info("Moved undefined desktop icon with another undefined desktop icon")
+            return
+        #if only 2nd icon(icon dragged on top of) is in .json
+        elif item1 is None:
+            item2.row = row1
+            item2.column = col1
+            unindex_position(row2, col2)
+            index_entry(item2)
+            records = [journal_put(item2), journal_delete(row2, col2)]
+        #if only item dragged is in .json
+        elif item2 is None:
+            item1.row = row2
+            item1.column = col2
+            unindex_position(row1, col1)
+            index_entry(item1)
+            records = [journal_put(item1), journal_delete(row1, col1)]
+        #when both items are in .json
+        else:
+            # Swap the rows and columns of the specified items
+            item1.row, item2.row = item2.row, item1.row
+            item1.column, item2.column = item2.column, item1.column
+            index_entry(item1)
+            index_entry(item2)
+            records = [journal_put(item1), journal_put(item2)]
+        
+        append_to_journal(records)
 
 def change_launch(new_launch_value, row, col):
-    # Retrieve the item from the lookup table
-    item = get_item(row, col)
-    
-    if item:
-        # Update the launch_option in JSON
-        item['launch_option'] = new_launch_value
-        # Save the updated JSON to the file
-        save_config_to_file(load_desktop_config())
-
-def update_folder(new_row, new_col):
-    item = get_item(new_row, new_col)
-    
-    if item:
-        new_dir = os.path.join(DATA_DIRECTORY, f'[{new_row}, {new_col}]')
-        if item['icon_path'].startswith(DATA_DIRECTORY):
-            filename = ""
-            last_backslash_index = item['icon_path'].rfind('\\')
-
-            # Extract everything after the last backslash
-            if last_backslash_index != -1:
-                filename = item['icon_path'][last_backslash_index + 1:]
-            item['icon_path'] = os.path.join(new_dir, filename)
+    with CONFIG_LOCK:
+        # Retrieve the item from the lookup table
+        item = get_item(row, col)
         
-        # Save the updated JSON to the file
-        save_config_to_file(load_desktop_config())
-            
+        if item:
+            remember_entries((row, col))
+            # Update the launch_option in JSON
+            item.launch_option = new_launch_value
+            index_entry(item)
+            append_to_journal([journal_put(item)])
 
 def reset_all_to_default_font_size():
-    for item in ITEM_LOOKUP_TABLE.values():
-        item['use_global_font_size'] = True
-    
-    # Save the updated JSON to the file
-    save_config_to_file(load_desktop_config())
+    with CONFIG_LOCK:
+        remember_fields(('use_global_font_size',))
+        for item in ITEM_LOOKUP_TABLE.values():
+            item.use_global_font_size = True
+            index_entry(item)
+        append_to_journal([journal_update_all({'use_global_font_size': True})])
 
 def reset_all_to_default_font_color():
-    for item in ITEM_LOOKUP_TABLE.values():
-        item['use_global_font_color'] = True
-    
-    # Save the updated JSON to the file
-    save_config_to_file(load_desktop_config())
+    with CONFIG_LOCK:
+        remember_fields(('use_global_font_color',))
+        for item in ITEM_LOOKUP_TABLE.values():
+            item.use_global_font_color = True
+            index_entry(item)
+        append_to_journal([journal_update_all({'use_global_font_color': True})])
             
 
 def get_data_directory():
-    return DATA_DIRECTORY
\ No newline at end of file
+    return DATA_DIRECTORY
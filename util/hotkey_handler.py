@@ -1,6 +1,6 @@
 from PySide6.QtCore import Signal, QObject
 import keyboard
-from util.settings import get_setting, set_setting
+from util.settings import get_setting, set_setting, subscribe
 from menus.display_warning import display_bad_overlay_keybind_warning, display_keybind_not_supported
 import logging
 
@@ -15,7 +15,16 @@ class HotkeyHandler(QObject):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.listener = None
+        # Keybind currently registered with the keyboard library.
+        self.hotkey = None
         self.set_hotkey()
+        subscribe(self.on_settings_changed, ("toggle_overlay_keybind",))
+
+    def on_settings_changed(self, change):
+        # set_hotkey() saves the default itself when the keybind is invalid, which is already registered.
+        if get_setting("toggle_overlay_keybind") != self.hotkey:
+            self.stop_listener()
+            self.set_hotkey()
 
     def set_hotkey(self):
         def on_activate():
@@ -24,6 +33,7 @@ class HotkeyHandler(QObject):
 
         try:
             hotkey_str = get_setting("toggle_overlay_keybind")
+            self.hotkey = hotkey_str
             logger.info(f"Attempting to set hotkey: '{hotkey_str}'")
 
             # Separate the hotkey string into modifiers and the main key
@@ -98,6 +108,7 @@ class HotkeyHandler(QObject):
             # Handle invalid hotkey by setting it to default and logging the error
             logger.error(f"Invalid hotkey '{hotkey_str}': {e}. Setting to default 'alt+d'.")
             display_bad_overlay_keybind_warning(hotkey_str)
+            self.hotkey = "alt+d"
             set_setting("toggle_overlay_keybind", "alt+d")
             keyboard.add_hotkey('alt+d', on_activate)
 
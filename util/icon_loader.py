@@ -0,0 +1,121 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Qt, QSize
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QColor, QPainter
+from util.pixmap_cache import get_source_path, get_cache_key, find_pixmap, insert_image
+from util.thumbnail_cache import read_thumbnail, write_thumbnail, cleanup_thumbnails
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Decodes and scales icon images into QImages on a worker pool, then hands them back on the GUI thread as cached QPixmaps.
+ICON_LOADER = None
+# Worker threads used for decoding, decoding is mostly disk + CPU bound so a few threads is enough.
+MAX_DECODE_THREADS = 4
+# Shared placeholder pixmaps keyed by (width, height), shown while the real image decodes.
+PLACEHOLDERS = {}
+
+
+class ImageDecodeTask(QRunnable):
+    def __init__(self, key, path, width, height, loader):
+        super().__init__()
+        self.key = key
+        self.path = path
+        self.width = width
+        self.height = height
+        self.loader = loader
+
+    # Runs on a worker thread, only QImage (not QPixmap) is safe to use here.
+    def run(self):
+        mtime = self.key[1]
+        # Pre-scaled thumbnail from a previous run, skips decoding and scaling the full size source.
+        image = read_thumbnail(self.path, mtime, self.width, self.height)
+        if image is None:
+            reader = QImageReader(self.path)
+            reader.setAutoTransform(True)
+            image = reader.read()
+            if image.isNull():
+                logger.error(f"Failed to decode {self.path}: {reader.errorString()}")
+            else:
+                target = QSize(self.width, self.height)
+                image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                write_thumbnail(self.path, mtime, self.width, self.height, image)
+        self.loader.image_decoded.emit(self.key, image)
+
+
+class ThumbnailCleanupTask(QRunnable):
+    def run(self):
+        cleanup_thumbnails()
+
+
+class IconLoader(QObject):
+    # Emitted from worker threads, delivered on the GUI thread (queued connection).
+    image_decoded = Signal(object, QImage)
+
+    def __init__(self):
+        super().__init__()
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(MAX_DECODE_THREADS)
+        # key -> list of callbacks waiting for that image, so a file shared by many icons is decoded once.
+        self.pending = {}
+        self.image_decoded.connect(self.on_image_decoded, Qt.QueuedConnection)
+        # Trim thumbnails left over from icons that changed or were removed since the last run.
+        self.thread_pool.start(ThumbnailCleanupTask())
+
+    def request(self, path, width, height, callback):
+        path = get_source_path(path, width, height)
+        key = get_cache_key(path, width, height)
+        if key is None:
+            callback(QPixmap())
+            return
+
+        pixmap = find_pixmap(key)
+        if pixmap is not None:
+            callback(pixmap)
+            return
+
+        if key in self.pending:
+            self.pending[key].append(callback)
+            return
+
+        self.pending[key] = [callback]
+        dpr = key[4]
+        self.thread_pool.start(ImageDecodeTask(key, path, int(width * dpr), int(height * dpr), self))
+
+    def on_image_decoded(self, key, image):
+        callbacks = self.pending.pop(key, [])
+        if image.isNull():
+            pixmap = QPixmap()
+        else:
+            pixmap = insert_image(key, image)
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except RuntimeError as e:
+                # The receiving item was deleted while its image was decoding.
+                logger.warning(f"Dropped decoded image for {key[0]}: {e}")
+
+
+def get_icon_loader():
+    global ICON_LOADER
+    if ICON_LOADER is None:
+        ICON_LOADER = IconLoader()
+    return ICON_LOADER
+
+# Calls callback(pixmap) with path scaled to fit width x height (logical pixels). Immediately if cached, otherwise on the GUI thread once a worker decodes it.
+# A null QPixmap is passed if path does not exist or fails to decode.
+def load_scaled_pixmap_async(path, width, height, callback):
+    get_icon_loader().request(path, width, height, callback)
+
+# Cheap stand in drawn until the real image arrives.
+def get_placeholder_pixmap(width, height):
+    placeholder = PLACEHOLDERS.get((width, height))
+    if placeholder is None:
+        placeholder = QPixmap(max(width, 1), max(height, 1))
+        placeholder.fill(Qt.transparent)
+        painter = QPainter(placeholder)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(255, 255, 255, 40))
+        painter.drawRoundedRect(0, 0, width, height, width / 8, height / 8)
+        painter.end()
+        PLACEHOLDERS[(width, height)] = placeholder
+    return placeholder
@@ -0,0 +1,91 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Qt
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Starts icon executables on a worker pool so the GUI thread never waits on a launch.
+LAUNCHER = None
+# Several icons can be launching at once, each waits up to EARLY_EXIT_TIMEOUT on its own worker.
+MAX_CONCURRENT_LAUNCHES = 8
+# A process still running after this long counts as a successful launch.
+EARLY_EXIT_TIMEOUT = 0.5
+
+# launch_failed reasons
+NO_DEFAULT_TYPE = "no_default_type"
+EARLY_EXIT = "early_exit"
+START_FAILED = "start_failed"
+
+
+class LaunchRequest:
+    def __init__(self, command, executable_path, fallback=None):
+        self.command = command
+        self.executable_path = executable_path
+        # Called on the GUI thread if the launch fails, returns True if it launched something else instead (e.g. the icon's website link).
+        self.fallback = fallback
+
+
+class LaunchTask(QRunnable):
+    def __init__(self, request, launcher):
+        super().__init__()
+        self.request = request
+        self.launcher = launcher
+
+    def run(self):
+        request = self.request
+        try:
+            #when shell=True exceptions like FileNotFoundError are no longer raised but put into stderr
+            process = subprocess.Popen(request.command, shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+        except Exception as e:
+            logger.error(f"An error occurred launching {request.executable_path}: {e}")
+            self.launcher.task_failed.emit(request, START_FAILED)
+            return
+
+        try:
+            stdout, stderr = process.communicate(timeout=EARLY_EXIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            # Still running, kill the connection between this process and the subprocess we just launched.
+            # This will not kill the launched program but just set it free from the connection.
+            logger.info(f"Launched {request.executable_path}, killing connection to new subprocess")
+            process.kill()
+            return
+
+        # Exited within EARLY_EXIT_TIMEOUT, look at why.
+        text = stderr.decode('utf-8', errors='replace')
+        if "is not recognized as an internal or external command" in text:
+            logger.error(f"Error opening file, Seems like user does not have a default application for this file type and windows is not popping up for them to select a application to open with., path = {request.executable_path}")
+            self.launcher.task_failed.emit(request, NO_DEFAULT_TYPE)
+        elif process.returncode != 0 and text.strip():
+            logger.error(f"{request.executable_path} exited early with code {process.returncode}: {text.strip()}")
+            self.launcher.task_failed.emit(request, EARLY_EXIT)
+        else:
+            logger.info(f"{request.executable_path} exited early with code {process.returncode}")
+
+
+class Launcher(QObject):
+    # (LaunchRequest, reason) emitted from worker threads, delivered on the GUI thread to handle_failure.
+    task_failed = Signal(object, str)
+    # (executable_path, reason) for launches that failed and had no working fallback. DesktopGrid shows the matching warning.
+    launch_failed = Signal(str, str)
+
+    def __init__(self):
+        super().__init__()
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(MAX_CONCURRENT_LAUNCHES)
+        self.task_failed.connect(self.handle_failure, Qt.QueuedConnection)
+
+    def launch(self, command, executable_path, fallback=None):
+        self.thread_pool.start(LaunchTask(LaunchRequest(command, executable_path, fallback), self))
+
+    def handle_failure(self, request, reason):
+        if request.fallback and request.fallback():
+            logger.info(f"Launching {request.executable_path} failed ({reason}), fallback launched instead")
+            return
+        self.launch_failed.emit(request.executable_path, reason)
+
+
+def get_launcher():
+    global LAUNCHER
+    if LAUNCHER is None:
+        LAUNCHER = Launcher()
+    return LAUNCHER
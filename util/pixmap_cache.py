@@ -0,0 +1,133 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPixmap, QGuiApplication
+from util.settings import get_setting
+from util.blob_store import find_mipmap, get_mipmap_paths
+from collections import OrderedDict
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Scaled icon pixmaps shared by DesktopIcon, TempIcon, IconSelectionDialog and drag previews.
+# Keyed on (path, mtime, target width, target height, device pixel ratio) so a resized icon or a rewritten file never returns a stale pixmap.
+PIXMAP_CACHE = OrderedDict()
+PIXMAP_CACHE_BYTES = 0
+# Used if the "pixmap_cache_mb" setting is not available yet.
+DEFAULT_CACHE_LIMIT_MB = 64
+
+HITS = 0
+MISSES = 0
+EVICTIONS = 0
+# Log hit/miss/eviction counters every this many lookups.
+STATS_LOG_INTERVAL = 500
+
+
+# Returns a QPixmap of path scaled to fit within width x height (logical pixels, aspect ratio kept)
+# Returns a null QPixmap if path does not exist or fails to load.
+# Decodes on the calling thread, see icon_loader.py to decode on a worker pool instead.
+def get_scaled_pixmap(path, width, height):
+    path = get_source_path(path, width, height)
+    key = get_cache_key(path, width, height)
+    if key is None:
+        return QPixmap()
+
+    pixmap = find_pixmap(key)
+    if pixmap is not None:
+        return pixmap
+
+    pixmap = QPixmap(path)
+    if pixmap.isNull():
+        logger.error(f"Failed to load pixmap from {path}")
+        return pixmap
+
+    dpr = key[4]
+    pixmap = pixmap.scaled(int(width * dpr), int(height * dpr), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    pixmap.setDevicePixelRatio(dpr)
+    insert(key, pixmap)
+    return pixmap
+
+# Blob icons have pre-scaled mipmaps (see blob_store.py), decode the smallest level covering width x height instead of the full size source.
+def get_source_path(path, width, height):
+    return find_mipmap(path, max(width, height) * get_device_pixel_ratio()) or path
+
+# Returns the cache key for path at width x height, or None if path does not exist.
+def get_cache_key(path, width, height):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    return (os.path.normcase(os.path.abspath(path)), mtime, width, height, get_device_pixel_ratio())
+
+# Returns the cached pixmap for key or None, counting the lookup as a hit or miss.
+def find_pixmap(key):
+    global HITS, MISSES
+    pixmap = PIXMAP_CACHE.get(key)
+    if pixmap is not None:
+        PIXMAP_CACHE.move_to_end(key)
+        HITS += 1
+    else:
+        MISSES += 1
+    log_stats_periodically()
+    return pixmap
+
+# Converts an already scaled QImage (device pixels) into a cached QPixmap. Must be called on the GUI thread.
+def insert_image(key, image):
+    pixmap = QPixmap.fromImage(image)
+    pixmap.setDevicePixelRatio(key[4])
+    insert(key, pixmap)
+    return pixmap
+
+# Drops every cached size of path, used when a caller knows the file was replaced.
+# Blob icons are cached under the mipmap they were decoded from (see get_source_path), those are dropped as well.
+def invalidate_path(path):
+    global PIXMAP_CACHE_BYTES
+    normalized = {os.path.normcase(os.path.abspath(source)) for source in [path] + get_mipmap_paths(path)}
+    for key in [key for key in PIXMAP_CACHE if key[0] in normalized]:
+        PIXMAP_CACHE_BYTES -= pixmap_bytes(PIXMAP_CACHE.pop(key))
+
+def clear_pixmap_cache():
+    global PIXMAP_CACHE_BYTES
+    PIXMAP_CACHE.clear()
+    PIXMAP_CACHE_BYTES = 0
+
+def insert(key, pixmap):
+    global PIXMAP_CACHE_BYTES, EVICTIONS
+    size = pixmap_bytes(pixmap)
+    limit = get_cache_limit_bytes()
+    if size > limit:
+        logger.warning(f"Pixmap for {key[0]} ({size} bytes) is larger than the pixmap cache budget ({limit} bytes), not caching it")
+        return
+
+    PIXMAP_CACHE[key] = pixmap
+    PIXMAP_CACHE_BYTES += size
+    # Evict least recently used pixmaps until back under budget.
+    while PIXMAP_CACHE_BYTES > limit:
+        evicted_key, evicted = PIXMAP_CACHE.popitem(last=False)
+        PIXMAP_CACHE_BYTES -= pixmap_bytes(evicted)
+        EVICTIONS += 1
+        logger.debug(f"Evicted pixmap {evicted_key[0]} at {evicted_key[2]}x{evicted_key[3]}")
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+def get_cache_limit_bytes():
+    try:
+        limit_mb = get_setting("pixmap_cache_mb", DEFAULT_CACHE_LIMIT_MB)
+    except AttributeError:
+        # Settings not loaded yet.
+        limit_mb = DEFAULT_CACHE_LIMIT_MB
+    return int(limit_mb * 1024 * 1024)
+
+def get_device_pixel_ratio():
+    app = QGuiApplication.instance()
+    return app.devicePixelRatio() if app else 1.0
+
+def log_stats_periodically():
+    if (HITS + MISSES) % STATS_LOG_INTERVAL == 0:
+        log_pixmap_cache_stats()
+
+def log_pixmap_cache_stats():
+    lookups = HITS + MISSES
+    hit_rate = (HITS / lookups * 100) if lookups else 0
+    logger.info(f"Pixmap cache: {len(PIXMAP_CACHE)} pixmaps, {PIXMAP_CACHE_BYTES / (1024 * 1024):.1f}/{get_cache_limit_bytes() / (1024 * 1024):.0f} MB, "
+                f"hits={HITS} misses={MISSES} evictions={EVICTIONS} hit rate={hit_rate:.1f}%")
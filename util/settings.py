@@ -1,6 +1,8 @@
 import json
 import os
+import threading
 import logging
+from util.startup_snapshot import read_snapshot, write_snapshot
 
 
 logger = logging.getLogger(__name__)
@@ -34,7 +36,10 @@ DEFUALT_SETTINGS = {
         "font": "Arial",
         "global_font_size": 10,
         "border_color": "#ff0000",
-        "border_width": 5
+        "border_width": 5,
+        "pixmap_cache_mb": 64,
+        "animation_fps_cap": 30,
+        "icon_regen_workers": 4
 }
 SETTINGS = None
 
@@ -48,59 +53,183 @@ SETTINGS = None
 #on_close: default set to 0 (terminate the program)
 
     
+# The in memory SETTINGS dict is the source of truth once loaded. Changes are marked dirty and written to settings.json
+# by a coalescing write-behind timer (one write for a burst of set_setting() calls), through a temp file and rename.
+# flush() writes any pending changes immediately, call it on shutdown.
+SETTINGS_FLUSH_DELAY = 1.0
+SETTINGS_LOCK = threading.RLock()
+# Serializes writes of settings.json so an older snapshot never replaces a newer one.
+WRITE_LOCK = threading.Lock()
+# Keys changed since the last write to settings.json.
+DIRTY_KEYS = set()
+FLUSH_TIMER = None
+
+# Settings change bus. subscribe(callback, keys) calls callback(SettingsChange) after save_settings() / set_setting() changes any of keys,
+# so each part of the UI only redoes the work its own settings affect instead of everything reloading after the settings menu closes.
+# Callbacks run on the thread that saved (the GUI thread for the settings menu), after SETTINGS_LOCK is released.
+SETTINGS_SUBSCRIBERS = []
+SUBSCRIBERS_LOCK = threading.Lock()
+
+
+class SettingsChange:
+    def __init__(self, keys, previous):
+        # Keys whose value changed.
+        self.keys = frozenset(keys)
+        # Values before the change, keys that did not exist before are missing.
+        self.previous = previous
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    # True if any of keys changed.
+    def touches(self, *keys):
+        return not self.keys.isdisjoint(keys)
+
+    def __repr__(self):
+        return f"SettingsChange({sorted(self.keys)})"
+
+# Reads settings.json into SETTINGS. Only called at startup (set_dir), everything after that reads the in memory dict.
+# Uses settings.snapshot instead if settings.json has not changed since it was last saved (see startup_snapshot.py)
 def load_settings():
     global SETTINGS
     if os.path.exists(DIRECTORY):
-        with open(DIRECTORY, "r") as f:
-            SETTINGS = json.load(f)
-            return SETTINGS
+        loaded = read_snapshot(DIRECTORY, DEFUALT_SETTINGS)
+        if not isinstance(loaded, dict):
+            with open(DIRECTORY, "r") as f:
+                loaded = json.load(f)
+        with SETTINGS_LOCK:
+            SETTINGS = loaded
+            DIRTY_KEYS.clear()
+        return SETTINGS
             
     else:
         logger.error("Error loading settings, expected file at: " + DIRECTORY )
         return {}
 
+# Returns a copy of every setting, for callers that read many settings or edit several before save_settings().
+def get_settings():
+    with SETTINGS_LOCK:
+        return dict(SETTINGS)
+
 def get_setting(key, default=None):
     global SETTINGS
     return SETTINGS.get(key, default)
 
 def set_setting(key, value):
-    global SETTINGS
-    SETTINGS[key] = value
-    save_settings(SETTINGS)
+    save_settings({key: value})
 
+# Applies settings (all or some keys) to the in memory settings and schedules a write. Returns the keys that changed.
 def save_settings(settings):
-    with open(DIRECTORY, "w") as f:
+    global SETTINGS
+    with SETTINGS_LOCK:
+        if SETTINGS is None:
+            SETTINGS = {}
+        changed = {key for key, value in settings.items() if key not in SETTINGS or SETTINGS[key] != value}
+        previous = {key: SETTINGS[key] for key in changed if key in SETTINGS}
+        SETTINGS.update(settings)
+        DIRTY_KEYS.update(changed)
+    if changed:
+        logger.info(f"Changed settings: {sorted(changed)}")
+        schedule_flush()
+        notify(SettingsChange(changed, previous))
+    return changed
+
+# keys=None subscribes to every key. The same callback subscribed twice is only called once per change.
+def subscribe(callback, keys=None):
+    with SUBSCRIBERS_LOCK:
+        unsubscribe_locked(callback)
+        SETTINGS_SUBSCRIBERS.append((callback, frozenset(keys) if keys is not None else None))
+
+def unsubscribe(callback):
+    with SUBSCRIBERS_LOCK:
+        unsubscribe_locked(callback)
+
+def unsubscribe_locked(callback):
+    SETTINGS_SUBSCRIBERS[:] = [(subscriber, keys) for subscriber, keys in SETTINGS_SUBSCRIBERS if subscriber != callback]
+
+def notify(change):
+    with SUBSCRIBERS_LOCK:
+        subscribers = list(SETTINGS_SUBSCRIBERS)
+    for callback, keys in subscribers:
+        if keys is not None and keys.isdisjoint(change.keys):
+            continue
+        try:
+            callback(change)
+        except Exception as e:
+            # One broken subscriber should not stop the rest from updating.
+            logger.exception(f"Settings subscriber {callback} failed on {change}: {e}")
+
+# Changes made while a write is already scheduled ride along with it.
+def schedule_flush():
+    global FLUSH_TIMER
+    with SETTINGS_LOCK:
+        if FLUSH_TIMER is not None:
+            return
+        FLUSH_TIMER = threading.Timer(SETTINGS_FLUSH_DELAY, flush)
+        FLUSH_TIMER.daemon = True
+        FLUSH_TIMER.start()
+
+# Writes pending changes to settings.json. Runs on the write-behind timer thread, or directly on shutdown / first launch.
+# The file is written outside SETTINGS_LOCK so get_setting / set_setting never wait on disk.
+def flush():
+    global FLUSH_TIMER
+    with WRITE_LOCK:
+        with SETTINGS_LOCK:
+            if FLUSH_TIMER is not None:
+                FLUSH_TIMER.cancel()
+                FLUSH_TIMER = None
+            if not DIRTY_KEYS or DIRECTORY is None:
+                return
+            snapshot = dict(SETTINGS)
+            dirty = sorted(DIRTY_KEYS)
+            DIRTY_KEYS.clear()
+        try:
+            write_settings_file(snapshot)
+        except Exception as e:
+            # Keep them dirty so the next flush tries again.
+            with SETTINGS_LOCK:
+                DIRTY_KEYS.update(dirty)
+            logger.error(f"Failed to save settings: {e}")
+            return
+    logger.info(f"Saved settings ({', '.join(dirty)})")
+
+# Writes settings.json through a temp file so a crash mid-write never leaves a half written settings.json
+def write_settings_file(settings):
+    temp_path = DIRECTORY + ".tmp"
+    with open(temp_path, "w") as f:
         json.dump(settings, f, indent=4)
-        logger.info("Saved settings")
-    # Update global SETTINGS to be up to date.
-    load_settings()
+    os.replace(temp_path, DIRECTORY)
+    write_snapshot(DIRECTORY, settings, DEFUALT_SETTINGS)
 
 
 
 def set_dir(directory):
-    global DIRECTORY
+    global DIRECTORY, SETTINGS
     DIRECTORY = directory
     if os.path.exists(DIRECTORY):
         logger.info("checking for new settings")
         check_for_new_settings()
     else:
         logger.info("build new")
-        save_settings(DEFUALT_SETTINGS)
+        with SETTINGS_LOCK:
+            SETTINGS = dict(DEFUALT_SETTINGS)
+            DIRTY_KEYS.update(SETTINGS)
+        flush()
 
 
 
 def check_for_new_settings():
     global SETTINGS
-    new_settings = False
+    new_settings = {}
     load_settings()
     for key, value in DEFUALT_SETTINGS.items():
         if key not in SETTINGS:
             logger.info(f"key {key} not in settings")
-            SETTINGS[key] = value
-            new_settings = True
+            new_settings[key] = value
     if new_settings:
-        logger.info(f"New settings before save: {SETTINGS}")
-        save_settings(SETTINGS)
+        logger.info(f"New settings before save: {new_settings}")
+        save_settings(new_settings)
+        flush()
 
 
 # Depreciated was originally used for pynput keyboard library. But has since moved to base keyboard library which does not use this <> formatting.
@@ -0,0 +1,63 @@
+import os
+import pickle
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Binary snapshots of parsed startup state (settings.json -> settings.snapshot, desktop.json -> desktop.snapshot).
+# Written after every successful save of the json file, and loaded in a single read at startup instead of parsing and indexing the json
+# as long as the json file's mtime and size still match the ones recorded in the snapshot.
+# The json files stay the source of truth: editing one by hand (or a snapshot from another version) just means a normal json load.
+# Snapshots live in the user's own AppData next to the json they mirror, the same trust as the json files themselves.
+
+# Callers pass the schema of their data (config.py the IconRecord slots, settings.py the default settings keys) and every snapshot records
+# a hash of it, so a snapshot written by a version with a different layout is ignored without a version number to bump by hand.
+
+
+# Short hash of schema (the names the pickled data is laid out by), changes whenever the schema does.
+def get_schema_version(schema):
+    return hashlib.sha256(repr(tuple(schema)).encode("utf-8")).hexdigest()[:16]
+
+def get_snapshot_path(source_path):
+    return os.path.splitext(source_path)[0] + ".snapshot"
+
+# (mtime_ns, size) of path, None if it does not exist.
+def get_source_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Pickles data as the snapshot of source_path, which must already be written. Failures are only logged, the json is already saved.
+def write_snapshot(source_path, data, schema):
+    snapshot_path = get_snapshot_path(source_path)
+    stamp = get_source_stamp(source_path)
+    if stamp is None:
+        return
+    temp_path = snapshot_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            pickle.dump((get_schema_version(schema), stamp, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, snapshot_path)
+    except Exception as e:
+        logger.warning(f"Failed to write startup snapshot {snapshot_path}: {e}")
+
+# Returns the data of source_path's snapshot, None if there is none or it does not match source_path or schema as they are now.
+# Any error unpickling it (e.g. a class or attribute it references no longer exists) is a miss as well, the caller then loads the json.
+def read_snapshot(source_path, schema):
+    snapshot_path = get_snapshot_path(source_path)
+    stamp = get_source_stamp(source_path)
+    if stamp is None or not os.path.exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, "rb") as f:
+            version, snapshot_stamp, data = pickle.loads(f.read())
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable startup snapshot {snapshot_path}: {e}")
+        return None
+    if version != get_schema_version(schema) or snapshot_stamp != stamp:
+        logger.info(f"Startup snapshot {snapshot_path} is out of date, loading {source_path}")
+        return None
+    return data
@@ -0,0 +1,135 @@
+from PySide6.QtGui import QImage
+import os
+import struct
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# On disk cache of icon images already scaled to the size they are drawn at, so a cold start only reads small raw bitmaps.
+# AppData/AlternativeDesktop/thumbnails/<hash of (path, mtime, file size, width, height)>.thumb
+# A changed source file hashes to a new name, stale thumbnails are never read again and get removed by cleanup_thumbnails().
+THUMBNAIL_DIRECTORY = None
+THUMBNAIL_CACHE_LIMIT_MB = 128
+# Run cleanup_thumbnails() after this many new thumbnails are written.
+CLEANUP_INTERVAL = 200
+
+# File header: magic, format version, width, height. Followed by width * height * 4 bytes of premultiplied ARGB32 pixels.
+THUMBNAIL_MAGIC = b"ADTH"
+THUMBNAIL_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+
+WRITES_SINCE_CLEANUP = 0
+WRITE_COUNT_LOCK = threading.Lock()
+CLEANUP_LOCK = threading.Lock()
+
+
+def get_thumbnail_directory():
+    global THUMBNAIL_DIRECTORY
+    if THUMBNAIL_DIRECTORY is None:
+        app_data_path = os.path.join(os.getenv('APPDATA'), 'AlternativeDesktop')
+        THUMBNAIL_DIRECTORY = os.path.join(app_data_path, 'thumbnails')
+        os.makedirs(THUMBNAIL_DIRECTORY, exist_ok=True)
+    return THUMBNAIL_DIRECTORY
+
+def get_thumbnail_path(source_path, mtime, width, height):
+    try:
+        file_size = os.path.getsize(source_path)
+    except OSError:
+        return None
+    identity = f"{os.path.normcase(os.path.abspath(source_path))}|{mtime}|{file_size}|{width}x{height}"
+    return os.path.join(get_thumbnail_directory(), hashlib.sha1(identity.encode("utf-8")).hexdigest() + ".thumb")
+
+# Returns the cached QImage for source_path at width x height (device pixels), or None if there is no valid thumbnail.
+# Safe to call from worker threads.
+def read_thumbnail(source_path, mtime, width, height):
+    thumbnail_path = get_thumbnail_path(source_path, mtime, width, height)
+    if thumbnail_path is None or not os.path.exists(thumbnail_path):
+        return None
+    try:
+        with open(thumbnail_path, "rb") as f:
+            data = f.read()
+        magic, version, image_width, image_height = HEADER.unpack_from(data)
+        pixels = data[HEADER.size:]
+        if magic != THUMBNAIL_MAGIC or version != THUMBNAIL_VERSION or len(pixels) != image_width * image_height * 4:
+            raise ValueError("unexpected thumbnail header or length")
+        # copy() so the QImage owns its pixels instead of pointing into the bytes object.
+        image = QImage(pixels, image_width, image_height, image_width * 4, QImage.Format_ARGB32_Premultiplied).copy()
+        # Touch so cleanup_thumbnails() removes least recently used thumbnails first.
+        os.utime(thumbnail_path)
+        return image
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Discarding unreadable thumbnail {thumbnail_path}: {e}")
+        remove_file(thumbnail_path)
+        return None
+
+# Stores image (already scaled to width x height device pixels) as the thumbnail of source_path. Safe to call from worker threads.
+def write_thumbnail(source_path, mtime, width, height, image):
+    global WRITES_SINCE_CLEANUP
+    thumbnail_path = get_thumbnail_path(source_path, mtime, width, height)
+    if thumbnail_path is None or image.isNull():
+        return
+
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    image_width, image_height = image.width(), image.height()
+    # 32 bit rows are never padded, so the pixel buffer is already width * 4 bytes per row.
+    pixels = bytes(image.constBits())[:image_width * image_height * 4]
+
+    temp_path = f"{thumbnail_path}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(THUMBNAIL_MAGIC, THUMBNAIL_VERSION, image_width, image_height))
+            f.write(pixels)
+        os.replace(temp_path, thumbnail_path)
+    except OSError as e:
+        logger.warning(f"Failed to write thumbnail for {source_path}: {e}")
+        remove_file(temp_path)
+        return
+
+    with WRITE_COUNT_LOCK:
+        WRITES_SINCE_CLEANUP += 1
+        run_cleanup = WRITES_SINCE_CLEANUP >= CLEANUP_INTERVAL
+        if run_cleanup:
+            WRITES_SINCE_CLEANUP = 0
+    if run_cleanup:
+        cleanup_thumbnails()
+
+# Deletes least recently used thumbnails until the directory is under THUMBNAIL_CACHE_LIMIT_MB.
+def cleanup_thumbnails():
+    if not CLEANUP_LOCK.acquire(blocking=False):
+        # Another thread is already cleaning up.
+        return
+    try:
+        thumbnails = []
+        total_bytes = 0
+        with os.scandir(get_thumbnail_directory()) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                thumbnails.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        limit = THUMBNAIL_CACHE_LIMIT_MB * 1024 * 1024
+        if total_bytes <= limit:
+            return
+        removed = 0
+        for _, size, path in sorted(thumbnails):
+            if total_bytes <= limit:
+                break
+            if remove_file(path):
+                total_bytes -= size
+                removed += 1
+        logger.info(f"Removed {removed} thumbnails, thumbnail cache is now {total_bytes / (1024 * 1024):.1f} MB")
+    except OSError as e:
+        logger.warning(f"Failed to clean up thumbnails: {e}")
+    finally:
+        CLEANUP_LOCK.release()
+
+def remove_file(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
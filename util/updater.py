@@ -6,7 +6,7 @@ import logging
 from PySide6.QtWidgets import (QApplication, QMessageBox, QDialog, QVBoxLayout, 
                                QLabel, QProgressBar, QPushButton)
 from PySide6.QtCore import Qt, QThread, Signal
-from util.settings import set_setting, get_setting
+from util.settings import set_setting, get_setting, flush
 
 logger = logging.getLogger(__name__)
 CURRENT_VERSION = None
@@ -127,6 +127,8 @@ def run_installer():
     try:
         logger.info(f"Running installer: {FULL_LOCAL_PATH}")
         set_setting("updated_from", CURRENT_VERSION)
+        # Written before exiting, the installer relaunches the program which reads settings.json.
+        flush()
         process = subprocess.Popen([FULL_LOCAL_PATH], close_fds=True)
         sys.exit(0)
         # Exit the program upon launching installer as the installer cannot install while program running.
@@ -1,7 +1,7 @@
 from PySide6.QtWidgets import QToolButton, QLineEdit, QStyle, QSlider, QSpinBox, QHBoxLayout, QVBoxLayout, QWidget, QFrame, QLabel, QSpacerItem, QSizePolicy, QGraphicsItem, QGraphicsRectItem
 from PySide6.QtCore import Qt, Signal, QRectF
 from PySide6.QtGui import QPixmap, QPen
-import os
+from util.pixmap_cache import get_scaled_pixmap
 
 
 class TempIcon(QGraphicsItem):
@@ -9,10 +9,9 @@ class TempIcon(QGraphicsItem):
         super().__init__()
         self.icon_size = icon_size
 
-        if os.path.exists(new_icon_path):
-            self.pixmap = QPixmap(new_icon_path)
+        self.pixmap = get_scaled_pixmap(new_icon_path, self.icon_size, self.icon_size)
         # Grid_menu already passes back "assets/images/unknown.png" reference, if for some reason this is invalid, display a blank pixmap
-        else:
+        if self.pixmap.isNull():
             self.pixmap = QPixmap(self.icon_size, self.icon_size)
             self.pixmap.fill(Qt.transparent)
     
@@ -20,10 +19,10 @@ class TempIcon(QGraphicsItem):
         return QRectF(0, 0, self.icon_size, self.icon_size)
     
     def paint(self, painter, option, widget=None):
-        scaled_pixmap = self.pixmap.scaled(self.icon_size, self.icon_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        x_offset = (self.icon_size - scaled_pixmap.width()) / 2
-        y_offset = (self.icon_size - scaled_pixmap.height()) / 2
-        painter.drawPixmap(x_offset, y_offset, scaled_pixmap)
+        pixmap_size = self.pixmap.deviceIndependentSize()
+        x_offset = (self.icon_size - pixmap_size.width()) / 2
+        y_offset = (self.icon_size - pixmap_size.height()) / 2
+        painter.drawPixmap(x_offset, y_offset, self.pixmap)
 
 class ClearableLineEdit(QLineEdit):
     def __init__(self, parent=None):